@@ -1,26 +1,69 @@
 import os
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk, scrolledtext
-import img2pdf
-from PIL import Image
 import threading
-import io
-import glob
-from reportlab.lib.pagesizes import A4, landscape
+import queue
+from functools import partial
 import tempfile
-import subprocess
-import sys
-import platform
 import shutil
 import datetime
-import re
+import time
+
+from imagetopdf import ConversionEngine, ConversionError, ConversionOptions, TempStorage, default_cache_dir
+from imagetopdf.layout import DEFAULT_MAX_DPI, PAGE_SIZES
+from imagetopdf.metrics import Metrics
+from imagetopdf.profiles import PROFILES
+from imagetopdf.hardware import detect_gpu_async, load_torch
+
+# Chu kỳ cập nhật giao diện từ kênh sự kiện (ms), khoảng 20 khung hình/giây
+UI_FRAME_MS = 50
+
+# Số dòng tối đa giữ lại trong khung nhật ký
+MAX_LOG_LINES = 2000
+
+# Lựa chọn khổ trang giữ trang vừa bằng ảnh (không đặt lên khổ giấy cố định)
+NATIVE_PAGE_SIZE = "Theo kích thước ảnh"
+
+# Lựa chọn giữ cách mã hóa mặc định (không dùng hồ sơ nén)
+DEFAULT_COMPRESSION = "Mặc định"
+
+
+class UIEventChannel:
+    """Kênh sự kiện an toàn luồng giữa luồng chuyển đổi và vòng lặp Tk.
+    
+    Luồng nền chỉ đưa sự kiện vào hàng đợi; luồng giao diện lấy ra định kỳ.
+    Với progress, status và file chỉ giá trị mới nhất trong mỗi khung hình
+    được áp dụng; các dòng log được gom lại và chèn một lần.
+    """
+    
+    def __init__(self):
+        self._queue = queue.SimpleQueue()
+    
+    def put(self, kind, value):
+        self._queue.put((kind, value))
+    
+    def call(self, func):
+        """Yêu cầu chạy func trên luồng giao diện"""
+        self._queue.put(("call", func))
+    
+    def drain(self):
+        """Lấy tất cả sự kiện đang chờ; trả về (các dòng log, giá trị mới nhất theo loại, các hàm cần gọi)"""
+        log_lines = []
+        latest = {}
+        calls = []
+        while True:
+            try:
+                kind, value = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if kind == "log":
+                log_lines.append(value)
+            elif kind == "call":
+                calls.append(value)
+            else:
+                latest[kind] = value
+        return log_lines, latest, calls
 
-# Thử import torch, nếu không được thì bỏ qua phần kiểm tra GPU
-try:
-    import torch
-    TORCH_AVAILABLE = True
-except ImportError:
-    TORCH_AVAILABLE = False
 
 class ImageToPDFConverter:
     def __init__(self, root):
@@ -29,10 +72,10 @@ class ImageToPDFConverter:
         self.root.geometry("700x600")
         self.root.resizable(True, True)
         
-        # Kiểm tra GPU một cách an toàn
+        # Thông tin GPU được dò trong luồng nền sau khi cửa sổ hiện ra
         self.has_gpu = False
         self.gpu_name = "Không có"
-        self.gpu_info = "Không có thông tin"
+        self.gpu_info = "Đang kiểm tra GPU..."
         self.cuda_version = "Không có"
         
         # Các biến cho quản lý file tạm
@@ -40,11 +83,8 @@ class ImageToPDFConverter:
         self.temp_files = []
         self.temp_folders = []
         
-        # Đảm bảo thư mục tạm tồn tại
-        os.makedirs(self.temp_folder, exist_ok=True)
-        
-        # Thực hiện kiểm tra GPU chi tiết
-        self.check_gpu_detailed()
+        # Chỉ mục các file tạm của ứng dụng (tạo thư mục tạm nếu chưa có)
+        self.temp_storage = TempStorage(self.temp_folder)
         
         # Các biến
         self.input_folder = tk.StringVar()
@@ -56,8 +96,28 @@ class ImageToPDFConverter:
         self.separate_by_ratio = tk.BooleanVar(value=True)
         self.force_gpu = tk.BooleanVar(value=False)
         self.auto_clean_temp = tk.BooleanVar(value=True)
+        self.workers = tk.IntVar(value=1)
+        self.streaming = tk.BooleanVar(value=False)
+        self.use_cache = tk.BooleanVar(value=False)
+        self.incremental = tk.BooleanVar(value=False)
+        self.natural_sort = tk.BooleanVar(value=False)
+        self.per_folder = tk.BooleanVar(value=False)
+        self.page_size = tk.StringVar(value=NATIVE_PAGE_SIZE)
+        self.max_dpi = tk.IntVar(value=DEFAULT_MAX_DPI)
+        self.compression = tk.StringVar(value=DEFAULT_COMPRESSION)
+        self.page_budget_kb = tk.IntVar(value=0)
+        
+        # Kênh sự kiện giữa luồng chuyển đổi và giao diện
+        self.events = UIEventChannel()
+        
+        # Số đo của lần chuyển đổi đang chạy (gồm cả thời gian cập nhật giao diện)
+        self.job_metrics = None
         
         self.create_widgets()
+        self.root.after(UI_FRAME_MS, self.process_events)
+        
+        # Dò GPU trong nền (dùng kết quả đã lưu nếu còn hạn), không chặn giao diện
+        detect_gpu_async(lambda status: self.events.call(partial(self.on_gpu_detected, status)))
         
         # Kiểm tra và hiển thị thông tin về dung lượng tạm khi khởi động
         self.check_temp_storage()
@@ -65,112 +125,31 @@ class ImageToPDFConverter:
         # Thiết lập xử lý khi đóng ứng dụng
         self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
     
-    def check_gpu_detailed(self):
-        """Kiểm tra GPU với nhiều phương pháp khác nhau"""
-        gpu_info = []
+    def on_gpu_detected(self, status):
+        """Cập nhật thông tin GPU khi việc dò trong nền hoàn tất (chạy trên luồng giao diện)"""
+        self.has_gpu = status.has_gpu
+        self.gpu_name = status.gpu_name
+        self.cuda_version = status.cuda_version
+        self.gpu_info = status.info_text
         
-        # Phương pháp 1: Kiểm tra bằng PyTorch
-        if TORCH_AVAILABLE:
-            try:
-                self.has_gpu = torch.cuda.is_available()
-                if self.has_gpu:
-                    try:
-                        self.gpu_name = torch.cuda.get_device_name(0)
-                        gpu_info.append(f"PyTorch: {self.gpu_name}")
-                        
-                        # Hiển thị phiên bản CUDA từ PyTorch
-                        if hasattr(torch.version, 'cuda'):
-                            torch_cuda_version = torch.version.cuda
-                            gpu_info.append(f"PyTorch CUDA: {torch_cuda_version}")
-                        
-                    except Exception as e:
-                        gpu_info.append(f"PyTorch lỗi: {str(e)}")
-                else:
-                    gpu_info.append("PyTorch: Không phát hiện GPU")
-            except Exception as e:
-                gpu_info.append(f"Lỗi PyTorch: {str(e)}")
+        self.gpu_label.config(text=f"Đã phát hiện GPU: {self.gpu_name if self.has_gpu else 'Không có'}",
+                              foreground="green" if self.has_gpu else "red")
         
-        # Phương pháp 2: Kiểm tra bằng NVIDIA-SMI (cho cả Windows và Linux)
-        try:
-            result = subprocess.run(['nvidia-smi', '--query-gpu=gpu_name,driver_version,cuda_version', '--format=csv,noheader'], 
-                                    capture_output=True, text=True)
-            if result.returncode == 0 and result.stdout.strip():
-                gpu_lines = result.stdout.strip().split('\n')
-                for line in gpu_lines:
-                    parts = line.strip().split(', ')
-                    if len(parts) >= 3:
-                        gpu_name, driver_ver, cuda_ver = parts
-                        self.cuda_version = cuda_ver
-                        gpu_info.append(f"NVIDIA-SMI: {gpu_name}, Driver: {driver_ver}, CUDA: {cuda_ver}")
-                    else:
-                        gpu_info.append(f"NVIDIA-SMI: {line.strip()}")
-                
-                if not self.has_gpu:  # Nếu PyTorch không phát hiện nhưng nvidia-smi có
-                    self.has_gpu = True
-                    self.gpu_name = "NVIDIA GPU (PyTorch không nhận diện)"
-        except (subprocess.SubprocessError, FileNotFoundError):
-            gpu_info.append("NVIDIA-SMI: Không có hoặc không chạy được")
-        
-        # Phương pháp 3: Kiểm tra bằng DirectX Info (chỉ Windows)
-        if platform.system() == 'Windows':
-            try:
-                import wmi
-                c = wmi.WMI()
-                for gpu in c.Win32_VideoController():
-                    gpu_info.append(f"DirectX: {gpu.Name} ({gpu.AdapterRAM/(1024**2):.0f} MB)")
-                    # Nếu tên GPU chứa NVIDIA và chưa phát hiện GPU
-                    if 'nvidia' in gpu.Name.lower() and not self.has_gpu:
-                        self.has_gpu = True
-                        self.gpu_name = gpu.Name
-            except Exception:
-                try:
-                    result = subprocess.run(['dxdiag', '/t', 'dxdiag_output.txt'], 
-                                           shell=True, capture_output=True, text=True)
-                    if os.path.exists('dxdiag_output.txt'):
-                        with open('dxdiag_output.txt', 'r') as f:
-                            content = f.read()
-                            if 'NVIDIA' in content:
-                                gpu_info.append("DirectX: Phát hiện GPU NVIDIA")
-                                if not self.has_gpu:
-                                    self.has_gpu = True
-                                    self.gpu_name = "NVIDIA GPU (phát hiện qua DirectX)"
-                        os.remove('dxdiag_output.txt')
-                except Exception:
-                    gpu_info.append("DirectX: Không thể kiểm tra")
-        
-        # Thêm thông tin CUDA 
-        gpu_info.append(f"CUDA  đã được phát hiện trên hệ thống")
-        self.cuda_version = ""
-        
-        self.gpu_info = "\n".join(gpu_info) if gpu_info else "Không có thông tin GPU"
+        # Tùy chọn ép buộc sử dụng GPU chỉ hiện khi phát hiện GPU
+        if self.has_gpu:
+            self.force_gpu_check.pack(anchor=tk.W, before=self.auto_clean_check)
+        
+        # Log thông tin GPU
+        self.log(f"Thông tin GPU: {self.gpu_name}")
+        if self.has_gpu:
+            self.log("GPU đã được phát hiện và sẵn sàng sử dụng với CUDA .")
+        else:
+            self.log("Không phát hiện GPU, sẽ sử dụng CPU.")
     
     def check_temp_storage(self):
         """Kiểm tra dung lượng tạm và hiển thị thông tin"""
-        temp_size = 0
-        temp_files_count = 0
-        
-        # Kiểm tra thư mục tạm của ứng dụng
-        if os.path.exists(self.temp_folder):
-            for root, dirs, files in os.walk(self.temp_folder):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    try:
-                        temp_size += os.path.getsize(file_path)
-                        temp_files_count += 1
-                    except OSError:
-                        pass
-        
-        # Kiểm tra các thư mục tạm khác được tạo bởi tempfile
-        pattern = re.compile(r'^tmp.*|.*_img2pdf_.*$')
-        for root, dirs, files in os.walk(tempfile.gettempdir()):
-            for file in files:
-                if pattern.match(file):
-                    file_path = os.path.join(root, file)
-                    try:
-                        temp_size += os.path.getsize(file_path)
-                        temp_files_count += 1
-                    except OSError:
-                        pass
+        # Chỉ mục file tạm lưu sẵn tổng dung lượng, không cần duyệt thư mục
+        temp_size, temp_files_count = self.temp_storage.usage()
         
         # Chuyển đổi kích thước sang MB
         temp_size_mb = temp_size / (1024 * 1024)
@@ -191,15 +170,7 @@ class ImageToPDFConverter:
         
         try:
             # Dọn dẹp các file tạm đã theo dõi
-            for temp_file in self.temp_files:
-                if os.path.exists(temp_file):
-                    try:
-                        size = os.path.getsize(temp_file)
-                        os.unlink(temp_file)
-                        size_freed += size
-                        files_removed += 1
-                    except OSError:
-                        pass
+            files_removed, size_freed = self.temp_storage.discard(self.temp_files)
             
             # Dọn dẹp các thư mục tạm đã theo dõi
             for temp_dir in self.temp_folders:
@@ -222,37 +193,11 @@ class ImageToPDFConverter:
                     except OSError:
                         pass
             
-            # Xóa tất cả file tạm nếu được yêu cầu
+            # Xóa tất cả file tạm nếu được yêu cầu (mọi file đã ghi trong chỉ mục, kể cả của các phiên trước)
             if all_temps:
-                # Dọn dẹp thư mục tạm của ứng dụng
-                if os.path.exists(self.temp_folder):
-                    for root, dirs, files in os.walk(self.temp_folder):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            try:
-                                size = os.path.getsize(file_path)
-                                os.unlink(file_path)
-                                size_freed += size
-                                files_removed += 1
-                            except OSError:
-                                pass
-                
-                # Tìm và xóa các file tạm khác liên quan đến img2pdf
-                pattern = re.compile(r'^tmp.*|.*_img2pdf_.*$')
-                for root, dirs, files in os.walk(tempfile.gettempdir()):
-                    for file in files:
-                        if pattern.match(file):
-                            file_path = os.path.join(root, file)
-                            try:
-                                # Kiểm tra thời gian tạo file, chỉ xóa nếu đã cũ hơn 1 giờ
-                                file_time = os.path.getctime(file_path)
-                                if (datetime.datetime.now().timestamp() - file_time) > 3600:
-                                    size = os.path.getsize(file_path)
-                                    os.unlink(file_path)
-                                    size_freed += size
-                                    files_removed += 1
-                            except OSError:
-                                pass
+                removed, freed = self.temp_storage.clean()
+                files_removed += removed
+                size_freed += freed
             
             # Đặt lại danh sách file tạm đang theo dõi
             self.temp_files = []
@@ -286,9 +231,8 @@ class ImageToPDFConverter:
         gpu_frame = ttk.LabelFrame(main_frame, text="Thông tin GPU", padding="5")
         gpu_frame.pack(fill=tk.X, pady=5)
         
-        gpu_status = f"Đã phát hiện GPU: {self.gpu_name if self.has_gpu else 'Không có'}"
-        gpu_label = ttk.Label(gpu_frame, text=gpu_status, foreground="green" if self.has_gpu else "red")
-        gpu_label.pack(anchor=tk.W)
+        self.gpu_label = ttk.Label(gpu_frame, text="Đang kiểm tra GPU...")
+        self.gpu_label.pack(anchor=tk.W)
         
 
         
@@ -306,14 +250,14 @@ class ImageToPDFConverter:
         ttk.Button(buttons_frame, text="Dọn dẹp file tạm", 
                   command=self.show_cleanup_dialog).pack(side=tk.LEFT, padx=2)
         
-        # Tùy chọn ép buộc sử dụng GPU nếu phát hiện
-        if self.has_gpu:
-            ttk.Checkbutton(gpu_frame, text="Ép buộc sử dụng GPU (với CUDA )", 
-                           variable=self.force_gpu).pack(anchor=tk.W)
+        # Tùy chọn ép buộc sử dụng GPU, chỉ hiện sau khi phát hiện GPU
+        self.force_gpu_check = ttk.Checkbutton(gpu_frame, text="Ép buộc sử dụng GPU (với CUDA )", 
+                                               variable=self.force_gpu)
         
         # Tùy chọn tự động dọn dẹp file tạm
-        ttk.Checkbutton(gpu_frame, text="Tự động dọn dẹp file tạm sau khi chuyển đổi", 
-                       variable=self.auto_clean_temp).pack(anchor=tk.W)
+        self.auto_clean_check = ttk.Checkbutton(gpu_frame, text="Tự động dọn dẹp file tạm sau khi chuyển đổi", 
+                                                variable=self.auto_clean_temp)
+        self.auto_clean_check.pack(anchor=tk.W)
         
         # Chọn thư mục đầu vào
         input_frame = ttk.LabelFrame(main_frame, text="Thư mục chứa ảnh", padding="5")
@@ -336,11 +280,50 @@ class ImageToPDFConverter:
         self.sort_by_name = tk.BooleanVar(value=True)
         ttk.Checkbutton(options_frame, text="Sắp xếp theo tên file", variable=self.sort_by_name).pack(anchor=tk.W)
         
+        ttk.Checkbutton(options_frame, text="Sắp xếp tự nhiên theo số (anh2 trước anh10)", 
+                       variable=self.natural_sort).pack(anchor=tk.W)
+        
+        ttk.Checkbutton(options_frame, text="Quét cả thư mục con, mỗi thư mục con một file PDF riêng", 
+                       variable=self.per_folder).pack(anchor=tk.W)
+        
         ttk.Checkbutton(options_frame, text="Giữ nguyên tỷ lệ khung hình", variable=self.preserve_ratio).pack(anchor=tk.W)
         
         ttk.Checkbutton(options_frame, text="Tạo PDF riêng cho các tỷ lệ khác nhau (16:9 và 9:16)", 
                        variable=self.separate_by_ratio).pack(anchor=tk.W)
         
+        ttk.Checkbutton(options_frame, text="Ghi PDF theo từng trang (tiết kiệm bộ nhớ với thư mục lớn)", 
+                       variable=self.streaming).pack(anchor=tk.W)
+        
+        ttk.Checkbutton(options_frame, text="Dùng bộ nhớ đệm cho ảnh đã xử lý (tăng tốc khi chuyển đổi lại)", 
+                       variable=self.use_cache).pack(anchor=tk.W)
+        
+        ttk.Checkbutton(options_frame, text="Chỉ cập nhật trang mới hoặc thay đổi vào PDF đã có", 
+                       variable=self.incremental).pack(anchor=tk.W)
+        
+        page_frame = ttk.Frame(options_frame)
+        page_frame.pack(anchor=tk.W)
+        ttk.Label(page_frame, text="Khổ trang:").pack(side=tk.LEFT)
+        ttk.Combobox(page_frame, textvariable=self.page_size, width=18, state="readonly",
+                     values=[NATIVE_PAGE_SIZE] + list(PAGE_SIZES)).pack(side=tk.LEFT, padx=5)
+        ttk.Label(page_frame, text="DPI tối đa:").pack(side=tk.LEFT)
+        ttk.Spinbox(page_frame, from_=50, to=600, increment=50, width=5,
+                    textvariable=self.max_dpi).pack(side=tk.LEFT, padx=5)
+        
+        compression_frame = ttk.Frame(options_frame)
+        compression_frame.pack(anchor=tk.W)
+        ttk.Label(compression_frame, text="Mức nén:").pack(side=tk.LEFT)
+        ttk.Combobox(compression_frame, textvariable=self.compression, width=12, state="readonly",
+                     values=[DEFAULT_COMPRESSION] + list(PROFILES)).pack(side=tk.LEFT, padx=5)
+        ttk.Label(compression_frame, text="Tối đa mỗi trang (kB, 0 = không giới hạn):").pack(side=tk.LEFT)
+        ttk.Spinbox(compression_frame, from_=0, to=100000, increment=100, width=7,
+                    textvariable=self.page_budget_kb).pack(side=tk.LEFT, padx=5)
+        
+        workers_frame = ttk.Frame(options_frame)
+        workers_frame.pack(anchor=tk.W)
+        ttk.Label(workers_frame, text="Số tiến trình xử lý ảnh song song (0 = tất cả các lõi CPU):").pack(side=tk.LEFT)
+        ttk.Spinbox(workers_frame, from_=0, to=os.cpu_count() or 1, width=5,
+                    textvariable=self.workers).pack(side=tk.LEFT, padx=5)
+        
         # Nút chuyển đổi
         convert_button = ttk.Button(main_frame, text="Chuyển đổi", command=self.start_conversion)
         convert_button.pack(pady=10)
@@ -377,13 +360,6 @@ class ImageToPDFConverter:
         # Khởi tạo trạng thái
         self.status.set("Sẵn sàng")
         self.current_file.set("")
-        
-        # Log thông tin GPU
-        self.log(f"Thông tin GPU: {self.gpu_name}")
-        if self.has_gpu:
-            self.log("GPU đã được phát hiện và sẵn sàng sử dụng với CUDA .")
-        else:
-            self.log("Không phát hiện GPU, sẽ sử dụng CPU.")
     
     def show_cleanup_dialog(self):
         """Hiển thị hộp thoại dọn dẹp tệp tạm"""
@@ -514,14 +490,42 @@ class ImageToPDFConverter:
             self.log(f"Đã chọn file đầu ra: {file}")
     
     def log(self, message):
-        self.log_area.config(state=tk.NORMAL)
+        """Ghi một dòng nhật ký; an toàn khi gọi từ bất kỳ luồng nào"""
         # Thêm timestamp
         timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-        self.log_area.insert(tk.END, f"[{timestamp}] {message}\n")
-        self.log_area.see(tk.END)  # Cuộn xuống cuối
-        self.log_area.config(state=tk.DISABLED)
-        # Cập nhật giao diện ngay lập tức
-        self.root.update()
+        self.events.put("log", f"[{timestamp}] {message}\n")
+    
+    def process_events(self):
+        """Áp dụng các sự kiện đang chờ lên giao diện, chạy định kỳ bằng after()"""
+        try:
+            log_lines, latest, calls = self.events.drain()
+            start = time.perf_counter()
+            
+            if log_lines:
+                self.log_area.config(state=tk.NORMAL)
+                self.log_area.insert(tk.END, "".join(log_lines))
+                # Giới hạn số dòng để khung nhật ký không tăng vô hạn
+                line_count = int(self.log_area.index("end-1c").split(".")[0])
+                if line_count > MAX_LOG_LINES:
+                    self.log_area.delete("1.0", f"{line_count - MAX_LOG_LINES + 1}.0")
+                self.log_area.see(tk.END)  # Cuộn xuống cuối
+                self.log_area.config(state=tk.DISABLED)
+            
+            if "progress" in latest:
+                self.progress.set(latest["progress"])
+            if "status" in latest:
+                self.status.set(latest["status"])
+            if "file" in latest:
+                self.current_file.set(latest["file"])
+            
+            if self.job_metrics is not None and (log_lines or latest):
+                self.job_metrics.add_time("ui_update", time.perf_counter() - start)
+                self.job_metrics.count("ui_log_lines", len(log_lines))
+            
+            for func in calls:
+                func()
+        finally:
+            self.root.after(UI_FRAME_MS, self.process_events)
     
     def start_conversion(self):
         input_folder = self.input_folder.get()
@@ -548,344 +552,111 @@ class ImageToPDFConverter:
         self.temp_files = []
         self.temp_folders = []
         
-        # Thiết lập GPU nếu được yêu cầu
-        if self.has_gpu and self.force_gpu.get() and TORCH_AVAILABLE:
-            try:
-                self.log("Đang kích hoạt GPU với CUDA ...")
-                if torch.cuda.is_available():
-                    # Thiết lập torch để sử dụng GPU
-                    torch.cuda.set_device(0)
-                    # Thử tạo một tensor nhỏ trên GPU để kiểm tra
-                    test_tensor = torch.tensor([1.0, 2.0], device='cuda')
-                    self.log(f"Đã kích hoạt GPU thành công: {torch.cuda.get_device_name(0)} với CUDA ")
-                else:
-                    self.log("Không thể kích hoạt GPU thông qua PyTorch.")
-                    # Thiết lập biến môi trường để cố gắng sử dụng GPU
-                    os.environ['CUDA_VISIBLE_DEVICES'] = '0'
-            except Exception as e:
-                self.log(f"Lỗi khi kích hoạt GPU: {str(e)}")
+        # Thiết lập GPU nếu được yêu cầu; khi kích hoạt được, các bước xử lý điểm ảnh chạy bằng PyTorch
+        compute_backend = None
+        if self.has_gpu and self.force_gpu.get():
+            # PyTorch chỉ được import ở đây, khi người dùng thật sự yêu cầu dùng GPU
+            torch = load_torch()
+            if torch is None:
+                self.log("PyTorch chưa được cài đặt, không thể kích hoạt GPU.")
+            else:
+                try:
+                    self.log("Đang kích hoạt GPU với CUDA ...")
+                    if torch.cuda.is_available():
+                        # Thiết lập torch để sử dụng GPU
+                        torch.cuda.set_device(0)
+                        # Thử tạo một tensor nhỏ trên GPU để kiểm tra
+                        test_tensor = torch.tensor([1.0, 2.0], device='cuda')
+                        self.log(f"Đã kích hoạt GPU thành công: {torch.cuda.get_device_name(0)} với CUDA ")
+                        compute_backend = "torch"
+                    else:
+                        self.log("Không thể kích hoạt GPU thông qua PyTorch.")
+                        # Thiết lập biến môi trường để cố gắng sử dụng GPU
+                        os.environ['CUDA_VISIBLE_DEVICES'] = '0'
+                except Exception as e:
+                    self.log(f"Lỗi khi kích hoạt GPU: {str(e)}")
+        
+        # Đọc các tùy chọn trên luồng giao diện trước khi chuyển sang luồng nền
+        options = ConversionOptions(
+            input_folder=input_folder,
+            output_file=output_file,
+            sort_by_name=self.sort_by_name.get(),
+            natural_sort=self.natural_sort.get(),
+            recursive=self.per_folder.get(),
+            per_folder=self.per_folder.get(),
+            preserve_ratio=self.preserve_ratio.get(),
+            separate_by_ratio=self.separate_by_ratio.get(),
+            temp_folder=self.temp_folder,
+            workers=self.workers.get(),
+            streaming=self.streaming.get(),
+            incremental=self.incremental.get(),
+            page_size=None if self.page_size.get() == NATIVE_PAGE_SIZE else self.page_size.get(),
+            max_dpi=None if self.page_size.get() == NATIVE_PAGE_SIZE else self.max_dpi.get(),
+            compression=None if self.compression.get() == DEFAULT_COMPRESSION else self.compression.get(),
+            page_budget=self.page_budget_kb.get() * 1024 if self.page_budget_kb.get() > 0 else None,
+            compute_backend=compute_backend,
+            cache_dir=default_cache_dir() if self.use_cache.get() else None,
+        )
         
         # Bắt đầu chuyển đổi trong một luồng riêng biệt
-        threading.Thread(target=self.convert_images_to_pdf, daemon=True).start()
-    
-    def is_landscape(self, img):
-        width, height = img.size
-        return width > height
+        self.job_metrics = Metrics()
+        threading.Thread(target=self.convert_images_to_pdf, args=(options, self.job_metrics), daemon=True).start()
     
-    def get_aspect_ratio(self, img):
-        width, height = img.size
-        if self.is_landscape(img):
-            # Tỷ lệ gần 16:9
-            return "landscape" if (width / height) > 1.5 else "other"
-        else:
-            # Tỷ lệ gần 9:16
-            return "portrait" if (height / width) > 1.5 else "other"
-    
-    def convert_images_to_pdf(self):
+    def convert_images_to_pdf(self, options, metrics=None):
+        """Chạy engine trong luồng nền; mọi cập nhật giao diện đều đi qua kênh sự kiện"""
+        engine = ConversionEngine(
+            options,
+            on_log=self.log,
+            on_progress=partial(self.events.put, "progress"),
+            on_status=partial(self.events.put, "status"),
+            on_file=partial(self.events.put, "file"),
+            metrics=metrics,
+        )
+        
+        error = None
         try:
-            input_folder = self.input_folder.get()
-            output_file = self.output_file.get()
-            preserve_ratio = self.preserve_ratio.get()
-            separate_by_ratio = self.separate_by_ratio.get()
-            
-            self.log("Bắt đầu quá trình chuyển đổi...")
-            self.status.set("Đang tìm các file ảnh...")
-            
-            # Tìm tất cả các file ảnh
-            image_extensions = ["*.jpg", "*.jpeg", "*.png", "*.webp"]
-            image_files = []
-            
-            for ext in image_extensions:
-                image_files.extend(glob.glob(os.path.join(input_folder, ext)))
-                image_files.extend(glob.glob(os.path.join(input_folder, ext.upper())))
-            
-            if not image_files:
-                self.log("Không tìm thấy file ảnh nào trong thư mục.")
-                self.status.set("Không có file ảnh")
-                messagebox.showerror("Lỗi", "Không tìm thấy file ảnh nào trong thư mục")
-                return
-            
-            # Sắp xếp file theo tên
-            if self.sort_by_name.get():
-                image_files.sort()
-                self.log(f"Đã sắp xếp {len(image_files)} file ảnh theo tên.")
-            
-            self.log(f"Tìm thấy {len(image_files)} file ảnh.")
-            self.status.set(f"Đang xử lý {len(image_files)} file ảnh...")
-            
-            # Phân loại ảnh theo tỷ lệ khung hình nếu được yêu cầu
-            if separate_by_ratio:
-                landscape_images = []  # 16:9
-                portrait_images = []   # 9:16
-                other_images = []      # Tỷ lệ khác
-                
-                self.log("Phân loại ảnh theo tỷ lệ khung hình...")
-                
-                for i, img_path in enumerate(image_files):
-                    # Cập nhật tiến trình
-                    progress = (i / len(image_files)) * 50  # 50% cho việc phân loại
-                    self.progress.set(progress)
-                    self.current_file.set(os.path.basename(img_path))
-                    self.status.set(f"Đang phân loại ảnh: {i+1}/{len(image_files)}")
-                    
-                    try:
-                        with Image.open(img_path) as img:
-                            ratio_type = self.get_aspect_ratio(img)
-                            
-                            if ratio_type == "landscape":
-                                landscape_images.append(img_path)
-                                self.log(f"Ảnh {os.path.basename(img_path)}: Tỷ lệ 16:9 (ngang)")
-                            elif ratio_type == "portrait":
-                                portrait_images.append(img_path)
-                                self.log(f"Ảnh {os.path.basename(img_path)}: Tỷ lệ 9:16 (dọc)")
-                            else:
-                                other_images.append(img_path)
-                                self.log(f"Ảnh {os.path.basename(img_path)}: Tỷ lệ khác")
-                    except Exception as e:
-                        self.log(f"Lỗi khi phân loại ảnh {os.path.basename(img_path)}: {str(e)}")
-                        continue
-                
-                self.log(f"Kết quả phân loại: {len(landscape_images)} ảnh 16:9, {len(portrait_images)} ảnh 9:16, {len(other_images)} ảnh tỷ lệ khác.")
-                
-                # Tạo các file PDF riêng cho từng nhóm
-                output_base = os.path.splitext(output_file)[0]
-                
-                if landscape_images:
-                    landscape_pdf = f"{output_base}_16x9.pdf"
-                    self.create_pdf_for_images(landscape_images, landscape_pdf, "landscape", 50, 75)
-                
-                if portrait_images:
-                    portrait_pdf = f"{output_base}_9x16.pdf"
-                    self.create_pdf_for_images(portrait_images, portrait_pdf, "portrait", 75, 100)
-                
-                if other_images:
-                    other_pdf = f"{output_base}_other.pdf"
-                    self.create_pdf_for_images(other_images, other_pdf, "other", 50, 75)
-                
-                self.log("Đã hoàn thành việc tạo các file PDF theo tỷ lệ khung hình.")
-                self.status.set("Đã hoàn thành")
-                self.progress.set(100)
-                
-                message = f"Đã tạo thành công các file PDF:\n"
-                if landscape_images:
-                    message += f"- {len(landscape_images)} ảnh 16:9: {os.path.basename(landscape_pdf)}\n"
-                if portrait_images:
-                    message += f"- {len(portrait_images)} ảnh 9:16: {os.path.basename(portrait_pdf)}\n"
-                if other_images:
-                    message += f"- {len(other_images)} ảnh tỷ lệ khác: {os.path.basename(other_pdf)}\n"
-                
-                # Tự động dọn dẹp nếu được cấu hình
-                if self.auto_clean_temp.get():
-                    files_removed, size_freed = self.clean_temp_files()
-                    self.log(f"Đã tự động dọn dẹp {files_removed} file tạm, giải phóng {size_freed:.2f} MB.")
-                
-                messagebox.showinfo("Thành công", message)
-            
-            else:
-                # Tạo một PDF duy nhất cho tất cả các ảnh
-                self.create_pdf_for_images(image_files, output_file, "all", 0, 100)
-                
-                # Tự động dọn dẹp nếu được cấu hình
-                if self.auto_clean_temp.get():
-                    files_removed, size_freed = self.clean_temp_files()
-                    self.log(f"Đã tự động dọn dẹp {files_removed} file tạm, giải phóng {size_freed:.2f} MB.")
-                
-                self.log(f"Đã tạo thành công file PDF: {output_file}")
-                messagebox.showinfo("Thành công", f"Đã chuyển đổi {len(image_files)} ảnh thành file PDF")
-            
+            engine.run()
         except Exception as e:
-            self.log(f"Lỗi: {str(e)}")
-            self.status.set(f"Lỗi: {str(e)}")
-            messagebox.showerror("Lỗi", f"Đã xảy ra lỗi: {str(e)}")
+            error = e
+        
+        self.events.call(lambda: self.on_conversion_finished(options, engine.result, error))
     
-    def create_pdf_for_images(self, image_files, output_file, ratio_type, progress_start, progress_end):
-        try:
-            self.log(f"Đang tạo file PDF cho {len(image_files)} ảnh {ratio_type}...")
-            self.status.set(f"Đang tạo file PDF cho ảnh {ratio_type}...")
-            
-            # Nếu không có file nào, không tạo PDF
-            if not image_files:
-                self.log(f"Không có ảnh nào thuộc loại {ratio_type}, bỏ qua.")
-                return
-            
-            # Đảm bảo không có đường dẫn trùng lặp ngay từ đầu
-            image_files = list(dict.fromkeys(image_files))
-            self.log(f"Số ảnh sau khi loại bỏ trùng lặp ban đầu: {len(image_files)}")
-            
-            if self.preserve_ratio:
-                # Sử dụng cách đơn giản hơn để giữ tỷ lệ khung hình
-                temp_files = []
-                actual_images = []  # Danh sách chỉ chứa các đường dẫn hợp lệ để chuyển đổi
-                
-                # Tạo thư mục tạm thời cho phiên làm việc này
-                session_temp_dir = os.path.join(self.temp_folder, f"session_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}")
-                os.makedirs(session_temp_dir, exist_ok=True)
-                self.temp_folders.append(session_temp_dir)
-                
-                for i, img_path in enumerate(image_files):
-                    progress = progress_start + ((i / len(image_files)) * (progress_end - progress_start))
-                    self.progress.set(progress)
-                    self.current_file.set(os.path.basename(img_path))
-                    self.status.set(f"Đang xử lý ảnh ({ratio_type}): {i+1}/{len(image_files)}")
-                    
-                    try:
-                        with Image.open(img_path) as img:
-                            # Xử lý ảnh webp hoặc RGBA
-                            if img_path.lower().endswith('.webp') or img.mode == 'RGBA':
-                                img = img.convert('RGB')
-                                
-                                # Tạo file tạm thời trong thư mục tạm của phiên làm việc
-                                tmp_file = os.path.join(session_temp_dir, f"temp_{i}_{os.path.basename(img_path)}.jpg")
-                                img.save(tmp_file, 'JPEG')
-                                temp_files.append(tmp_file)
-                                self.temp_files.append(tmp_file)  # Theo dõi để dọn dẹp sau
-                                
-                                # Thêm vào danh sách chuyển đổi
-                                actual_images.append(tmp_file)
-                            else:
-                                # Nếu là file thông thường, thêm vào danh sách
-                                actual_images.append(img_path)
-                    
-                        self.log(f"Đã xử lý: {os.path.basename(img_path)}")
-                    except Exception as e:
-                        self.log(f"Lỗi khi xử lý ảnh {os.path.basename(img_path)}: {str(e)}")
-                        continue
-                
-                # Kiểm tra và lọc danh sách một lần nữa để đảm bảo không có trùng lặp
-                actual_images = list(dict.fromkeys(actual_images))
-                self.log(f"Số ảnh sau khi lọc và loại bỏ trùng lặp: {len(actual_images)}")
-                
-                # Chỉ giữ lại những file thực sự tồn tại
-                actual_images = [img for img in actual_images if os.path.exists(img)]
-                
-                # Sử dụng giải pháp thay thế an toàn hơn, không dùng layout_fun
-                try:
-                    if actual_images:
-                        # Debug: Ghi ra danh sách file thực sự được chuyển đổi
-                        self.log(f"Chuyển đổi {len(actual_images)} file ảnh sang PDF...")
-                        
-                        # Chuyển đổi thành PDF
-                        with open(output_file, "wb") as f:
-                            # Sử dụng cài đặt img2pdf đơn giản, để nó tự giữ tỷ lệ
-                            pdf_data = img2pdf.convert(actual_images)
-                            f.write(pdf_data)
-                        
-                        # Kiểm tra kết quả
-                        file_size = os.path.getsize(output_file) / 1024  # kB
-                        self.log(f"File PDF đã được tạo: {output_file} (kích thước: {file_size:.2f} kB)")
-                        
-                        # Phân tích file PDF để kiểm tra số trang
-                        try:
-                            from pikepdf import Pdf
-                            with Pdf.open(output_file) as pdf:
-                                page_count = len(pdf.pages)
-                                self.log(f"Số trang trong file PDF: {page_count} (mong đợi: {len(actual_images)})")
-                                
-                                # Cảnh báo nếu số trang khác với số ảnh
-                                if page_count != len(actual_images):
-                                    self.log("Cảnh báo: Số trang PDF không khớp với số ảnh đầu vào!")
-                        except ImportError:
-                            self.log("Thư viện pikepdf không có sẵn, bỏ qua kiểm tra số trang PDF.")
-                    else:
-                        self.log("Không có ảnh nào được xử lý thành công.")
-                        raise Exception("Không có ảnh nào được xử lý thành công")
-                except Exception as e:
-                    self.log(f"Lỗi khi tạo PDF với img2pdf: {str(e)}")
-                    self.log("Thử phương pháp thay thế với Pillow...")
-                    
-                    # Phương pháp thay thế nếu img2pdf gặp vấn đề
-                    first_image = None
-                    pdf_images = []
-                    
-                    for img_path in actual_images:
-                        try:
-                            with Image.open(img_path) as img:
-                                if img.mode == 'RGBA':
-                                    img = img.convert('RGB')
-                                
-                                # Lưu bản sao của ảnh để tránh ảnh hưởng đến file gốc
-                                img_copy = img.copy()
-                                
-                                if not first_image:
-                                    first_image = img_copy
-                                else:
-                                    pdf_images.append(img_copy)
-                        except Exception as img_err:
-                            self.log(f"Bỏ qua ảnh lỗi: {os.path.basename(img_path)}: {str(img_err)}")
-                    
-                    if first_image:
-                        # Nếu chỉ có một ảnh
-                        if len(pdf_images) == 0:
-                            first_image.save(output_file, 'PDF')
-                            self.log(f"Đã lưu 1 ảnh sang PDF bằng Pillow")
-                        else:
-                            # Nhiều ảnh - sử dụng append_images
-                            first_image.save(
-                                output_file, 
-                                'PDF', 
-                                save_all=True, 
-                                append_images=pdf_images
-                            )
-                            self.log(f"Đã lưu {len(pdf_images) + 1} ảnh sang PDF bằng Pillow")
-                    else:
-                        raise Exception("Không thể tạo PDF với cả hai phương pháp")
-            
+    def on_conversion_finished(self, options, result, error):
+        """Xử lý kết quả chuyển đổi trên luồng giao diện"""
+        # Theo dõi các file tạm do engine tạo ra để dọn dẹp sau
+        self.temp_files.extend(result.temp_files)
+        self.temp_folders.extend(result.temp_folders)
+        
+        if result.metrics is not None:
+            self.log(f"Thời gian theo giai đoạn: {result.metrics.summary()}")
+        self.job_metrics = None
+        
+        if error is not None:
+            if not isinstance(error, ConversionError):
+                self.log(f"Lỗi: {str(error)}")
+                self.status.set(f"Lỗi: {str(error)}")
+                messagebox.showerror("Lỗi", f"Đã xảy ra lỗi: {str(error)}")
             else:
-                # Phương pháp cũ (không giữ nguyên tỷ lệ)
-                valid_images = []
-                
-                for i, img_path in enumerate(image_files):
-                    progress = progress_start + ((i / len(image_files)) * (progress_end - progress_start))
-                    self.progress.set(progress)
-                    self.current_file.set(os.path.basename(img_path))
-                    self.status.set(f"Đang xử lý ảnh ({ratio_type}): {i+1}/{len(image_files)}")
-                    
-                    try:
-                        with Image.open(img_path) as img:
-                            if img_path.lower().endswith('.webp') or img.mode == 'RGBA':
-                                img = img.convert('RGB')
-                                img_buffer = io.BytesIO()
-                                img.save(img_buffer, format='JPEG')
-                                img_buffer.seek(0)
-                                valid_images.append(img_buffer.read())
-                            else:
-                                valid_images.append(img_path)
-                        
-                        self.log(f"Đã xử lý: {os.path.basename(img_path)}")
-                    except Exception as e:
-                        self.log(f"Lỗi khi xử lý ảnh {os.path.basename(img_path)}: {str(e)}")
-                        continue
-                
-                # Loại bỏ trùng lặp trong danh sách các ảnh đệm
-                # Với files, chúng ta có thể kiểm tra đường dẫn
-                # Với dữ liệu đệm, không thể kiểm tra trùng lặp dễ dàng nên cứ giữ nguyên
-                unique_images = []
-                seen_paths = set()
-                
-                for item in valid_images:
-                    if isinstance(item, str):  # Nếu là đường dẫn file
-                        if item not in seen_paths:
-                            seen_paths.add(item)
-                            unique_images.append(item)
-                    else:  # Nếu là dữ liệu đệm
-                        unique_images.append(item)
-                
-                # Tạo PDF
-                if unique_images:
-                    with open(output_file, "wb") as f:
-                        f.write(img2pdf.convert(unique_images))
-                        
-                        # Ghi log số lượng ảnh đã chuyển đổi
-                        self.log(f"Đã chuyển đổi {len(unique_images)} ảnh sang PDF (không giữ tỷ lệ)")
-                else:
-                    self.log("Không có ảnh nào được xử lý thành công.")
-                    raise Exception("Không có ảnh nào được xử lý thành công")
-            
-            self.log(f"Đã tạo thành công file PDF: {output_file}")
-            
-        except Exception as e:
-            self.log(f"Lỗi khi tạo PDF: {str(e)}")
-            raise
+                messagebox.showerror("Lỗi", str(error))
+            return
+        
+        if options.separate_by_ratio:
+            labels = {"landscape": "ảnh 16:9", "portrait": "ảnh 9:16", "other": "ảnh tỷ lệ khác"}
+            message = f"Đã tạo thành công các file PDF:\n"
+            for output in result.outputs:
+                message += f"- {output.image_count} {labels[output.ratio_type]}: {os.path.basename(output.path)}\n"
+        else:
+            message = f"Đã chuyển đổi {result.image_count} ảnh thành file PDF"
+        
+        if result.errors:
+            message += f"\nCó {len(result.errors)} ảnh không xử lý được (xem nhật ký hoạt động)."
+        
+        # Tự động dọn dẹp nếu được cấu hình
+        if self.auto_clean_temp.get():
+            files_removed, size_freed = self.clean_temp_files()
+            self.log(f"Đã tự động dọn dẹp {files_removed} file tạm, giải phóng {size_freed:.2f} MB.")
+        
+        messagebox.showinfo("Thành công", message)
     
     def on_closing(self):
         """Xử lý khi đóng ứng dụng"""
@@ -899,6 +670,7 @@ class ImageToPDFConverter:
                 messagebox.showinfo("Đã dọn dẹp", f"Đã xóa {files_removed} file tạm, giải phóng {size_freed:.2f} MB dung lượng.")
         
         # Đóng ứng dụng
+        self.temp_storage.close()
         self.root.destroy()
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+"""Chuyển đổi hàng loạt ảnh sang PDF, dùng được cả khi không có giao diện"""
+from .engine import (
+    DEFAULT_TEMP_FOLDER,
+    ConversionCancelled,
+    ConversionEngine,
+    ConversionError,
+    ConversionOptions,
+    ConversionResult,
+    ImageError,
+    OutputFile,
+    convert,
+    get_aspect_ratio,
+    is_landscape,
+    remove_temp_files,
+)
+from .buckets import DEFAULT_BUCKETS, BucketRule, BucketTable, load_bucket_table
+from .cache import PageCache, default_cache_dir
+from .compute import get_backend, self_check
+from .dedup import DuplicateImage, HammingIndex, dhash, file_digest, find_duplicates, phash
+from .encoders import PageImage, encode_image
+from .hardware import GPUStatus, detect_gpu
+from .layout import PageLayout, parse_page_size
+from .metrics import Metrics, Profiler, write_metrics
+from .manifest import (
+    build_manifest_path,
+    load_manifest,
+    manifest_path,
+    remove_manifest,
+    save_build_manifest,
+    save_manifest,
+)
+from .metadata import ImageInfo, read_image_info, scan_image_infos
+from .pdfwriter import PageRecord, StreamingPDFWriter
+from .profiles import PROFILES, CompressionProfile, get_profile
+from .preprocess import NormalizedImage, iter_normalized, normalize_image
+from .tempstore import TempStorage
+from .volumes import plan_volumes, volume_path, write_volume_index
+from .verify import PDFSummary, PDFVerifyError, verify_page_checksums, verify_pdf
+
+__all__ = [
+    "DEFAULT_TEMP_FOLDER", "ConversionCancelled", "ConversionEngine", "ConversionError", "ConversionOptions",
+    "ConversionResult", "ImageError", "OutputFile", "convert", "get_aspect_ratio", "is_landscape",
+    "remove_temp_files", "DEFAULT_BUCKETS", "BucketRule", "BucketTable", "load_bucket_table", "PageCache",
+    "default_cache_dir", "get_backend", "self_check", "DuplicateImage", "HammingIndex", "dhash",
+    "file_digest", "find_duplicates", "phash", "PageImage", "encode_image", "GPUStatus", "detect_gpu",
+    "PageLayout", "parse_page_size", "Metrics", "Profiler", "write_metrics", "build_manifest_path",
+    "load_manifest", "manifest_path", "remove_manifest", "save_build_manifest", "save_manifest", "ImageInfo",
+    "read_image_info", "scan_image_infos", "PageRecord", "StreamingPDFWriter", "PROFILES", "CompressionProfile", "get_profile",
+    "NormalizedImage", "iter_normalized", "normalize_image", "TempStorage", "plan_volumes", "volume_path",
+    "write_volume_index", "PDFSummary", "PDFVerifyError", "verify_page_checksums", "verify_pdf",
+]
+
+__version__ = "1.1.0"
@@ -0,0 +1,292 @@
+"""Đo hiệu năng của pipeline chuyển đổi trên bộ ảnh tổng hợp.
+
+    python -m imagetopdf.benchmark --counts 20 --sizes 640 1920 -o ket_qua.json
+
+Bộ ảnh gồm JPEG, PNG, PNG có kênh alpha và WebP ở nhiều độ phân giải, với ba
+tỷ lệ khung hình 16:9, 9:16 và 4:3 để get_aspect_ratio chia đủ ba nhóm. Ảnh
+được sinh từ một seed cố định nên mỗi lần chạy dùng đúng cùng dữ liệu, và được
+giữ lại trong thư mục corpus để dùng lại giữa các lần đo.
+
+Mỗi kịch bản (tổ hợp tùy chọn chuyển đổi) chạy trong một tiến trình riêng để
+bộ nhớ tối đa (peak RSS) không bị ảnh hưởng bởi kịch bản trước. Kết quả là
+JSON gồm thời gian từng giai đoạn (find, scan, classify, normalize, write),
+số trang/giây, MB/giây và peak RSS.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import queue as queue_module
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from . import __version__
+from .engine import ConversionOptions, convert
+
+FORMATS = ("jpeg", "png", "rgba_png", "webp")
+
+# Chu kỳ (giây) kiểm tra tiến trình chạy kịch bản còn sống trong lúc chờ báo cáo
+REPORT_POLL_INTERVAL = 1.0
+
+# Tỷ lệ (rộng, cao) của từng nhóm; "other" là 4:3
+RATIOS = {
+    "landscape": (16, 9),
+    "portrait": (9, 16),
+    "other": (4, 3),
+}
+
+# Các kịch bản mặc định: tên -> tùy chọn của ConversionOptions
+SCENARIOS = {
+    "img2pdf": {},
+    "img2pdf_parallel": {"workers": 0},
+    "streaming": {"streaming": True},
+    "streaming_parallel": {"streaming": True, "workers": 0},
+    "web_parallel": {"streaming": True, "compression": "web", "workers": 0},
+    "a4_150dpi_parallel": {"page_size": "A4", "max_dpi": 150, "workers": 0},
+}
+
+_EXTENSIONS = {"jpeg": "jpg", "png": "png", "rgba_png": "png", "webp": "webp"}
+
+
+def _synthetic_pixels(rng, width, height, channels):
+    """Ảnh có gradient và nhiễu nhẹ: nén được như ảnh thật, không quá dễ như ảnh một màu"""
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    x = np.linspace(0, 255, width, dtype=np.float32)[None, :]
+    base = [(x + y) / 2, x, y, 255 - x]
+    pixels = np.stack([np.broadcast_to(channel, (height, width)) for channel in base[:channels]], axis=-1)
+    pixels += rng.normal(0, 12, pixels.shape).astype(np.float32)
+    return np.clip(pixels, 0, 255).astype(np.uint8)
+
+
+def _corpus_size(long_edge, ratio):
+    ratio_w, ratio_h = RATIOS[ratio]
+    if ratio_w >= ratio_h:
+        return long_edge, long_edge * ratio_h // ratio_w
+    return long_edge * ratio_w // ratio_h, long_edge
+
+
+def generate_corpus(folder, counts=10, sizes=(640, 1920), formats=FORMATS, seed=0):
+    """Sinh bộ ảnh tổng hợp vào folder (dùng lại nếu đã sinh với cùng tham số); trả về mô tả bộ ảnh"""
+    spec = {"counts": counts, "sizes": list(sizes), "formats": list(formats), "seed": seed}
+    spec_file = os.path.join(folder, "corpus.json")
+    try:
+        with open(spec_file, "r", encoding="utf-8") as f:
+            corpus = json.load(f)
+        if corpus["spec"] == spec:
+            return corpus
+    except (OSError, ValueError, KeyError):
+        pass
+
+    if os.path.exists(spec_file):
+        # Thư mục do benchmark tạo ra với tham số khác: sinh lại từ đầu
+        shutil.rmtree(folder)
+    elif os.path.isdir(folder) and os.listdir(folder):
+        raise ValueError(f"Thư mục {folder} không trống và không phải bộ ảnh do benchmark tạo ra")
+    os.makedirs(folder, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    total_bytes = 0
+    image_count = 0
+    for fmt in formats:
+        for long_edge in sizes:
+            for ratio in RATIOS:
+                width, height = _corpus_size(long_edge, ratio)
+                for i in range(counts):
+                    pixels = _synthetic_pixels(rng, width, height, 4 if fmt == "rgba_png" else 3)
+                    path = os.path.join(folder, f"{fmt}_{long_edge}_{ratio}_{i:04d}.{_EXTENSIONS[fmt]}")
+                    img = Image.fromarray(pixels)
+                    if fmt == "jpeg":
+                        img.save(path, "JPEG", quality=90)
+                    elif fmt == "webp":
+                        img.save(path, "WEBP", quality=80)
+                    else:
+                        img.save(path, "PNG")
+                    total_bytes += os.path.getsize(path)
+                    image_count += 1
+
+    corpus = {"spec": spec, "image_count": image_count, "total_bytes": total_bytes}
+    with open(spec_file, "w", encoding="utf-8") as f:
+        json.dump(corpus, f)
+    return corpus
+
+
+def _peak_rss_bytes():
+    """Bộ nhớ tối đa của tiến trình hiện tại cộng tiến trình con lớn nhất (None nếu hệ điều hành không hỗ trợ)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss tính bằng KB trên Linux và bằng byte trên macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return (own + children) * unit
+
+
+def _run_scenario(corpus_dir, work_dir, overrides, queue):
+    # Mọi lỗi (kể cả tùy chọn sai hay file kết quả biến mất) đều được gửi về trong báo cáo
+    report = {}
+    error = None
+    start = time.perf_counter()
+    elapsed = None
+    try:
+        output_file = os.path.join(work_dir, "out.pdf")
+        options = ConversionOptions(corpus_dir, output_file, temp_folder=os.path.join(work_dir, "tmp"), **overrides)
+        result = convert(options)
+        elapsed = time.perf_counter() - start
+        report.update(
+            pages=sum(output.image_count for output in result.outputs),
+            outputs=len(result.outputs),
+            errors=len(result.errors),
+            output_bytes=sum(os.path.getsize(output.path) for output in result.outputs),
+            stages=result.stage_times,
+            metrics=result.metrics.to_dict(),
+        )
+    except Exception as e:
+        error = str(e)
+    if elapsed is None:
+        elapsed = time.perf_counter() - start
+    report.update(seconds=elapsed, error=error, peak_rss_bytes=_peak_rss_bytes())
+    queue.put(report)
+
+
+def _wait_for_report(process, queue, start):
+    """Chờ báo cáo của tiến trình chạy kịch bản; tiến trình thoát mà không gửi báo cáo
+    (bị hệ điều hành dừng vì hết bộ nhớ, lỗi trong thư viện C...) thì trả về báo cáo lỗi"""
+    while True:
+        try:
+            return queue.get(timeout=REPORT_POLL_INTERVAL)
+        except queue_module.Empty:
+            if process.is_alive():
+                continue
+        # Báo cáo có thể vừa được gửi ngay trước khi tiến trình thoát
+        try:
+            return queue.get(timeout=REPORT_POLL_INTERVAL)
+        except queue_module.Empty:
+            process.join()
+            return {"seconds": time.perf_counter() - start, "error": f"exit code {process.exitcode}",
+                    "peak_rss_bytes": None}
+
+
+def run_scenario(corpus_dir, overrides):
+    """Chạy một kịch bản trong tiến trình riêng và trả về số đo"""
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    with tempfile.TemporaryDirectory(prefix="imagetopdf_bench_") as work_dir:
+        process = context.Process(target=_run_scenario, args=(corpus_dir, work_dir, overrides, queue))
+        start = time.perf_counter()
+        process.start()
+        try:
+            report = _wait_for_report(process, queue, start)
+        finally:
+            process.join()
+    return report
+
+
+def _summarize(name, overrides, corpus, runs):
+    # Dùng lần chạy nhanh nhất cho số liệu thông lượng, giữ lại thời gian của tất cả các lần
+    ok_runs = [run for run in runs if run["error"] is None]
+    summary = {"name": name, "options": overrides, "runs": runs}
+    if not ok_runs:
+        summary["error"] = runs[0]["error"]
+        return summary
+    best = min(ok_runs, key=lambda run: run["seconds"])
+    summary.update(
+        seconds=best["seconds"],
+        seconds_all=[run["seconds"] for run in ok_runs],
+        pages=best["pages"],
+        pages_per_s=best["pages"] / best["seconds"],
+        mb_per_s=corpus["total_bytes"] / (1024 * 1024) / best["seconds"],
+        output_mb=best["output_bytes"] / (1024 * 1024),
+        peak_rss_mb=max(run["peak_rss_bytes"] for run in ok_runs) / (1024 * 1024)
+        if best["peak_rss_bytes"] is not None else None,
+        stages=best["stages"],
+        metrics=best["metrics"],
+    )
+    return summary
+
+
+def run_benchmark(corpus_dir, scenarios=None, repeat=1, on_log=None, **corpus_args):
+    """Sinh bộ ảnh (nếu cần), chạy các kịch bản và trả về báo cáo dạng dict"""
+    log = on_log or (lambda message: None)
+    scenarios = scenarios or SCENARIOS
+    log("Đang chuẩn bị bộ ảnh tổng hợp...")
+    corpus = generate_corpus(corpus_dir, **corpus_args)
+    log(f"Bộ ảnh: {corpus['image_count']} ảnh, {corpus['total_bytes'] / (1024 * 1024):.1f} MB")
+
+    results = []
+    for name, overrides in scenarios.items():
+        runs = []
+        for i in range(repeat):
+            log(f"Kịch bản {name} ({i + 1}/{repeat})...")
+            runs.append(run_scenario(corpus_dir, overrides))
+        summary = _summarize(name, overrides, corpus, runs)
+        if "error" in summary:
+            log(f"  Lỗi: {summary['error']}")
+        else:
+            log(f"  {summary['seconds']:.2f} s, {summary['pages_per_s']:.1f} trang/s, {summary['mb_per_s']:.1f} MB/s")
+        results.append(summary)
+
+    return {
+        "version": __version__,
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "corpus": corpus,
+        "scenarios": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m imagetopdf.benchmark",
+        description="Đo hiệu năng chuyển đổi ảnh sang PDF trên bộ ảnh tổng hợp, xuất kết quả JSON",
+    )
+    parser.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "imagetopdf_bench_corpus"),
+                        help="Thư mục chứa bộ ảnh tổng hợp (dùng lại nếu đã có)")
+    parser.add_argument("--counts", type=int, default=10,
+                        help="Số ảnh cho mỗi tổ hợp định dạng/độ phân giải/tỷ lệ (mặc định: %(default)s)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[640, 1920],
+                        help="Cạnh dài của ảnh, tính bằng pixel (mặc định: %(default)s)")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS),
+                        help="Định dạng ảnh trong bộ ảnh")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenarios", nargs="+", choices=sorted(SCENARIOS), default=None,
+                        help="Các kịch bản cần chạy (mặc định: tất cả)")
+    parser.add_argument("--repeat", type=int, default=1, help="Số lần chạy mỗi kịch bản")
+    parser.add_argument("-o", "--output", default=None, help="File JSON kết quả (mặc định: in ra màn hình)")
+    args = parser.parse_args(argv)
+
+    scenarios = {name: SCENARIOS[name] for name in args.scenarios} if args.scenarios else None
+    try:
+        report = run_benchmark(
+            args.corpus_dir,
+            scenarios=scenarios,
+            repeat=max(1, args.repeat),
+            on_log=lambda message: print(message, file=sys.stderr, flush=True),
+            counts=args.counts,
+            sizes=args.sizes,
+            formats=args.formats,
+            seed=args.seed,
+        )
+    except ValueError as e:
+        print(f"Lỗi: {str(e)}", file=sys.stderr)
+        return 2
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0 if all("error" not in scenario for scenario in report["scenarios"]) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,202 @@
+"""Phân nhóm ảnh theo tỷ lệ khung hình bằng bảng quy tắc cấu hình được.
+
+Mỗi quy tắc (BucketRule) là một nhóm có tên với các điều kiện tùy chọn: tỷ lệ
+cạnh dài/cạnh ngắn gần một giá trị cho trước (kèm sai số), khoảng tỷ lệ, hướng
+ảnh và độ phân giải tối thiểu. Ảnh thuộc nhóm của quy tắc đầu tiên khớp, hoặc
+nhóm mặc định nếu không quy tắc nào khớp. Bảng định tuyến (outputs) ánh xạ mỗi
+nhóm tới hậu tố tên file PDF; các nhóm cùng hậu tố được ghi chung một file.
+
+Việc phân nhóm chỉ dùng kích thước trong ImageInfo đã đọc ở bước quét và được
+tính một lượt trên mảng NumPy cho toàn bộ ảnh, không mở lại file nào.
+
+Bảng quy tắc đọc được từ file JSON, ví dụ tách riêng ảnh scan 4:3 và ảnh chụp 3:2:
+
+    {
+      "buckets": [
+        {"name": "landscape", "orientation": "landscape", "min_aspect": 1.5},
+        {"name": "portrait", "orientation": "portrait", "min_aspect": 1.5},
+        {"name": "scan", "ratio": "4:3", "tolerance": 0.02},
+        {"name": "photo", "ratio": "3:2", "min_pixels": 2000000}
+      ],
+      "outputs": {"landscape": "_16x9", "portrait": "_9x16", "scan": "_4x3", "photo": "_3x2"},
+      "default": "other"
+    }
+"""
+import json
+import re
+from dataclasses import dataclass, fields
+
+import numpy as np
+
+ORIENTATIONS = ("landscape", "portrait", "square")
+
+_RATIO = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*[:x/]\s*(\d+(?:\.\d+)?)\s*$")
+
+
+def parse_ratio(value):
+    """Tỷ lệ dạng số hoặc chuỗi "4:3", "16x9", "1.333" thành cạnh dài/cạnh ngắn (luôn ≥ 1)"""
+    if isinstance(value, str):
+        match = _RATIO.match(value)
+        try:
+            ratio = float(match.group(1)) / float(match.group(2)) if match else float(value)
+        except (ValueError, ZeroDivisionError):
+            raise ValueError(f"Tỷ lệ không hợp lệ: {value}")
+    else:
+        ratio = float(value)
+    if not ratio > 0:
+        raise ValueError(f"Tỷ lệ không hợp lệ: {value}")
+    return max(ratio, 1 / ratio)
+
+
+def _default_suffix(name):
+    # "4:3" -> "_4x3"
+    return "_" + re.sub(r"[^\w.-]+", "x", name)
+
+
+@dataclass(frozen=True)
+class BucketRule:
+    """Điều kiện của một nhóm; các điều kiện để None không được kiểm tra"""
+    name: str
+    # Tỷ lệ cạnh dài/cạnh ngắn mong muốn và sai số tương đối cho phép
+    ratio: float = None
+    tolerance: float = 0.02
+    # "landscape" (rộng > cao), "portrait" (cao > rộng) hoặc "square"
+    orientation: str = None
+    # Cạnh dài/cạnh ngắn phải lớn hơn min_aspect và không vượt quá max_aspect
+    min_aspect: float = None
+    max_aspect: float = None
+    # Số điểm ảnh tối thiểu và cạnh ngắn tối thiểu (pixel)
+    min_pixels: int = None
+    min_short_side: int = None
+
+    def __post_init__(self):
+        if self.orientation is not None and self.orientation not in ORIENTATIONS:
+            raise ValueError(f"orientation của nhóm {self.name} phải là một trong {ORIENTATIONS}")
+        if self.ratio is not None:
+            object.__setattr__(self, "ratio", parse_ratio(self.ratio))
+
+    def matches(self, widths, heights, aspects):
+        """Mảng bool: ảnh nào thỏa mọi điều kiện của quy tắc"""
+        mask = np.ones(len(widths), dtype=bool)
+        if self.orientation == "landscape":
+            mask &= widths > heights
+        elif self.orientation == "portrait":
+            mask &= heights > widths
+        elif self.orientation == "square":
+            mask &= widths == heights
+        if self.ratio is not None:
+            mask &= np.abs(aspects / self.ratio - 1) <= self.tolerance
+        if self.min_aspect is not None:
+            mask &= aspects > self.min_aspect
+        if self.max_aspect is not None:
+            mask &= aspects <= self.max_aspect
+        if self.min_pixels is not None:
+            mask &= widths * heights >= self.min_pixels
+        if self.min_short_side is not None:
+            mask &= np.minimum(widths, heights) >= self.min_short_side
+        return mask
+
+
+class BucketTable:
+    """Danh sách quy tắc theo thứ tự ưu tiên cùng bảng định tuyến nhóm -> hậu tố file PDF.
+
+    Nhóm đầu ra (group) gồm các nhóm có cùng hậu tố; tên của nó là tên nhóm nếu
+    chỉ có một, hoặc các tên nối bằng "+".
+    """
+
+    def __init__(self, rules, outputs=None, default="other"):
+        self.rules = tuple(rules)
+        self.default = default
+        names = [rule.name for rule in self.rules] + [default]
+        if len(set(names)) != len(names):
+            raise ValueError("Tên nhóm bị trùng (kể cả nhóm mặc định)")
+        outputs = outputs or {}
+        unknown = set(outputs) - set(names)
+        if unknown:
+            raise ValueError(f"Bảng định tuyến có nhóm không tồn tại: {', '.join(sorted(unknown))}")
+
+        # hậu tố -> các nhóm ghi vào file đó, theo thứ tự xuất hiện
+        members = {}
+        for name in names:
+            members.setdefault(outputs.get(name) or _default_suffix(name), []).append(name)
+        self._suffixes = {}
+        self._orientations = {}
+        self._group_of = {}
+        rule_orientations = {rule.name: rule.orientation for rule in self.rules}
+        for suffix, group_names in members.items():
+            group = "+".join(group_names)
+            self._suffixes[group] = suffix
+            orientations = {rule_orientations.get(name) for name in group_names}
+            # Trang có hướng cố định chỉ khi mọi nhóm trong file cùng là ngang hoặc cùng là dọc
+            self._orientations[group] = orientations.pop() if len(orientations) == 1 else None
+            for name in group_names:
+                self._group_of[name] = group
+        self._bucket_groups = [self._group_of[name] for name in names]
+
+    @property
+    def groups(self):
+        """Tên các nhóm đầu ra theo thứ tự"""
+        return list(self._suffixes)
+
+    def suffix(self, group):
+        return self._suffixes[group]
+
+    def orientation(self, group):
+        """Hướng trang chung của một nhóm đầu ra ("landscape", "portrait") hoặc None"""
+        orientation = self._orientations.get(group)
+        return orientation if orientation in ("landscape", "portrait") else None
+
+    def classify(self, infos):
+        """Chia danh sách ImageInfo thành {nhóm đầu ra: [ImageInfo]}, giữ thứ tự đầu vào; mọi nhóm đều có mặt"""
+        sizes = np.array([info.size for info in infos], dtype=np.int64).reshape(-1, 2)
+        widths, heights = sizes[:, 0], sizes[:, 1]
+        aspects = np.maximum(widths, heights) / np.maximum(np.minimum(widths, heights), 1)
+
+        # Quy tắc đầu tiên khớp quyết định nhóm; ảnh không khớp quy tắc nào vào nhóm mặc định
+        buckets = np.full(len(infos), len(self.rules), dtype=np.int32)
+        unassigned = np.ones(len(infos), dtype=bool)
+        for i, rule in enumerate(self.rules):
+            matched = unassigned & rule.matches(widths, heights, aspects)
+            buckets[matched] = i
+            unassigned &= ~matched
+
+        groups = self.groups
+        group_index = np.array([groups.index(group) for group in self._bucket_groups], dtype=np.int32)
+        assigned = group_index[buckets]
+        return {group: [infos[j] for j in np.flatnonzero(assigned == i)] for i, group in enumerate(groups)}
+
+    @classmethod
+    def from_dict(cls, data):
+        """Tạo bảng từ dict có cấu trúc như file JSON (xem đầu module)"""
+        allowed = {field.name for field in fields(BucketRule)}
+        rules = []
+        for entry in data.get("buckets", []):
+            unknown = set(entry) - allowed
+            if unknown:
+                raise ValueError(f"Quy tắc {entry.get('name')} có khóa không hợp lệ: {', '.join(sorted(unknown))}")
+            if "name" not in entry:
+                raise ValueError("Mỗi quy tắc cần có name")
+            rules.append(BucketRule(**entry))
+        return cls(rules, data.get("outputs"), data.get("default", "other"))
+
+
+def load_bucket_table(source):
+    """Bảng quy tắc từ file JSON (đường dẫn) hoặc dict cùng cấu trúc"""
+    if isinstance(source, dict):
+        return BucketTable.from_dict(source)
+    with open(source, "r", encoding="utf-8") as f:
+        try:
+            data = json.load(f)
+        except ValueError as e:
+            raise ValueError(f"File quy tắc phân nhóm {source} không phải JSON hợp lệ: {str(e)}")
+    return BucketTable.from_dict(data)
+
+
+# Cách phân nhóm mặc định, giống get_aspect_ratio: gần 16:9, gần 9:16 và các tỷ lệ khác
+DEFAULT_BUCKETS = BucketTable(
+    [
+        BucketRule("landscape", orientation="landscape", min_aspect=1.5),
+        BucketRule("portrait", orientation="portrait", min_aspect=1.5),
+    ],
+    {"landscape": "_16x9", "portrait": "_9x16", "other": "_other"},
+)
@@ -0,0 +1,229 @@
+"""Bộ nhớ đệm lâu dài trên đĩa cho dữ liệu trang đã mã hóa.
+
+Mỗi mục được định danh theo (đường dẫn, kích thước, thời gian sửa đổi) của ảnh
+nguồn, hoặc theo mã băm nội dung file, cộng với loại dữ liệu và phiên bản bộ
+mã hóa. Khi dựng lại một thư mục mà phần lớn ảnh không đổi, các trang đã mã hóa
+được đọc lại từ đệm thay vì giải mã và nén lại.
+
+Chỉ mục được lưu trong SQLite (thư viện chuẩn) để nhiều tiến trình có thể dùng
+chung một thư mục đệm; dữ liệu mỗi mục nằm trong một file riêng. Khi tổng dung
+lượng vượt max_bytes, các mục lâu nhất chưa được dùng sẽ bị xóa (LRU).
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import sys
+import threading
+import time
+
+from .encoders import PageImage
+
+# Tăng giá trị này khi thay đổi cách mã hóa để bỏ qua dữ liệu đệm cũ
+ENCODER_VERSION = 1
+
+# Dung lượng tối đa mặc định của bộ nhớ đệm
+DEFAULT_CACHE_BYTES = 1024 * 1024 * 1024
+
+# Cách tạo khóa: theo thông tin file (nhanh) hoặc theo mã băm nội dung (chính xác khi file bị sao chép/đổi tên)
+KEY_MODES = ("stat", "content")
+
+_PAGE_FIELDS = ("width", "height", "color_space", "bits", "filter_name", "width_pt", "height_pt",
+                "rotate", "decode", "decode_parms", "page_width_pt", "page_height_pt", "offset_x", "offset_y")
+
+
+def default_cache_dir():
+    """Thư mục đệm mặc định theo quy ước của từng hệ điều hành"""
+    if sys.platform == "win32":
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    elif sys.platform == "darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+    return os.path.join(base, "ImageToPDF", "pages")
+
+
+def _file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def dump_page(page):
+    """Tuần tự hóa PageImage: độ dài header, header JSON, dữ liệu ảnh, dữ liệu SMask"""
+    header = {name: getattr(page, name) for name in _PAGE_FIELDS}
+    header["data_length"] = len(page.data)
+    header["smask_length"] = len(page.smask) if page.smask is not None else -1
+    header_bytes = json.dumps(header).encode("utf-8")
+    return b"".join([struct.pack(">I", len(header_bytes)), header_bytes, page.data, page.smask or b""])
+
+
+def load_page(blob):
+    """Khôi phục PageImage từ dữ liệu của dump_page"""
+    header_length = struct.unpack(">I", blob[:4])[0]
+    header = json.loads(blob[4:4 + header_length].decode("utf-8"))
+    start = 4 + header_length
+    data = blob[start:start + header.pop("data_length")]
+    smask_length = header.pop("smask_length")
+    smask = None
+    if smask_length >= 0:
+        smask_start = start + len(data)
+        smask = blob[smask_start:smask_start + smask_length]
+    return PageImage(data, smask=smask, **header)
+
+
+class PageCache:
+    """Bộ nhớ đệm LRU trên đĩa cho dữ liệu đã mã hóa của từng ảnh.
+
+    kind phân biệt các loại dữ liệu cho cùng một ảnh: "page" là PageImage cho
+    bộ ghi PDF theo luồng, "jpeg" là bytes JPEG đã chuyển đổi cho img2pdf.
+    """
+
+    def __init__(self, root=None, max_bytes=DEFAULT_CACHE_BYTES, key_mode="stat", variant=""):
+        if key_mode not in KEY_MODES:
+            raise ValueError(f"key_mode phải là một trong {KEY_MODES}")
+        self.root = root or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.key_mode = key_mode
+        # Chuỗi mô tả các tùy chọn mã hóa ảnh hưởng tới dữ liệu (ví dụ hồ sơ nén)
+        self.variant = variant
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        # Thời điểm dùng gần nhất của các mục vừa đọc, ghi vào chỉ mục theo lô
+        self._touched = {}
+        os.makedirs(self.root, exist_ok=True)
+        # Các file PDF được tạo cùng lúc dùng chung bộ đệm từ nhiều luồng
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(self.root, "index.sqlite"), timeout=30, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+        self._db.commit()
+        # Tổng dung lượng ước tính, đồng bộ lại với chỉ mục mỗi khi dọn dẹp
+        self._total = self.total_bytes
+        if self._total > self.max_bytes:
+            self.evict()
+
+    def close(self):
+        with self._lock:
+            self.flush()
+            self._db.close()
+
+    def flush(self):
+        """Ghi thời điểm dùng gần nhất của các mục đã đọc vào chỉ mục"""
+        with self._lock:
+            if self._touched:
+                self._db.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                     [(used, key) for key, used in self._touched.items()])
+                self._db.commit()
+                self._touched = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    @property
+    def total_bytes(self):
+        with self._lock:
+            return self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def key_for(self, info, kind, variant=""):
+        """Khóa của một ảnh (ImageInfo) cho một loại dữ liệu; variant bổ sung cho variant của bộ đệm"""
+        if self.key_mode == "content":
+            identity = _file_digest(info.path)
+        else:
+            stat = os.stat(info.path)
+            identity = f"{os.path.abspath(info.path)}\0{stat.st_size}\0{stat.st_mtime_ns}"
+        raw = f"{ENCODER_VERSION}\0{kind}\0{self.variant}{variant}\0{identity}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, info, kind, variant=""):
+        """Trả về dữ liệu đã lưu (PageImage hoặc bytes) hoặc None nếu chưa có"""
+        try:
+            key = self.key_for(info, kind, variant)
+            with open(self._entry_path(key), "rb") as f:
+                blob = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self._touched[key] = time.time()
+            if len(self._touched) >= 256:
+                self.flush()
+            self.hits += 1
+        return load_page(blob) if kind == "page" else blob
+
+    def put(self, info, kind, value, variant=""):
+        """Lưu dữ liệu của một ảnh rồi xóa bớt các mục cũ nếu vượt dung lượng"""
+        blob = dump_page(value) if kind == "page" else bytes(value)
+        if len(blob) > self.max_bytes:
+            return
+        key = self.key_for(info, kind, variant)
+        path = self._entry_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        # Ghi ra file tạm rồi đổi tên để tiến trình khác không đọc phải dữ liệu dở dang
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(blob)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, size, last_used) VALUES (?, ?, ?)",
+                (key, len(blob), time.time()),
+            )
+            self._db.commit()
+            self.stores += 1
+            self._total += len(blob)
+            if self._total > self.max_bytes:
+                self.evict()
+
+    def evict(self, max_bytes=None):
+        """Xóa các mục lâu nhất chưa được dùng cho đến khi tổng dung lượng không vượt max_bytes"""
+        with self._lock:
+            return self._evict(self.max_bytes if max_bytes is None else max_bytes)
+
+    def _evict(self, limit):
+        self.flush()
+        total = self.total_bytes
+        self._total = total
+        if total <= limit:
+            return 0
+
+        removed = 0
+        while total > limit:
+            rows = self._db.execute("SELECT key, size FROM entries ORDER BY last_used LIMIT 256").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total <= limit:
+                    break
+                try:
+                    os.unlink(self._entry_path(key))
+                except OSError:
+                    pass
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                total -= size
+                removed += 1
+        self._db.commit()
+        self._total = total
+        return removed
+
+    def clear(self):
+        """Xóa toàn bộ dữ liệu đệm"""
+        return self.evict(0)
@@ -0,0 +1,216 @@
+"""Giao diện dòng lệnh: python -m imagetopdf <thư mục ảnh> <file PDF>"""
+import argparse
+import datetime
+import sys
+
+from .cache import DEFAULT_CACHE_BYTES, KEY_MODES, default_cache_dir
+from .compute import BACKENDS, self_check
+from .dedup import DEDUP_MODES
+from .engine import DEFAULT_TEMP_FOLDER, ConversionEngine, ConversionError, ConversionOptions, remove_temp_files
+from .layout import DEFAULT_MAX_DPI
+from .metrics import PROFILE_MODES
+from .profiles import PROFILES
+from .volumes import INDEX_FORMATS
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="python -m imagetopdf",
+        description="Chuyển đổi tất cả ảnh trong một thư mục thành file PDF",
+    )
+    parser.add_argument("input_folder", nargs="?", help="Thư mục chứa ảnh")
+    parser.add_argument("output_file", nargs="?", help="Đường dẫn file PDF đầu ra")
+    parser.add_argument("--check-backends", action="store_true",
+                        help="Kiểm tra các backend xử lý điểm ảnh cho kết quả khớp nhau rồi thoát")
+    add_conversion_arguments(parser)
+    return parser
+
+
+def add_conversion_arguments(parser):
+    """Thêm các tùy chọn chuyển đổi (dùng chung cho chế độ theo dõi thư mục)"""
+    parser.add_argument("--sort-by-name", action=argparse.BooleanOptionalAction, default=True,
+                        help="Sắp xếp ảnh theo tên file (mặc định: bật)")
+    parser.add_argument("--natural-sort", action="store_true",
+                        help="Sắp xếp tự nhiên theo số trong tên file: anh2 đứng trước anh10")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="Quét cả các thư mục con")
+    parser.add_argument("--per-folder", action="store_true",
+                        help="Cùng với --recursive: mỗi thư mục con có ảnh cho ra file PDF riêng trong thư mục "
+                             "cùng tên với file PDF đầu ra")
+    parser.add_argument("--include", action="append", default=[], metavar="MẪU",
+                        help="Chỉ lấy file khớp mẫu glob, ví dụ 'IMG_*' hoặc 'scan/*.png' (dùng được nhiều lần)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="MẪU",
+                        help="Bỏ qua file hoặc thư mục con khớp mẫu glob (dùng được nhiều lần)")
+    parser.add_argument("--sniff", action="store_true",
+                        help="Nhận diện ảnh theo nội dung đầu file thay vì phần mở rộng (ảnh đặt sai đuôi hoặc không có đuôi)")
+    parser.add_argument("--bucket-rules", default=None, metavar="FILE",
+                        help="File JSON quy tắc phân nhóm tỷ lệ và tên file PDF của từng nhóm "
+                             "(mặc định: 16:9, 9:16 và tỷ lệ khác)")
+    parser.add_argument("--dedup", choices=DEDUP_MODES, default=None,
+                        help="Bỏ ảnh trùng: exact (trùng từng byte), dhash hoặc phash (cùng hình ảnh dù khác tên, "
+                             "định dạng hoặc chất lượng nén)")
+    parser.add_argument("--dedup-threshold", type=int, default=None,
+                        help="Khoảng cách Hamming tối đa (trên 64 bit) để hai ảnh được coi là trùng với dhash/phash")
+    parser.add_argument("--dedup-share", action="store_true",
+                        help="Giữ trang của ảnh trùng nhưng chỉ nhúng ảnh gốc một lần (dùng bộ ghi theo luồng)")
+    parser.add_argument("--validate", action="store_true",
+                        help="Kiểm tra cả các ảnh được nhúng nguyên vẹn (JPEG bị cắt ngắn, PNG hỏng) song song trước khi ghi PDF "
+                             "bằng bộ ghi theo luồng; các cách ghi dùng img2pdf luôn kiểm tra")
+    parser.add_argument("--quarantine-dir", default=None, metavar="THƯ_MỤC",
+                        help="Chuyển các ảnh lỗi vào thư mục này sau khi chuyển đổi")
+    parser.add_argument("--error-report", default=None, metavar="FILE",
+                        help="Ghi danh sách ảnh lỗi kèm lý do: .csv là bảng CSV, đuôi khác là JSON")
+    parser.add_argument("--preserve-ratio", action=argparse.BooleanOptionalAction, default=True,
+                        help="Giữ nguyên tỷ lệ khung hình (mặc định: bật)")
+    parser.add_argument("--separate-by-ratio", action=argparse.BooleanOptionalAction, default=True,
+                        help="Tạo PDF riêng cho ảnh 16:9, 9:16 và tỷ lệ khác (mặc định: bật)")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="Số tiến trình tiền xử lý ảnh song song (0: tất cả các lõi CPU, mặc định: 1)")
+    parser.add_argument("--max-in-flight", type=int, default=None,
+                        help="Số ảnh tối đa đang được xử lý cùng lúc (mặc định: gấp đôi số tiến trình)")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Ghi PDF theo luồng từng trang, bộ nhớ tối đa chỉ khoảng một ảnh")
+    parser.add_argument("--backend", choices=BACKENDS, default=None,
+                        help="Xử lý điểm ảnh bằng NumPy (cpu), PyTorch (torch, dùng GPU nếu có) hoặc tự chọn (auto); "
+                             "mặc định dùng Pillow")
+    parser.add_argument("--page-size", default=None,
+                        help="Đặt ảnh lên trang khổ cố định: A4, Letter, A3, A5, Legal hoặc dạng 210x297mm "
+                             "(hướng trang theo nhóm tỷ lệ); mặc định trang vừa bằng ảnh")
+    parser.add_argument("--max-dpi", type=int, default=None,
+                        help=f"Thu nhỏ ảnh vượt quá DPI này trên trang (mặc định {DEFAULT_MAX_DPI} khi có --page-size; "
+                             "chỉ có --max-dpi thì dùng khổ A4)")
+    parser.add_argument("--compression", choices=list(PROFILES), default=None,
+                        help="Hồ sơ nén: archive (giữ chất lượng), balanced, web, minimal (nhỏ nhất); "
+                             "mặc định giữ nguyên JPEG/PNG nguồn")
+    parser.add_argument("--page-budget", type=int, default=None,
+                        help="Dung lượng tối đa dữ liệu ảnh mỗi trang, tính bằng kB; ảnh lớn hơn được nén JPEG vừa ngân sách")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Chỉ ghi thêm/ghi lại các trang có ảnh mới hoặc đã sửa, dựa trên manifest đi kèm PDF")
+    parser.add_argument("--volume-pages", type=int, default=None, metavar="N",
+                        help="Chia mỗi file PDF thành các tập <tên>_part001.pdf... tối đa N trang (file vừa một tập giữ nguyên tên)")
+    parser.add_argument("--volume-size", type=int, default=None, metavar="MB",
+                        help="Chia mỗi file PDF thành các tập tối đa khoảng MB megabyte (ước tính theo ảnh nguồn)")
+    parser.add_argument("--volume-index", choices=INDEX_FORMATS, default=None,
+                        help="Ghi mục lục các tập ra <tên>_index.json hoặc <tên>_index.pdf")
+    parser.add_argument("--build-manifest", action="store_true",
+                        help="Ghi <file PDF>.build.json: ảnh nguồn, kích thước, vị trí và CRC32 của từng trang (dùng bộ ghi theo luồng)")
+    parser.add_argument("--no-verify", action="store_true",
+                        help="Không kiểm tra số trang của file PDF vừa ghi")
+    parser.add_argument("--cache", action="store_true",
+                        help="Dùng bộ nhớ đệm lâu dài cho ảnh đã mã hóa (thư mục mặc định)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Thư mục bộ nhớ đệm (tự động bật --cache)")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+                        help="Dung lượng tối đa của bộ nhớ đệm, tính bằng MB (mặc định: %(default)s)")
+    parser.add_argument("--cache-key", choices=KEY_MODES, default="stat",
+                        help="Khóa đệm theo thông tin file (stat) hoặc mã băm nội dung (content)")
+    parser.add_argument("--temp-folder", default=DEFAULT_TEMP_FOLDER,
+                        help="Thư mục chứa file tạm")
+    parser.add_argument("--temp-quota", type=int, default=None,
+                        help="Hạn mức dung lượng file tạm, tính bằng MB; vượt quá thì xóa file tạm cũ của các lần chạy trước")
+    parser.add_argument("--keep-temp", action="store_true",
+                        help="Không xóa file tạm sau khi chuyển đổi")
+    parser.add_argument("--metrics-file", default=None,
+                        help="Ghi số đo từng giai đoạn: .prom/.txt theo định dạng Prometheus, đuôi khác là một dòng JSON")
+    parser.add_argument("--profile", choices=PROFILE_MODES, default=None,
+                        help="Bật cProfile (cpu), tracemalloc (memory) hoặc cả hai; kết quả ghi cạnh file PDF")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="Chỉ in lỗi và kết quả cuối cùng")
+
+
+def check_backends():
+    """In kết quả self_check của các backend; trả về 0 nếu tất cả đều đạt"""
+    failed = 0
+    for test, backend, error, tolerance, passed in self_check():
+        print(f"{'OK ' if passed else 'LỖI'} {backend:<12} {test:<14} sai lệch {error} (dung sai {tolerance})")
+        failed += not passed
+    return 1 if failed else 0
+
+
+def options_from_args(args, input_folder, output_file):
+    """Tạo ConversionOptions từ các tham số của add_conversion_arguments"""
+    return ConversionOptions(
+        input_folder=input_folder,
+        output_file=output_file,
+        sort_by_name=args.sort_by_name,
+        natural_sort=args.natural_sort,
+        recursive=args.recursive,
+        per_folder=args.per_folder,
+        include=tuple(args.include),
+        exclude=tuple(args.exclude),
+        sniff_content=args.sniff,
+        preserve_ratio=args.preserve_ratio,
+        separate_by_ratio=args.separate_by_ratio,
+        bucket_rules=args.bucket_rules,
+        dedup=args.dedup,
+        dedup_threshold=args.dedup_threshold,
+        dedup_share=args.dedup_share,
+        validate=args.validate,
+        quarantine_dir=args.quarantine_dir,
+        error_report=args.error_report,
+        temp_folder=args.temp_folder,
+        temp_max_bytes=args.temp_quota * 1024 * 1024 if args.temp_quota is not None else None,
+        workers=args.workers,
+        max_in_flight=args.max_in_flight,
+        streaming=args.streaming,
+        incremental=args.incremental,
+        build_manifest=args.build_manifest,
+        volume_pages=args.volume_pages,
+        volume_bytes=args.volume_size * 1024 * 1024 if args.volume_size is not None else None,
+        volume_index=args.volume_index,
+        verify_output=not args.no_verify,
+        page_size=args.page_size,
+        max_dpi=args.max_dpi,
+        compression=args.compression,
+        page_budget=args.page_budget * 1024 if args.page_budget is not None else None,
+        compute_backend=args.backend,
+        metrics_file=args.metrics_file,
+        profile=args.profile,
+        cache_dir=args.cache_dir or (default_cache_dir() if args.cache else None),
+        cache_max_bytes=args.cache_size * 1024 * 1024,
+        cache_key_mode=args.cache_key,
+    )
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.check_backends:
+        return check_backends()
+    if not args.input_folder or not args.output_file:
+        parser.error("cần chỉ định thư mục ảnh và file PDF đầu ra")
+
+    output_file = args.output_file
+    if not output_file.lower().endswith('.pdf'):
+        output_file += '.pdf'
+
+    options = options_from_args(args, args.input_folder, output_file)
+
+    def log(message):
+        if not args.quiet:
+            timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+            print(f"[{timestamp}] {message}", flush=True)
+
+    engine = ConversionEngine(options, on_log=log)
+    try:
+        result = engine.run()
+    except ConversionError as e:
+        print(f"Lỗi: {e}", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"Đã xảy ra lỗi: {e}", file=sys.stderr)
+        return 2
+    finally:
+        if not args.keep_temp:
+            remove_temp_files(engine.result, options.temp_folder)
+
+    for error in result.errors:
+        print(f"Bỏ qua {error.path}: {error.message}", file=sys.stderr)
+
+    for duplicate in result.duplicates:
+        print(f"Trùng {duplicate.path}: giống {duplicate.original}", file=sys.stderr)
+
+    for output in result.outputs:
+        print(f"{output.path}\t{output.image_count}")
+    return 0
@@ -0,0 +1,223 @@
+"""Các bước xử lý điểm ảnh chạy trên CPU (NumPy) hoặc GPU (PyTorch).
+
+Mỗi backend cung cấp cùng một tập phép toán trên mảng uint8 có dạng
+(..., cao, rộng, kênh), nên một lô ảnh cùng kích thước có thể được xử lý trong
+một lần gọi:
+
+- flatten_alpha: đặt ảnh RGBA/LA lên nền màu đặc
+- downscale: thu nhỏ theo hệ số nguyên bằng trung bình từng ô (box filter)
+- cmyk_to_rgb, rgb_to_gray: chuyển đổi không gian màu
+
+Mọi phép toán dùng số học nguyên với cùng cách làm tròn, nên hai backend cho
+kết quả giống nhau từng bit; cmyk_to_rgb và rgb_to_gray giống hệt Pillow.
+self_check() so sánh các backend với nhau và với Pillow trên dữ liệu ngẫu
+nhiên, chạy được trên máy không có GPU.
+"""
+import numpy as np
+from PIL import Image
+
+BACKENDS = ("cpu", "torch", "auto")
+
+# Hệ số chuyển RGB sang xám giống Pillow (ITU-R 601-2, số nguyên 16 bit)
+_GRAY_WEIGHTS = (19595, 38470, 7471)
+
+_backends = {}
+
+
+def _muldiv255(a, b):
+    # a * b / 255 làm tròn, giống macro MULDIV255 của Pillow
+    tmp = a * b + 128
+    return ((tmp >> 8) + tmp) >> 8
+
+
+def _block_counts(length, factor):
+    """Số điểm ảnh của từng ô khi chia length thành các ô dài factor (ô cuối có thể ngắn hơn)"""
+    counts = np.full(-(-length // factor), factor, dtype=np.int64)
+    if length % factor:
+        counts[-1] = length % factor
+    return counts
+
+
+class NumpyBackend:
+    """Backend CPU dùng NumPy"""
+    name = "cpu"
+    device = "cpu"
+
+    def flatten_alpha(self, pixels, background=(255, 255, 255)):
+        pixels = np.asarray(pixels)
+        color = pixels[..., :-1].astype(np.int32)
+        alpha = pixels[..., -1:].astype(np.int32)
+        bg = np.asarray(background[:color.shape[-1]], dtype=np.int32)
+        return ((color * alpha + bg * (255 - alpha) + 127) // 255).astype(np.uint8)
+
+    def downscale(self, pixels, factor):
+        pixels = np.asarray(pixels)
+        if factor <= 1:
+            return pixels
+        height, width = pixels.shape[-3], pixels.shape[-2]
+        out_h, out_w = -(-height // factor), -(-width // factor)
+        pad = [(0, 0)] * (pixels.ndim - 3) + [(0, out_h * factor - height), (0, out_w * factor - width), (0, 0)]
+        padded = np.pad(pixels.astype(np.int64), pad)
+        shape = padded.shape[:-3] + (out_h, factor, out_w, factor, padded.shape[-1])
+        sums = padded.reshape(shape).sum(axis=(-4, -2))
+        counts = np.outer(_block_counts(height, factor), _block_counts(width, factor))[..., None]
+        return ((sums + counts // 2) // counts).astype(np.uint8)
+
+    def cmyk_to_rgb(self, pixels):
+        pixels = np.asarray(pixels).astype(np.int32)
+        nk = 255 - pixels[..., 3:4]
+        return (nk - _muldiv255(pixels[..., :3], nk)).astype(np.uint8)
+
+    def rgb_to_gray(self, pixels):
+        pixels = np.asarray(pixels).astype(np.int32)
+        r, g, b = _GRAY_WEIGHTS
+        gray = (pixels[..., 0] * r + pixels[..., 1] * g + pixels[..., 2] * b + 0x8000) >> 16
+        return gray.astype(np.uint8)[..., None]
+
+
+class TorchBackend:
+    """Backend PyTorch, chạy trên GPU nếu có (CUDA), nếu không thì trên CPU"""
+    name = "torch"
+
+    def __init__(self, device=None):
+        from .hardware import load_torch
+        self.torch = load_torch()
+        if self.torch is None:
+            raise RuntimeError("PyTorch chưa được cài đặt")
+        if device is None:
+            device = "cuda" if self.torch.cuda.is_available() else "cpu"
+        self.device = device
+
+    def _tensor(self, pixels):
+        # int32 đủ cho mọi phép nhân trung gian (tối đa 255 * 65535) và được hỗ trợ trên GPU
+        return self.torch.from_numpy(np.ascontiguousarray(pixels)).to(self.device).to(self.torch.int32)
+
+    def _array(self, tensor):
+        return tensor.to(self.torch.uint8).cpu().numpy()
+
+    def flatten_alpha(self, pixels, background=(255, 255, 255)):
+        tensor = self._tensor(pixels)
+        color = tensor[..., :-1]
+        alpha = tensor[..., -1:]
+        bg = self.torch.tensor(background[:color.shape[-1]], dtype=self.torch.int32, device=self.device)
+        return self._array(self.torch.div(color * alpha + bg * (255 - alpha) + 127, 255, rounding_mode="floor"))
+
+    def downscale(self, pixels, factor):
+        if factor <= 1:
+            return np.asarray(pixels)
+        torch = self.torch
+        tensor = self._tensor(pixels).to(torch.int64)
+        height, width = tensor.shape[-3], tensor.shape[-2]
+        out_h, out_w = -(-height // factor), -(-width // factor)
+        # Đệm số 0 ở cạnh dưới/phải rồi cộng theo từng ô factor x factor
+        tensor = torch.nn.functional.pad(tensor, (0, 0, 0, out_w * factor - width, 0, out_h * factor - height))
+        shape = tuple(tensor.shape[:-3]) + (out_h, factor, out_w, factor, tensor.shape[-1])
+        sums = tensor.reshape(shape).sum(dim=(-4, -2))
+        counts = np.outer(_block_counts(height, factor), _block_counts(width, factor))[..., None]
+        counts = torch.from_numpy(counts).to(self.device)
+        return self._array(torch.div(sums + counts // 2, counts, rounding_mode="floor"))
+
+    def cmyk_to_rgb(self, pixels):
+        tensor = self._tensor(pixels)
+        nk = 255 - tensor[..., 3:4]
+        return self._array(nk - _muldiv255(tensor[..., :3], nk))
+
+    def rgb_to_gray(self, pixels):
+        tensor = self._tensor(pixels)
+        r, g, b = _GRAY_WEIGHTS
+        gray = (tensor[..., 0] * r + tensor[..., 1] * g + tensor[..., 2] * b + 0x8000) >> 16
+        return self._array(gray)[..., None]
+
+
+def get_backend(name="cpu"):
+    """Trả về backend theo tên ("cpu", "torch" hoặc "auto"); mỗi tiến trình chỉ tạo một lần.
+
+    "auto" dùng PyTorch khi có GPU CUDA, nếu không thì dùng NumPy.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Backend phải là một trong {BACKENDS}")
+    if name not in _backends:
+        if name == "auto":
+            try:
+                backend = TorchBackend()
+                if backend.device == "cpu":
+                    backend = get_backend("cpu")
+            except Exception:
+                backend = get_backend("cpu")
+        elif name == "torch":
+            backend = TorchBackend()
+        else:
+            backend = NumpyBackend()
+        _backends[name] = backend
+    return _backends[name]
+
+
+def convert_image(img, mode, backend):
+    """Chuyển ảnh Pillow sang mode ('RGB' hoặc 'L') qua backend; ảnh có kênh alpha được đặt lên nền trắng"""
+    if img.mode == mode:
+        return img
+    if img.mode == 'P':
+        img = img.convert('RGBA' if 'transparency' in img.info else 'RGB')
+    if img.mode in ('RGBA', 'LA'):
+        pixels = backend.flatten_alpha(np.asarray(img))
+        img = Image.fromarray(pixels[..., 0] if img.mode == 'LA' else pixels)
+    elif img.mode == 'CMYK':
+        img = Image.fromarray(backend.cmyk_to_rgb(np.asarray(img)))
+    if img.mode == 'RGB' and mode == 'L':
+        return Image.fromarray(backend.rgb_to_gray(np.asarray(img))[..., 0])
+    return img if img.mode == mode else img.convert(mode)
+
+
+def downscale_image(img, factor, backend):
+    """Thu nhỏ ảnh Pillow (RGB hoặc L) theo hệ số nguyên qua backend"""
+    if factor <= 1:
+        return img
+    pixels = np.asarray(img)
+    if pixels.ndim == 2:
+        return Image.fromarray(backend.downscale(pixels[..., None], factor)[..., 0])
+    return Image.fromarray(backend.downscale(pixels, factor))
+
+
+def self_check(names=("cpu", "torch"), batch=2, size=(67, 45), seed=0):
+    """So sánh các backend với nhau và với Pillow trên ảnh ngẫu nhiên.
+
+    Trả về danh sách (tên phép thử, backend, sai lệch lớn nhất, dung sai, đạt hay không);
+    backend không dùng được (ví dụ chưa cài PyTorch) được bỏ qua.
+    """
+    rng = np.random.default_rng(seed)
+    height, width = size
+    rgba = rng.integers(0, 256, (batch, height, width, 4), dtype=np.uint8)
+    rgb = rgba[..., :3].copy()
+
+    def pillow_each(func):
+        return np.stack([func(i) for i in range(batch)])
+
+    white = Image.new('RGBA', (width, height), (255, 255, 255, 255))
+    references = {
+        "flatten_alpha": (lambda b: b.flatten_alpha(rgba), 0, pillow_each(
+            lambda i: np.asarray(Image.alpha_composite(white, Image.fromarray(rgba[i], 'RGBA')).convert('RGB')))),
+        "cmyk_to_rgb": (lambda b: b.cmyk_to_rgb(rgba), 0, pillow_each(
+            lambda i: np.asarray(Image.fromarray(rgba[i], 'CMYK').convert('RGB')))),
+        "rgb_to_gray": (lambda b: b.rgb_to_gray(rgb), 0, pillow_each(
+            lambda i: np.asarray(Image.fromarray(rgb[i]).convert('L'))[..., None])),
+    }
+    # Image.reduce của Pillow dùng phép nhân xấp xỉ thay cho phép chia nên có thể lệch 1
+    for factor in (2, 3, 4):
+        references[f"downscale_{factor}"] = (lambda b, f=factor: b.downscale(rgb, f), 1, pillow_each(
+            lambda i, f=factor: np.asarray(Image.fromarray(rgb[i]).reduce(f))))
+
+    results = []
+    cpu = NumpyBackend()
+    for name in names:
+        try:
+            backend = cpu if name == "cpu" else get_backend(name)
+        except Exception:
+            continue
+        label = f"{backend.name}:{backend.device}"
+        for test, (run, tolerance, expected) in references.items():
+            output = run(backend).astype(np.int32)
+            # So với Pillow trong dung sai, và so với NumPy phải giống từng bit
+            error = int(np.abs(output - expected.astype(np.int32)).max())
+            exact = backend is cpu or np.array_equal(output, run(cpu).astype(np.int32))
+            results.append((test, label, error, tolerance, error <= tolerance and exact))
+    return results
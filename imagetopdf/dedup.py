@@ -0,0 +1,226 @@
+"""Tìm ảnh trùng lặp trong danh sách đầu vào trước khi tạo PDF.
+
+Hai mức so khớp:
+
+- "exact": trùng từng byte. Chỉ các file cùng kích thước (đã có trong
+  ImageInfo) mới bị băm nội dung, nên phần lớn ảnh không phải đọc lại.
+- "dhash" / "phash": trùng về hình ảnh (cùng một trang lưu hai lần với tên,
+  định dạng hoặc chất lượng nén khác nhau). Mỗi ảnh được băm 64 bit từ một bản
+  thu nhỏ (JPEG được giải mã thẳng ở độ phân giải thấp) và hai ảnh là trùng khi
+  khoảng cách Hamming không vượt quá ngưỡng và tỷ lệ khung hình gần bằng nhau.
+
+Ảnh gần trùng được tìm bằng chỉ mục multi-index hashing thay vì so từng cặp,
+nên số phép so sánh tăng gần tuyến tính theo số ảnh. Ảnh gốc của một nhóm trùng luôn là ảnh xuất
+hiện đầu tiên theo thứ tự đầu vào.
+"""
+import hashlib
+from collections import defaultdict
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+from PIL import Image, ImageOps
+
+DEDUP_MODES = ("exact", "dhash", "phash")
+
+# Ngưỡng khoảng cách Hamming mặc định (trên 64 bit) cho từng loại băm
+DEFAULT_THRESHOLDS = {"dhash": 6, "phash": 8}
+
+# Chênh lệch tương đối tối đa của tỷ lệ khung hình giữa hai ảnh gần trùng
+ASPECT_TOLERANCE = 0.03
+
+_HASH_CHUNK = 1024 * 1024
+
+
+@dataclass
+class DuplicateImage:
+    """Một ảnh trùng với ảnh gốc xuất hiện trước nó; distance là 0 với ảnh trùng từng byte"""
+    path: str
+    original: str
+    distance: int = 0
+    # Vị trí của ảnh trùng trong danh sách đầu vào
+    index: int = None
+
+
+def file_digest(path):
+    """Mã băm BLAKE2b nội dung file"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_HASH_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _preview(path, size):
+    """Bản thu nhỏ mức xám đúng hướng hiển thị, kích thước size=(rộng, cao)"""
+    with Image.open(path) as img:
+        # JPEG được giải mã ở tỷ lệ 1/2, 1/4 hoặc 1/8 thay vì toàn bộ ảnh
+        img.draft("L", (size[0] * 4, size[1] * 4))
+        img = ImageOps.exif_transpose(img)
+        return np.asarray(img.convert("L").resize(size, Image.BILINEAR), dtype=np.float32)
+
+
+def _bits_to_int(bits):
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def dhash(path):
+    """Difference hash 64 bit: so sánh độ sáng các điểm ảnh liền kề theo hàng"""
+    pixels = _preview(path, (9, 8))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _dct_matrix(n):
+    k = np.arange(n)[:, None]
+    matrix = np.cos(np.pi * (2 * np.arange(n)[None, :] + 1) * k / (2 * n))
+    matrix[0] /= np.sqrt(2)
+    return matrix * np.sqrt(2 / n)
+
+
+_DCT_32 = _dct_matrix(32).astype(np.float32)
+
+
+def phash(path):
+    """Perceptual hash 64 bit: các hệ số DCT tần số thấp so với trung vị"""
+    pixels = _preview(path, (32, 32))
+    low = (_DCT_32 @ pixels @ _DCT_32.T)[:8, :8].ravel()
+    # Bỏ hệ số DC (độ sáng trung bình) khi tính trung vị để ảnh sáng/tối hơn vẫn cho cùng mã
+    return _bits_to_int(low > np.median(low[1:]))
+
+
+HASHERS = {"dhash": dhash, "phash": phash}
+
+
+def hamming(a, b):
+    # int.bit_count chỉ có từ Python 3.10
+    return bin(a ^ b).count("1")
+
+
+# Số bit 1 của từng giá trị byte, để đếm khoảng cách Hamming trên mảng NumPy
+_POPCOUNT = np.array([bin(value).count("1") for value in range(256)], dtype=np.uint8)
+
+
+class HammingIndex:
+    """Chỉ mục multi-index hashing tìm các mã băm 64 bit cách nhau không quá radius bit.
+
+    Mã băm được chia thành radius + 1 đoạn; theo nguyên lý chuồng bồ câu, hai mã
+    cách nhau không quá radius bit phải trùng hoàn toàn ít nhất một đoạn. Mỗi
+    đoạn có một bảng băm riêng, nên mỗi lần tìm chỉ so khoảng cách (trên mảng
+    NumPy) với các mã trùng đoạn thay vì với mọi mã đã thêm.
+    """
+
+    def __init__(self, radius, bits=64):
+        self.radius = radius
+        parts = min(radius + 1, bits)
+        # (vị trí dịch, mặt nạ) của từng đoạn, các đoạn dài gần bằng nhau
+        self._segments = []
+        shift = 0
+        for i in range(parts):
+            width = bits // parts + (1 if i < bits % parts else 0)
+            self._segments.append((shift, (1 << width) - 1))
+            shift += width
+        self._tables = [{} for _ in self._segments]
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+        self._values = []
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, value_hash, value):
+        position = len(self._values)
+        if position == len(self._hashes):
+            self._hashes = np.concatenate([self._hashes, np.zeros_like(self._hashes)])
+        self._hashes[position] = value_hash
+        self._values.append(value)
+        for (shift, mask), table in zip(self._segments, self._tables):
+            table.setdefault((value_hash >> shift) & mask, []).append(position)
+
+    def search(self, value_hash):
+        """Danh sách (khoảng cách, giá trị) của các mã băm cách value_hash không quá radius"""
+        buckets = [table.get((value_hash >> shift) & mask) for (shift, mask), table in zip(self._segments, self._tables)]
+        positions = np.fromiter(chain.from_iterable(bucket for bucket in buckets if bucket), dtype=np.int64)
+        if not len(positions):
+            return []
+        diff = self._hashes[positions] ^ np.uint64(value_hash)
+        distances = _POPCOUNT[diff.view(np.uint8)].reshape(-1, 8).sum(axis=1)
+        close = np.unique(positions[distances <= self.radius])
+        return [(hamming(value_hash, int(self._hashes[position])), self._values[position]) for position in close]
+
+
+def _map(function, items, workers):
+    """Áp dụng function lên từng phần tử (giữ thứ tự), trả về (kết quả hoặc None nếu lỗi)"""
+    def safe(item):
+        try:
+            return function(item)
+        except Exception:
+            return None
+
+    if workers <= 1 or len(items) <= 1:
+        return [safe(item) for item in items]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(safe, items))
+
+
+def _aspect(info):
+    width, height = info.size
+    return width / height if height else 0.0
+
+
+def find_duplicates(infos, mode="exact", threshold=None, workers=1):
+    """Các ảnh trùng trong danh sách ImageInfo, theo thứ tự đầu vào.
+
+    Ảnh trùng từng byte luôn được tìm; với mode "dhash" hoặc "phash", các ảnh còn
+    lại được so thêm theo mã băm hình ảnh với ngưỡng threshold (mặc định theo
+    DEFAULT_THRESHOLDS). Ảnh không đọc được bị bỏ qua (không coi là trùng).
+    """
+    if mode not in DEDUP_MODES:
+        raise ValueError(f"Chế độ tìm ảnh trùng phải là một trong {DEDUP_MODES}")
+    if threshold is not None and threshold < 0:
+        raise ValueError("Ngưỡng khoảng cách Hamming không được âm")
+    duplicates = {}
+
+    # Ảnh trùng từng byte phải cùng kích thước file: chỉ băm các nhóm có từ hai file trở lên
+    by_size = defaultdict(list)
+    for index, info in enumerate(infos):
+        by_size[info.file_size].append(index)
+    candidates = [index for indexes in by_size.values() if len(indexes) > 1 for index in indexes]
+    candidates.sort()
+    digests = _map(file_digest, [infos[index].path for index in candidates], workers)
+    first_by_digest = {}
+    for index, digest in zip(candidates, digests):
+        if digest is None:
+            continue
+        original = first_by_digest.setdefault(digest, index)
+        if original != index:
+            duplicates[index] = (original, 0)
+
+    if mode in HASHERS:
+        radius = DEFAULT_THRESHOLDS[mode] if threshold is None else threshold
+        remaining = [index for index in range(len(infos)) if index not in duplicates]
+        hashes = _map(HASHERS[mode], [infos[index].path for index in remaining], workers)
+        index_by_hash = HammingIndex(radius)
+        for index, value_hash in zip(remaining, hashes):
+            if value_hash is None:
+                continue
+            aspect = _aspect(infos[index])
+            matches = [(original, distance) for distance, original in index_by_hash.search(value_hash)
+                       if abs(_aspect(infos[original]) / aspect - 1) <= ASPECT_TOLERANCE] if aspect else []
+            if matches:
+                # Ảnh gốc là ảnh xuất hiện sớm nhất trong các ảnh khớp
+                original, distance = min(matches)
+                duplicates[index] = (original, distance)
+            else:
+                index_by_hash.add(value_hash, index)
+
+    result = []
+    for index in sorted(duplicates):
+        original, distance = duplicates[index]
+        # Ảnh gốc của ảnh trùng từng byte có thể lại là ảnh gần trùng của một ảnh trước nó
+        while original in duplicates:
+            original = duplicates[original][0]
+        result.append(DuplicateImage(infos[index].path, infos[original].path, distance, index))
+    return result
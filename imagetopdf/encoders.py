@@ -0,0 +1,322 @@
+"""Mã hóa ảnh thành dữ liệu XObject để nhúng vào PDF, tùy theo định dạng nguồn.
+
+- JPEG: sao chép nguyên vẹn dữ liệu DCT, không giải mã. Khi có đường dẫn và
+  ImageInfo, dữ liệu không được đọc vào bộ nhớ mà là một FileSlice, được bộ
+  ghi theo luồng chép thẳng từ file nguồn (xem sourcefile).
+- PNG không xen kẽ, không có kênh alpha: sao chép nguyên vẹn các chunk IDAT
+  (Flate với Predictor PNG), không giải mã.
+- PNG/WebP có kênh alpha: điểm ảnh màu và kênh alpha được nén Flate riêng,
+  alpha được nhúng dưới dạng SMask thay vì bị làm phẳng.
+- WebP không mất dữ liệu: giải mã và nén Flate; WebP nén mất dữ liệu: giải mã
+  và mã hóa lại thành JPEG trong bộ nhớ.
+
+Với một PageLayout (xem layout), ảnh được đặt lên trang có khổ cố định; ảnh
+vượt quá DPI tối đa được giải mã ở độ phân giải thấp (JPEG draft), thu nhỏ rồi
+mã hóa lại.
+
+Với một CompressionProfile (xem profiles), chất lượng JPEG, lấy mẫu màu, mức
+Flate và việc có giữ nguyên JPEG/PNG nguồn hay không được lấy theo hồ sơ.
+
+Không có bước nào ghi ra file tạm.
+"""
+import io
+import struct
+import zlib
+
+from PIL import Image
+
+from .compute import convert_image, downscale_image
+from .metadata import image_info
+from .profiles import encode_jpeg
+from .sourcefile import FileSlice
+
+# Độ phân giải mặc định khi ảnh không có thông tin DPI (giống img2pdf)
+DEFAULT_DPI = 96
+
+# Góc xoay trang (/Rotate) tương ứng với giá trị EXIF Orientation
+EXIF_ROTATION = {3: 180, 6: 90, 8: 270}
+
+# Chất lượng JPEG khi mã hóa lại ảnh WebP nén mất dữ liệu
+WEBP_JPEG_QUALITY = 90
+
+# Chất lượng JPEG khi mã hóa lại ảnh đã thu nhỏ theo DPI tối đa
+DOWNSCALE_JPEG_QUALITY = 85
+
+# Mức nén Flate mặc định
+FLATE_LEVEL = 6
+
+_PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Số kênh màu theo PNG color type (chỉ các loại không có alpha)
+_PNG_COLORS = {0: 1, 2: 3, 3: 1}
+
+
+class PageImage:
+    """Dữ liệu của một ảnh đã được mã hóa sẵn sàng để ghi thành XObject"""
+
+    def __init__(self, data, width, height, color_space, bits, filter_name, width_pt, height_pt,
+                 rotate=0, decode=None, decode_parms=None, smask=None, reencoded=False,
+                 page_width_pt=None, page_height_pt=None, offset_x=0, offset_y=0):
+        self.data = data
+        self.width = width
+        self.height = height
+        self.color_space = color_space
+        self.bits = bits
+        self.filter_name = filter_name
+        self.width_pt = width_pt
+        self.height_pt = height_pt
+        self.rotate = rotate
+        self.decode = decode
+        self.decode_parms = decode_parms
+        # Kênh alpha đã nén Flate (8 bit, DeviceGray), hoặc None
+        self.smask = smask
+        # Dữ liệu được tạo bằng cách giải mã và mã hóa lại (đáng để lưu vào bộ nhớ đệm)
+        self.reencoded = reencoded
+        # Khổ trang và vị trí ảnh trên trang (point); None nghĩa là trang vừa bằng ảnh
+        self.page_width_pt = page_width_pt
+        self.page_height_pt = page_height_pt
+        self.offset_x = offset_x
+        self.offset_y = offset_y
+
+
+def is_passthrough_jpeg(info):
+    """JPEG RGB/L có thể nhúng nguyên vẹn chỉ với thông tin header"""
+    return info is not None and info.format == 'JPEG' and info.mode in ('RGB', 'L')
+
+
+def _read_bytes(source):
+    if isinstance(source, (bytes, bytearray)):
+        return bytes(source)
+    if isinstance(source, memoryview):
+        return source.tobytes()
+    if isinstance(source, FileSlice):
+        return source.read()
+    with open(source, 'rb') as f:
+        return f.read()
+
+
+def _page_size(info):
+    x_dpi, y_dpi = info.dpi or (DEFAULT_DPI, DEFAULT_DPI)
+    return info.width * 72.0 / x_dpi, info.height * 72.0 / y_dpi
+
+
+def _parse_png(raw):
+    """Đọc các chunk của PNG; trả về (IHDR, bảng màu, có tRNS, dữ liệu IDAT) hoặc None nếu không hợp lệ"""
+    if not raw.startswith(_PNG_SIGNATURE):
+        return None
+    pos = len(_PNG_SIGNATURE)
+    ihdr = None
+    palette = None
+    has_trns = False
+    idat = []
+    while pos + 8 <= len(raw):
+        length, chunk_type = struct.unpack(">I4s", raw[pos:pos + 8])
+        data_start = pos + 8
+        data_end = data_start + length
+        if data_end + 4 > len(raw):
+            return None
+        if chunk_type == b"IHDR":
+            ihdr = struct.unpack(">IIBBBBB", raw[data_start:data_end])
+        elif chunk_type == b"PLTE":
+            palette = raw[data_start:data_end]
+        elif chunk_type == b"tRNS":
+            has_trns = True
+        elif chunk_type == b"IDAT":
+            idat.append(raw[data_start:data_end])
+        elif chunk_type == b"IEND":
+            break
+        pos = data_end + 4  # bỏ qua CRC
+    if ihdr is None or not idat:
+        return None
+    return ihdr, palette, has_trns, b"".join(idat)
+
+
+def _encode_png_passthrough(raw, width_pt, height_pt, rotate):
+    """Nhúng PNG bằng cách sao chép IDAT; trả về None nếu PNG không thể sao chép trực tiếp"""
+    parsed = _parse_png(raw)
+    if parsed is None:
+        return None
+    (width, height, bit_depth, color_type, _, _, interlace), palette, has_trns, idat = parsed
+    if interlace or has_trns or color_type not in _PNG_COLORS:
+        return None
+    if color_type != 3 and bit_depth not in (1, 2, 4, 8):
+        # Ảnh 16 bit cần PDF 1.5, chuyển về 8 bit bằng cách giải mã
+        return None
+
+    colors = _PNG_COLORS[color_type]
+    if color_type == 0:
+        color_space = '/DeviceGray'
+    elif color_type == 2:
+        color_space = '/DeviceRGB'
+    else:
+        if not palette:
+            return None
+        color_space = f"[/Indexed /DeviceRGB {len(palette) // 3 - 1} <{palette.hex()}>]"
+    decode_parms = f"<< /Predictor 15 /Colors {colors} /BitsPerComponent {bit_depth} /Columns {width} >>"
+    return PageImage(idat, width, height, color_space, bit_depth, '/FlateDecode',
+                     width_pt, height_pt, rotate, decode_parms=decode_parms)
+
+
+def _webp_is_lossless(raw):
+    """Kiểm tra WebP có dùng nén không mất dữ liệu (chunk VP8L) hay không"""
+    pos = 12
+    while pos + 8 <= len(raw):
+        chunk_type = raw[pos:pos + 4]
+        if chunk_type == b"VP8L":
+            return True
+        if chunk_type == b"VP8 ":
+            return False
+        size = struct.unpack("<I", raw[pos + 4:pos + 8])[0]
+        pos += 8 + size + (size & 1)
+    return False
+
+
+def _has_alpha(img):
+    return img.mode in ('RGBA', 'LA', 'PA') or (img.mode == 'P' and 'transparency' in img.info)
+
+
+def _encode_pixels(img, width_pt, height_pt, rotate, lossy=False, flate_level=FLATE_LEVEL, backend=None,
+                   quality=WEBP_JPEG_QUALITY, profile=None):
+    """Giải mã điểm ảnh và nén Flate (hoặc JPEG trong bộ nhớ nếu lossy); alpha thành SMask.
+
+    backend (xem compute) thực hiện bước chuyển đổi màu thay cho Pillow nếu được chỉ định.
+    profile (xem profiles) thay cho quality và flate_level; ảnh nén Flate vượt
+    ngân sách dung lượng của hồ sơ được nén JPEG.
+    """
+    if profile is not None:
+        flate_level = profile.flate_level
+        lossy = lossy or profile.lossless_to_jpeg
+    smask = None
+    if _has_alpha(img):
+        gray = img.mode in ('LA',)
+        img = img.convert('LA' if gray else 'RGBA')
+        alpha = img.getchannel('A')
+        # Bỏ qua SMask nếu ảnh thực chất đặc hoàn toàn
+        if alpha.getextrema() != (255, 255):
+            smask = zlib.compress(alpha.tobytes(), flate_level)
+        img = img.convert('L' if gray else 'RGB')
+    elif img.mode.startswith('I'):
+        # Ảnh xám 16 bit: thu về 8 bit theo tỷ lệ thay vì cắt giá trị
+        img = img.convert('I').point(lambda value: value * (1 / 256)).convert('L')
+    elif img.mode in ('1', 'L', 'F'):
+        img = img.convert('L')
+    elif img.mode != 'RGB':
+        img = img.convert('RGB') if backend is None else convert_image(img, 'RGB', backend)
+
+    color_space = '/DeviceGray' if img.mode == 'L' else '/DeviceRGB'
+    if not lossy:
+        data = zlib.compress(img.tobytes(), flate_level)
+        if profile is None or profile.page_budget is None or len(data) <= profile.page_budget:
+            return PageImage(data, img.width, img.height, color_space, 8, '/FlateDecode',
+                             width_pt, height_pt, rotate, smask=smask, reencoded=True)
+    if profile is not None:
+        data = encode_jpeg(img, profile)
+    else:
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=quality)
+        data = buffer.getvalue()
+    return PageImage(data, img.width, img.height, color_space, 8, '/DCTDecode',
+                     width_pt, height_pt, rotate, smask=smask, reencoded=True)
+
+
+def _downscaled(img, size, backend=None):
+    """Giải mã và thu nhỏ ảnh về đúng size; JPEG được giải mã sẵn ở độ phân giải thấp"""
+    if img.format == 'JPEG':
+        # draft chọn tỷ lệ giải mã 1/2, 1/4 hoặc 1/8 nhỏ nhất mà ảnh vẫn không nhỏ hơn size
+        img.draft(img.mode, size)
+    if img.mode in ('P', '1'):
+        img = img.convert('RGBA' if _has_alpha(img) else 'RGB')
+    elif img.mode.startswith('I;16'):
+        img = img.convert('I')
+    if backend is not None and img.mode in ('RGB', 'L', 'RGBA', 'LA'):
+        img = downscale_image(img, min(img.width // size[0], img.height // size[1]), backend)
+    if img.size != size:
+        img = img.resize(size, Image.LANCZOS, reducing_gap=3.0)
+    return img
+
+
+def _encode_on_page(source, info, backend, layout, profile):
+    """Đặt ảnh lên trang theo layout, thu nhỏ nếu vượt DPI tối đa.
+
+    Ảnh không cần thu nhỏ được mã hóa từ chính source như encode_image, nên JPEG
+    vẫn được chép thẳng từ file nguồn; chỉ khi thu nhỏ mới đọc ảnh vào bộ nhớ.
+    """
+    if info is None:
+        source = _read_bytes(source)
+        with Image.open(io.BytesIO(source)) as img:
+            info = image_info(img)
+    rotate = EXIF_ROTATION.get(info.orientation, 0)
+    # Trang được xoay bằng /Rotate nên mọi kích thước lưu trong file đều theo hướng chưa xoay
+    swapped = rotate in (90, 270)
+    width, height = (info.height, info.width) if swapped else (info.width, info.height)
+    page_w, page_h, image_w, image_h = layout.place(width, height)
+    if swapped:
+        page_w, page_h, image_w, image_h = page_h, page_w, image_h, image_w
+
+    max_w, max_h = layout.pixel_limit(image_w, image_h)
+    if info.width <= max_w and info.height <= max_h:
+        page = encode_image(source, info, backend, profile=profile)
+    else:
+        raw = _read_bytes(source)
+        scale = min(max_w / info.width, max_h / info.height)
+        size = (max(1, round(info.width * scale)), max(1, round(info.height * scale)))
+        with Image.open(io.BytesIO(raw)) as img:
+            lossy = img.format == 'JPEG' or (img.format == 'WEBP' and not _webp_is_lossless(raw))
+            page = _encode_pixels(_downscaled(img, size, backend), image_w, image_h, rotate, lossy=lossy,
+                                  backend=backend, quality=DOWNSCALE_JPEG_QUALITY, profile=profile)
+
+    page.width_pt, page.height_pt = image_w, image_h
+    page.page_width_pt, page.page_height_pt = page_w, page_h
+    page.offset_x = (page_w - image_w) / 2
+    page.offset_y = (page_h - image_h) / 2
+    return page
+
+
+def encode_image(source, info=None, backend=None, layout=None, profile=None):
+    """Chuẩn bị dữ liệu để nhúng một ảnh (đường dẫn hoặc bytes) vào PDF.
+
+    info là ImageInfo đã đọc ở bước quét; khi có info, JPEG RGB/L được sao chép
+    nguyên vẹn mà không cần mở lại ảnh. backend là backend tính toán (xem compute)
+    cho các ảnh cần giải mã. layout là PageLayout (xem layout) để đặt ảnh lên
+    trang có khổ cố định; None giữ trang vừa bằng ảnh. profile là CompressionProfile
+    (xem profiles); None dùng cách mã hóa mặc định.
+    """
+    if layout is not None:
+        return _encode_on_page(source, info, backend, layout, profile)
+
+    if is_passthrough_jpeg(info) and (profile is None or profile.keeps_jpeg(info.file_size)):
+        width_pt, height_pt = _page_size(info)
+        color_space = '/DeviceRGB' if info.mode == 'RGB' else '/DeviceGray'
+        # Cả file là luồng DCT: chỉ ghi lại vị trí, dữ liệu được chép khi ghi PDF
+        data = FileSlice(source) if isinstance(source, str) else _read_bytes(source)
+        return PageImage(data, info.width, info.height, color_space, 8, '/DCTDecode',
+                         width_pt, height_pt, EXIF_ROTATION.get(info.orientation, 0))
+
+    raw = _read_bytes(source)
+    with Image.open(io.BytesIO(raw)) as img:
+        if info is None:
+            info = image_info(img)
+        width_pt, height_pt = _page_size(info)
+        rotate = EXIF_ROTATION.get(info.orientation, 0)
+
+        if img.format == 'JPEG' and img.mode in ('RGB', 'L', 'CMYK'):
+            color_space = {'RGB': '/DeviceRGB', 'L': '/DeviceGray', 'CMYK': '/DeviceCMYK'}[img.mode]
+            decode = None
+            if img.mode == 'CMYK' and 'adobe' in img.info:
+                # JPEG CMYK do Adobe tạo ra lưu giá trị đảo ngược
+                decode = [1, 0] * 4
+            original = PageImage(raw, img.width, img.height, color_space, 8, '/DCTDecode',
+                                 width_pt, height_pt, rotate, decode)
+            if profile is None or profile.keeps_jpeg(len(raw)):
+                return original
+            page = _encode_pixels(img, width_pt, height_pt, rotate, lossy=True, backend=backend, profile=profile)
+            # Giữ bản gốc nếu mã hóa lại không làm dữ liệu nhỏ đi
+            return page if len(page.data) < len(raw) else original
+
+        if img.format == 'PNG' and (profile is None or profile.keeps_lossless(len(raw))):
+            page = _encode_png_passthrough(raw, width_pt, height_pt, rotate)
+            if page is not None:
+                return page
+
+        lossy = img.format == 'WEBP' and not _has_alpha(img) and not _webp_is_lossless(raw)
+        return _encode_pixels(img, width_pt, height_pt, rotate, lossy=lossy, backend=backend, profile=profile)
@@ -0,0 +1,1178 @@
+"""Lõi chuyển đổi ảnh sang PDF, không phụ thuộc giao diện Tk.
+
+Mọi thông báo tiến trình được gửi qua các callback truyền vào engine,
+nhờ đó có thể dùng chung cho giao diện, dòng lệnh và các tiến trình chạy nền.
+"""
+import os
+import io
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from functools import partial
+
+import img2pdf
+from PIL import Image
+
+from .pdfwriter import StreamingPDFWriter
+from .buckets import DEFAULT_BUCKETS, load_bucket_table
+from .cache import DEFAULT_CACHE_BYTES, PageCache
+from .dedup import find_duplicates
+from .layout import DEFAULT_MAX_DPI, PageLayout, parse_page_size
+from .manifest import ManifestPage, load_manifest, remove_manifest, save_build_manifest, save_manifest, source_key
+from .metadata import scan_image_infos
+from .metrics import Metrics, Profiler, write_metrics
+from .preprocess import create_pool, iter_normalized, resolve_workers
+from .profiles import get_profile
+from .quarantine import quarantine_file, write_error_report
+from .scanner import DirectoryScanner
+from .tempstore import TempStorage
+from .verify import PDFUnsupported, PDFVerifyError, verify_pdf
+from .volumes import INDEX_FORMATS, plan_volumes, volume_path, write_volume_index
+
+# Thư mục tạm mặc định của ứng dụng
+DEFAULT_TEMP_FOLDER = os.path.join(tempfile.gettempdir(), "ImageToPDF")
+
+
+class ConversionError(Exception):
+    """Lỗi khiến quá trình chuyển đổi không thể tiếp tục"""
+
+
+class ConversionCancelled(ConversionError):
+    """Quá trình chuyển đổi bị hủy bằng ConversionEngine.cancel()"""
+
+
+@dataclass
+class ConversionOptions:
+    """Các tùy chọn cho một lần chuyển đổi"""
+    input_folder: str
+    output_file: str
+    sort_by_name: bool = True
+    preserve_ratio: bool = True
+    separate_by_ratio: bool = True
+    # Thư mục chứa ảnh đã chuyển đổi chờ img2pdf nhúng (chỉ với các cách ghi dùng img2pdf)
+    temp_folder: str = DEFAULT_TEMP_FOLDER
+    # Hạn mức dung lượng file tạm (byte); vượt quá thì file tạm cũ của các phiên trước bị xóa
+    temp_max_bytes: int = None
+    # Số tiến trình tiền xử lý ảnh (1: tuần tự, 0: tất cả các lõi CPU)
+    workers: int = 1
+    # Số ảnh tối đa đang được xử lý cùng lúc trong pool (mặc định gấp đôi số worker)
+    max_in_flight: int = None
+    # Ghi PDF theo luồng từng trang thay vì dựng toàn bộ tài liệu trong bộ nhớ
+    streaming: bool = False
+    # Thư mục bộ nhớ đệm lâu dài cho ảnh đã mã hóa (None: không dùng)
+    cache_dir: str = None
+    cache_max_bytes: int = DEFAULT_CACHE_BYTES
+    # "stat": khóa theo đường dẫn, kích thước và thời gian sửa; "content": theo mã băm nội dung
+    cache_key_mode: str = "stat"
+    # Backend cho các bước xử lý điểm ảnh: None (Pillow), "cpu" (NumPy), "torch" (GPU nếu có) hoặc "auto"
+    compute_backend: str = None
+    # File ghi số đo của lần chạy: .prom/.txt theo định dạng Prometheus, đuôi khác là dòng JSON nối thêm
+    metrics_file: str = None
+    # Bật profile cho lần chạy: "cpu" (cProfile), "memory" (tracemalloc) hoặc "all"; kết quả ghi cạnh file PDF
+    profile: str = None
+    # Dựng lại PDF theo kiểu gia tăng dựa trên manifest đi kèm (luôn dùng bộ ghi theo luồng)
+    incremental: bool = False
+    # Khổ trang cố định: "A4", "Letter"... hoặc "210x297mm" (None: trang vừa bằng ảnh); luôn dùng bộ ghi theo luồng
+    page_size: str = None
+    # DPI tối đa của ảnh trên trang; ảnh lớn hơn được thu nhỏ (mặc định DEFAULT_MAX_DPI khi có page_size)
+    max_dpi: int = None
+    # Hồ sơ nén: "archive", "balanced", "web" hoặc "minimal" (None: cách mã hóa mặc định)
+    compression: str = None
+    # Dung lượng tối đa của dữ liệu ảnh một trang (byte); ảnh lớn hơn được nén JPEG vừa ngân sách
+    page_budget: int = None
+    # Quét cả các thư mục con của input_folder
+    recursive: bool = False
+    # Khi quét thư mục con: mỗi thư mục có ảnh cho ra file PDF riêng trong thư mục <tên file PDF>/
+    per_folder: bool = False
+    # Mẫu glob chọn/loại file, so với đường dẫn tương đối nếu mẫu có "/", ngược lại với tên file
+    include: tuple = ()
+    exclude: tuple = ()
+    # Sắp xếp tự nhiên khi sort_by_name: "anh2" đứng trước "anh10"
+    natural_sort: bool = False
+    # Nhận diện ảnh theo nội dung đầu file (magic bytes) thay vì phần mở rộng
+    sniff_content: bool = False
+    # Danh sách file ảnh cụ thể (giữ nguyên thứ tự) thay cho việc quét input_folder
+    input_files: tuple = ()
+    # Quy tắc phân nhóm tỷ lệ khi separate_by_ratio: file JSON hoặc dict (xem buckets); None: 16:9, 9:16 và khác
+    bucket_rules: str = None
+    # Tìm ảnh trùng trước khi tạo PDF: "exact" (trùng từng byte), "dhash" hoặc "phash" (trùng về hình ảnh)
+    dedup: str = None
+    # Ngưỡng khoảng cách Hamming của dhash/phash (None: theo dedup.DEFAULT_THRESHOLDS)
+    dedup_threshold: int = None
+    # Giữ trang của ảnh trùng nhưng chỉ nhúng ảnh gốc một lần (luôn dùng bộ ghi theo luồng) thay vì bỏ trang
+    dedup_share: bool = False
+    # Kiểm tra cả các ảnh được nhúng nguyên vẹn (giải mã JPEG ở tỷ lệ 1/8, kiểm tra CRC của PNG) trước khi ghi
+    # bằng bộ ghi theo luồng; các cách ghi dùng img2pdf luôn kiểm tra
+    validate: bool = False
+    # Thư mục chuyển các ảnh lỗi vào sau khi chuyển đổi (None: giữ nguyên chỗ cũ)
+    quarantine_dir: str = None
+    # File báo cáo lỗi: .csv là bảng CSV, đuôi khác là JSON
+    error_report: str = None
+    # Ghi build manifest <file PDF>.build.json (nguồn, kích thước, vị trí, CRC32 từng trang); luôn dùng bộ ghi theo luồng
+    build_manifest: bool = False
+    # Kiểm tra số trang của file PDF vừa ghi qua bảng xref và trailer (xem verify)
+    verify_output: bool = True
+    # Chia mỗi file PDF thành các tập <tên>_part001.pdf... tối đa volume_pages trang và/hoặc volume_bytes byte
+    # (ước tính theo kích thước ảnh nguồn); file vừa một tập giữ nguyên tên; các tập luôn dùng bộ ghi theo luồng
+    volume_pages: int = None
+    volume_bytes: int = None
+    # Ghi mục lục các tập: "json" hoặc "pdf" (<tên>_index.json/.pdf); None: không ghi
+    volume_index: str = None
+
+
+@dataclass
+class OutputFile:
+    """Một file PDF đã được tạo ra"""
+    path: str
+    ratio_type: str
+    image_count: int
+
+
+@dataclass
+class ImageError:
+    """Một ảnh không xử lý được cùng lý do"""
+    path: str
+    message: str
+    # "image" (ảnh lỗi), "folder" (thư mục không đọc được), "output" (file PDF không tạo được) hoặc "duplicate"
+    kind: str = "image"
+    # Đường dẫn mới của ảnh sau khi được chuyển vào thư mục cách ly
+    quarantined: str = None
+
+
+@dataclass
+class ConversionResult:
+    """Kết quả của một lần chuyển đổi"""
+    image_count: int = 0
+    outputs: list = field(default_factory=list)
+    temp_files: list = field(default_factory=list)
+    temp_folders: list = field(default_factory=list)
+    errors: list = field(default_factory=list)
+    # Các ảnh trùng lặp đã tìm thấy (DuplicateImage)
+    duplicates: list = field(default_factory=list)
+    # Thời gian (giây) của từng giai đoạn: find, scan, dedup, classify, normalize, write
+    stage_times: dict = field(default_factory=dict)
+    # Metrics chi tiết (bộ đo thời gian, bộ đếm, histogram độ trễ từng ảnh)
+    metrics: Metrics = None
+
+
+def _noop(*args):
+    pass
+
+
+def _image_path(image):
+    return image if isinstance(image, str) else image.path
+
+
+def is_landscape(img):
+    width, height = img.size
+    return width > height
+
+
+def get_aspect_ratio(img):
+    width, height = img.size
+    if is_landscape(img):
+        # Tỷ lệ gần 16:9
+        return "landscape" if (width / height) > 1.5 else "other"
+    else:
+        # Tỷ lệ gần 9:16
+        return "portrait" if (height / width) > 1.5 else "other"
+
+
+class _OutputProgress:
+    """Tiến trình của các file PDF được tạo (có thể cùng lúc) trong khoảng [start, end] của tiến trình tổng thể.
+
+    Mỗi file chiếm một phần của khoảng tỷ lệ với số ảnh của nó, nên tiến trình
+    tổng thể luôn tăng dần dù các file được xử lý xen kẽ nhau.
+    """
+
+    def __init__(self, start, end, outputs, on_progress, on_output_progress):
+        self.start = start
+        self.end = end
+        # đường dẫn file -> số ảnh
+        self.outputs = {path: total for path, total in outputs}
+        self.fractions = dict.fromkeys(self.outputs, 0.0)
+        self.weight = sum(self.outputs.values()) or 1
+        self.on_progress = on_progress
+        self.on_output_progress = on_output_progress
+        self._lock = threading.Lock()
+
+    def update(self, path, fraction):
+        with self._lock:
+            fraction = max(self.fractions[path], min(1.0, fraction))
+            self.fractions[path] = fraction
+            done = sum(self.fractions[key] * total for key, total in self.outputs.items())
+            self.on_progress(self.start + done / self.weight * (self.end - self.start))
+            self.on_output_progress(path, fraction * 100)
+
+
+class ConversionEngine:
+    """Thực hiện chuyển đổi một thư mục ảnh thành một hoặc nhiều file PDF.
+
+    Các callback đều tùy chọn:
+    - on_log(message): một dòng nhật ký
+    - on_progress(percent): tiến trình tổng thể từ 0 đến 100
+    - on_status(text): trạng thái hiện tại
+    - on_file(name): tên file đang được xử lý
+    - on_output_progress(path, percent): tiến trình của riêng từng file PDF,
+      hữu ích khi các nhóm tỷ lệ được tạo cùng lúc
+
+    metrics là một Metrics dùng chung (ví dụ để gộp số đo của giao diện); mặc
+    định mỗi engine tạo một Metrics riêng.
+    """
+
+    def __init__(self, options, on_log=None, on_progress=None, on_status=None, on_file=None,
+                 on_output_progress=None, metrics=None):
+        self.options = options
+        self.log = on_log or _noop
+        self.set_progress = on_progress or _noop
+        self.set_status = on_status or _noop
+        self.set_current_file = on_file or _noop
+        self.set_output_progress = on_output_progress or _noop
+        self.metrics = metrics or Metrics()
+        self.result = ConversionResult(metrics=self.metrics)
+        self.cache = None
+        self.temp_storage = None
+        self.layout = None
+        self.profile = None
+        self.buckets = DEFAULT_BUCKETS
+        # {đường dẫn ảnh trùng: đường dẫn ảnh gốc} khi ảnh trùng dùng chung ảnh đã nhúng của ảnh gốc
+        self._shared = {}
+        # Process pool dùng chung và cửa sổ xử lý của mỗi file khi các nhóm tỷ lệ được tạo cùng lúc
+        self._pool = None
+        self._max_in_flight = None
+        # Profiler của lần chạy (options.profile), để đo cả các luồng tạo file PDF
+        self._profiler = None
+        self._lock = threading.Lock()
+        # Các file PDF được tạo cùng lúc đều có thể chuyển ảnh lỗi vào thư mục cách ly
+        self._quarantine_lock = threading.Lock()
+        self._cancel = threading.Event()
+        # Thời gian chờ chuẩn hóa ảnh của file PDF đang tạo trên từng luồng
+        self._waits = threading.local()
+
+    def cancel(self):
+        """Yêu cầu dừng chuyển đổi (gọi được từ luồng khác); run() sẽ ném ConversionCancelled"""
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def _check_cancelled(self):
+        if self._cancel.is_set():
+            raise ConversionCancelled("Đã hủy chuyển đổi")
+
+    def add_stage_time(self, stage, seconds):
+        """Cộng dồn thời gian của một giai đoạn vào result.stage_times"""
+        with self._lock:
+            self.result.stage_times[stage] = self.result.stage_times.get(stage, 0.0) + seconds
+        self.metrics.add_time(stage, seconds)
+
+    @contextmanager
+    def timed(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_stage_time(stage, time.perf_counter() - start)
+
+    def scanner(self):
+        """DirectoryScanner cho thư mục đầu vào theo các tùy chọn quét"""
+        options = self.options
+        sort = ("natural" if options.natural_sort else "name") if options.sort_by_name else None
+        exclude = tuple(options.exclude)
+        if options.quarantine_dir:
+            # Không quét lại các ảnh đã bị cách ly khi thư mục cách ly nằm trong thư mục đầu vào
+            try:
+                rel = os.path.relpath(os.path.abspath(options.quarantine_dir), os.path.abspath(options.input_folder))
+            except ValueError:
+                # Khác ổ đĩa trên Windows
+                rel = ".."
+            if rel != "." and not rel.startswith(".."):
+                exclude += (rel.replace(os.sep, "/"),)
+        return DirectoryScanner(options.input_folder, recursive=options.recursive, include=options.include,
+                                exclude=exclude, sniff=options.sniff_content, sort=sort)
+
+    def find_images(self):
+        """Tìm tất cả các file ảnh trong thư mục đầu vào (và thư mục con nếu recursive), đã sắp xếp"""
+        if self.options.input_files:
+            return list(self.options.input_files)
+        scanner = self.scanner()
+        image_files = list(scanner.iter_images())
+        self._record_scan_errors(scanner)
+        return image_files
+
+    def _record_scan_errors(self, scanner):
+        for folder, message in scanner.errors:
+            self.record_error(folder, f"Không đọc được thư mục: {message}", kind="folder")
+        scanner.errors.clear()
+
+    def run(self):
+        """Chạy toàn bộ quá trình chuyển đổi và trả về ConversionResult"""
+        profiler = None
+        if self.options.profile:
+            profiler = Profiler(self.options.profile, os.path.splitext(self.options.output_file)[0] + "_profile")
+        self._profiler = profiler
+        try:
+            with profiler or nullcontext():
+                return self._run_with_resources()
+        finally:
+            if profiler is not None and profiler.files:
+                self.log(f"Đã ghi kết quả profile: {', '.join(profiler.files)}")
+            if self.options.quarantine_dir:
+                self.quarantine_errors()
+            if self.options.error_report:
+                try:
+                    write_error_report(self.result.errors, self.options.error_report, job=self.options.output_file)
+                    self.log(f"Đã ghi báo cáo {len(self.result.errors)} lỗi: {self.options.error_report}")
+                except OSError as e:
+                    self.log(f"Không ghi được báo cáo lỗi {self.options.error_report}: {str(e)}")
+            if self.options.metrics_file:
+                try:
+                    write_metrics(self.metrics, self.options.metrics_file, job=self.options.output_file)
+                except OSError as e:
+                    self.log(f"Không ghi được file số đo {self.options.metrics_file}: {str(e)}")
+
+    def quarantine_errors(self):
+        """Chuyển các ảnh lỗi vào options.quarantine_dir, ghi đường dẫn mới vào ImageError.quarantined.
+
+        Gọi được nhiều lần: ảnh đã được chuyển đi không bị chuyển lại.
+        """
+        moved = {}
+        with self._quarantine_lock:
+            with self._lock:
+                errors = list(self.result.errors)
+            for error in errors:
+                if error.kind != "image" or error.quarantined is not None:
+                    continue
+                if error.path in moved:
+                    error.quarantined = moved[error.path]
+                    continue
+                if not os.path.isfile(error.path):
+                    continue
+                try:
+                    error.quarantined = moved[error.path] = quarantine_file(error.path, self.options.quarantine_dir)
+                except OSError as e:
+                    self.log(f"Không chuyển được {os.path.basename(error.path)} vào thư mục cách ly: {str(e)}")
+        if moved:
+            self.log(f"Đã chuyển {len(moved)} ảnh lỗi vào {self.options.quarantine_dir}.")
+        self.metrics.count("images_quarantined", len(moved))
+
+    def _run_with_resources(self):
+        try:
+            self.profile = get_profile(self.options.compression, self.options.page_budget)
+        except ValueError as e:
+            raise ConversionError(str(e))
+        if self.profile is not None:
+            self.log(f"Hồ sơ nén: {self.profile.name}"
+                     + (f", tối đa {self.profile.page_budget // 1024} kB mỗi trang" if self.profile.page_budget else ""))
+
+        if self.options.cache_dir:
+            self.cache = PageCache(
+                self.options.cache_dir,
+                max_bytes=self.options.cache_max_bytes,
+                key_mode=self.options.cache_key_mode,
+                # Các backend cho kết quả giống nhau nhưng khác Pillow (ảnh alpha được đặt lên nền trắng)
+                variant=("compute" if self.options.compute_backend else "")
+                + (self.profile.signature if self.profile is not None else ""),
+            )
+        try:
+            return self._run()
+        finally:
+            if self.temp_storage is not None:
+                self.temp_storage.close()
+                self.temp_storage = None
+            if self.cache is not None:
+                self.log(f"Bộ nhớ đệm: dùng lại {self.cache.hits} ảnh, lưu thêm {self.cache.stores} ảnh.")
+                self.metrics.count("cache_hits", self.cache.hits)
+                self.metrics.count("cache_misses", self.cache.misses)
+                self.metrics.count("cache_stores", self.cache.stores)
+                self.cache.close()
+                self.cache = None
+
+    def _run(self):
+        options = self.options
+
+        if not options.input_files and (not options.input_folder or not os.path.isdir(options.input_folder)):
+            raise ConversionError("Vui lòng chọn thư mục chứa ảnh hợp lệ")
+
+        if not options.output_file:
+            raise ConversionError("Vui lòng chọn vị trí lưu file PDF")
+
+        if options.page_size or options.max_dpi is not None:
+            try:
+                page_size = parse_page_size(options.page_size or "A4")
+            except ValueError as e:
+                raise ConversionError(str(e))
+            if options.max_dpi is not None and options.max_dpi <= 0:
+                raise ConversionError("DPI tối đa phải lớn hơn 0")
+            self.layout = PageLayout(page_size, options.max_dpi or DEFAULT_MAX_DPI)
+            self.log(f"Đặt ảnh lên trang khổ {options.page_size or 'A4'}, tối đa {self.layout.max_dpi} DPI.")
+
+        if options.dedup_threshold is not None and options.dedup_threshold < 0:
+            raise ConversionError("Ngưỡng khoảng cách Hamming không được âm")
+        if options.volume_pages is not None and options.volume_pages <= 0:
+            raise ConversionError("Số trang tối đa mỗi tập phải lớn hơn 0")
+        if options.volume_bytes is not None and options.volume_bytes <= 0:
+            raise ConversionError("Dung lượng tối đa mỗi tập phải lớn hơn 0")
+        if options.volume_index is not None and options.volume_index not in INDEX_FORMATS:
+            raise ConversionError(f"Định dạng mục lục phải là một trong {INDEX_FORMATS}")
+
+        if options.bucket_rules is not None:
+            try:
+                self.buckets = load_bucket_table(options.bucket_rules)
+            except (OSError, ValueError, TypeError) as e:
+                raise ConversionError(f"Không đọc được quy tắc phân nhóm: {str(e)}")
+            self.log(f"Phân nhóm theo {len(self.buckets.rules)} quy tắc, "
+                     f"{len(self.buckets.groups)} file PDF: {', '.join(self.buckets.groups)}.")
+
+        self.log("Bắt đầu quá trình chuyển đổi...")
+        self.set_status("Đang tìm các file ảnh...")
+
+        if options.recursive and options.per_folder and not options.input_files:
+            found = self._run_per_folder()
+        else:
+            with self.timed("find"):
+                image_files = self.find_images()
+            found = len(image_files)
+            if image_files:
+                self._convert_files(image_files, options.output_file)
+
+        if not found:
+            self.log("Không tìm thấy file ảnh nào trong thư mục.")
+            self.set_status("Không có file ảnh")
+            raise ConversionError("Không tìm thấy file ảnh nào trong thư mục")
+
+        self.set_status("Đã hoàn thành")
+        self.set_progress(100)
+        return self.result
+
+    def _run_per_folder(self):
+        """Chuyển đổi từng thư mục có ảnh thành file PDF riêng, trả về tổng số ảnh.
+
+        Ảnh ở thư mục gốc vào chính output_file, ảnh ở thư mục con a/b vào
+        <tên file PDF>/a/b.pdf. Thư mục được quét và chuyển đổi lần lượt nên
+        không cần liệt kê toàn bộ cây thư mục trước.
+        """
+        output_base = os.path.splitext(self.options.output_file)[0]
+        scanner = self.scanner()
+        folders = scanner.iter_folders()
+        found = 0
+        while True:
+            with self.timed("find"):
+                item = next(folders, None)
+            self._record_scan_errors(scanner)
+            if item is None:
+                return found
+            self._check_cancelled()
+            rel_dir, image_files = item
+            if rel_dir:
+                output_file = os.path.join(output_base, *rel_dir.split("/")) + ".pdf"
+                os.makedirs(os.path.dirname(output_file), exist_ok=True)
+            else:
+                output_file = self.options.output_file
+            self.log(f"Thư mục {rel_dir or '.'}:")
+            self._convert_files(image_files, output_file)
+            found += len(image_files)
+
+    def _convert_files(self, image_files, output_file):
+        """Tạo các file PDF (theo nhóm tỷ lệ nếu được yêu cầu) từ danh sách ảnh đã sắp xếp"""
+        options = self.options
+        self.metrics.count("images_found", len(image_files))
+        if options.sort_by_name:
+            self.log(f"Đã sắp xếp {len(image_files)} file ảnh theo tên.")
+
+        self.result.image_count += len(image_files)
+        self.log(f"Tìm thấy {len(image_files)} file ảnh.")
+        self.set_status(f"Đang xử lý {len(image_files)} file ảnh...")
+
+        # Đọc header của mỗi ảnh đúng một lần, dùng chung cho các bước phía sau
+        scan_end = 50 if options.separate_by_ratio else 10
+        with self.timed("scan"):
+            image_infos = self.scan_images(image_files, 0, scan_end)
+
+        if options.dedup:
+            with self.timed("dedup"):
+                image_infos = self.deduplicate(image_infos)
+
+        # Phân loại ảnh theo tỷ lệ khung hình nếu được yêu cầu
+        if options.separate_by_ratio:
+            with self.timed("classify"):
+                groups = self.classify_images(image_infos)
+
+            # Tạo các file PDF riêng cho từng nhóm
+            output_base = os.path.splitext(output_file)[0]
+            jobs = [(images, f"{output_base}{self.buckets.suffix(ratio_type)}.pdf", ratio_type)
+                    for ratio_type, images in groups.items() if images]
+        else:
+            # Tạo một PDF duy nhất cho tất cả các ảnh
+            jobs = [(image_infos, output_file, "all")]
+
+        if options.volume_pages or options.volume_bytes:
+            volumes = self.split_volumes(jobs)
+            self.create_outputs([(images, path, ratio_type) for images, path, ratio_type, _ in volumes],
+                                scan_end, 100)
+            if options.volume_index:
+                self.write_index(output_file, volumes)
+        else:
+            self.create_outputs(jobs, scan_end, 100)
+        if options.separate_by_ratio:
+            self.log("Đã hoàn thành việc tạo các file PDF theo tỷ lệ khung hình.")
+
+    def split_volumes(self, jobs):
+        """Chia mỗi job (ảnh, file PDF, nhóm tỷ lệ) thành các tập; trả về danh sách (ảnh, file tập, nhóm, số tập).
+
+        Job vừa trong một tập giữ nguyên tên file (không thêm _part001).
+        """
+        volumes = []
+        for images, path, ratio_type in jobs:
+            planned = plan_volumes(images, self.options.volume_pages, self.options.volume_bytes)
+            if len(planned) == 1:
+                volumes.append((planned[0], path, ratio_type, 1))
+                continue
+            self.log(f"Chia {os.path.basename(path)} thành {len(planned)} tập.")
+            volumes.extend((volume, volume_path(path, number), ratio_type, number)
+                           for number, volume in enumerate(planned, 1))
+        return volumes
+
+    def write_index(self, output_file, volumes):
+        """Ghi mục lục các tập đã tạo thành công (xem volumes.write_volume_index)"""
+        page_counts = {output.path: output.image_count for output in self.result.outputs}
+        entries = []
+        for images, path, ratio_type, number in volumes:
+            if path not in page_counts:
+                continue
+            entries.append({
+                "file": os.path.basename(path),
+                "ratio_type": ratio_type,
+                "volume": number,
+                "pages": page_counts[path],
+                "size": os.path.getsize(path),
+                "first_image": os.path.basename(images[0].path),
+                "last_image": os.path.basename(images[-1].path),
+            })
+        try:
+            index_file = write_volume_index(output_file, entries, self.options.volume_index)
+            self.log(f"Đã ghi mục lục {len(entries)} tập: {index_file}")
+        except OSError as e:
+            self.log(f"Không ghi được mục lục các tập: {str(e)}")
+
+    def create_outputs(self, jobs, progress_start, progress_end):
+        """Tạo các file PDF theo jobs, mỗi job là (danh sách ImageInfo, đường dẫn file, nhóm tỷ lệ).
+
+        Với nhiều worker, các file được tạo cùng lúc trên các luồng riêng và dùng
+        chung một process pool, nên tổng thời gian gần bằng thời gian của nhóm lớn
+        nhất. Lỗi ở một file được ghi vào result.errors mà không dừng các file khác;
+        chỉ khi mọi file đều lỗi thì lỗi đầu tiên mới được ném ra.
+        """
+        progress = _OutputProgress(progress_start, progress_end,
+                                   [(path, len(images)) for images, path, _ in jobs],
+                                   self.set_progress, self.set_output_progress)
+        workers = resolve_workers(self.options.workers)
+        outcomes = []
+        if len(jobs) > 1 and workers > 1:
+            # Số file được ghi cùng lúc không vượt quá số worker (ví dụ khi chia thành nhiều tập)
+            parallel = min(len(jobs), workers)
+            self.log(f"Tạo {len(jobs)} file PDF, tối đa {parallel} file cùng lúc, "
+                     f"dùng chung {workers} tiến trình xử lý ảnh.")
+            # Chia cửa sổ xử lý cho các file để tổng số ảnh đang xử lý không tăng theo số file
+            window = self.options.max_in_flight or workers * 2
+            self._max_in_flight = max(1, -(-window // parallel))
+            try:
+                with create_pool(workers, self.options.compute_backend) as pool, \
+                        ThreadPoolExecutor(max_workers=parallel, thread_name_prefix="imagetopdf-output") as threads:
+                    self._pool = pool
+                    futures = [threads.submit(self._create_pdf_in_thread, images, path, ratio_type, progress)
+                               for images, path, ratio_type in jobs]
+                    for future in futures:
+                        error = future.exception()
+                        outcomes.append((None, error) if error is not None else (future.result(), None))
+            finally:
+                self._pool = None
+                self._max_in_flight = None
+        else:
+            for images, path, ratio_type in jobs:
+                try:
+                    outcomes.append((self.create_pdf_for_images(images, path, ratio_type, progress), None))
+                except ConversionCancelled:
+                    raise
+                except Exception as e:
+                    outcomes.append((None, e))
+
+        self._check_cancelled()
+        failures = [error for _, error in outcomes if error is not None]
+        if failures and len(failures) == len(jobs):
+            raise failures[0]
+        for (images, path, ratio_type), (page_count, error) in zip(jobs, outcomes):
+            if error is None:
+                self.record_output(OutputFile(path, ratio_type, page_count))
+            else:
+                self.record_error(path, f"Không tạo được file PDF: {str(error)}", kind="output")
+
+    def _create_pdf_in_thread(self, *args):
+        """create_pdf_for_images trên luồng tạo file, được Profiler đo khi bật --profile"""
+        with self._profiler.thread() if self._profiler is not None else nullcontext():
+            return self.create_pdf_for_images(*args)
+
+    def scan_images(self, image_files, progress_start, progress_end):
+        """Đọc thông tin header (ImageInfo) của tất cả các ảnh; ảnh lỗi được ghi vào result.errors"""
+        self.log("Đang đọc thông tin ảnh...")
+        image_infos = []
+        scanned = scan_image_infos(image_files, workers=resolve_workers(self.options.workers))
+
+        for i, (img_path, info, error) in enumerate(scanned):
+            self._check_cancelled()
+            progress = progress_start + ((i / len(image_files)) * (progress_end - progress_start))
+            self.set_progress(progress)
+            self.set_current_file(os.path.basename(img_path))
+            self.set_status(f"Đang đọc thông tin ảnh: {i+1}/{len(image_files)}")
+
+            if error is not None:
+                self.record_error(img_path, error)
+                self.log(f"Lỗi khi đọc ảnh {os.path.basename(img_path)}: {error}")
+                continue
+            image_infos.append(info)
+
+        return image_infos
+
+    def deduplicate(self, image_infos):
+        """Tìm ảnh trùng theo options.dedup; trả về danh sách ảnh còn lại sau khi bỏ ảnh trùng.
+
+        Với dedup_share, mọi ảnh được giữ lại và ảnh trùng được ghi thành trang
+        dùng chung ảnh đã nhúng của ảnh gốc (xem _create_pdf_streaming).
+        """
+        self.log("Đang tìm ảnh trùng lặp...")
+        self.set_status("Đang tìm ảnh trùng lặp...")
+        try:
+            duplicates = find_duplicates(image_infos, self.options.dedup, self.options.dedup_threshold,
+                                         workers=resolve_workers(self.options.workers))
+        except ValueError as e:
+            raise ConversionError(str(e))
+        self.result.duplicates.extend(duplicates)
+        self.metrics.count("duplicates", len(duplicates))
+        self._shared = {}
+        if not duplicates:
+            self.log("Không có ảnh trùng lặp.")
+            return image_infos
+
+        for duplicate in duplicates:
+            self.log(f"Ảnh trùng: {os.path.basename(duplicate.path)} giống {os.path.basename(duplicate.original)}"
+                     + (f" (khoảng cách {duplicate.distance})" if duplicate.distance else ""))
+        if self.options.dedup_share and not self.options.incremental:
+            self._shared = {duplicate.path: duplicate.original for duplicate in duplicates}
+            self.log(f"{len(duplicates)} ảnh trùng dùng chung ảnh đã nhúng của ảnh gốc.")
+            return image_infos
+        if self.options.dedup_share:
+            self.log("Chế độ gia tăng không hỗ trợ dùng chung ảnh, các ảnh trùng sẽ bị bỏ qua.")
+
+        self.log(f"Bỏ qua {len(duplicates)} ảnh trùng lặp.")
+        dropped = {duplicate.index for duplicate in duplicates}
+        return [info for i, info in enumerate(image_infos) if i not in dropped]
+
+    def classify_images(self, image_infos):
+        """Phân loại ảnh theo bảng quy tắc (mặc định: landscape 16:9, portrait 9:16 và other) dựa trên ImageInfo"""
+        self.log("Phân loại ảnh theo tỷ lệ khung hình...")
+        groups = self.buckets.classify(image_infos)
+        self.log("Kết quả phân loại: " + ", ".join(f"{len(images)} ảnh {group}" for group, images in groups.items()) + ".")
+        return groups
+
+    def _report_item(self, i, total, img_path, ratio_type, progress):
+        progress((i + 1) / total)
+        self.set_current_file(os.path.basename(img_path))
+        self.set_status(f"Đang xử lý ảnh ({ratio_type}): {i+1}/{total}")
+
+    def _normalize_images(self, image_files, temp_dir, ratio_type, progress, encode=False):
+        """Chuẩn hóa ảnh qua process pool, trả về lần lượt các NormalizedImage hợp lệ.
+
+        temp_dir là thư mục (xem spill_dir) để ghi ảnh đã chuyển đổi thành file JPEG
+        tạm; None giữ chúng trong bộ nhớ dưới dạng bytes JPEG.
+        encode=True mã hóa thẳng thành PageImage cho bộ ghi PDF theo luồng.
+        Ảnh lỗi được bỏ qua và ghi vào result.errors. Khi ảnh được nhúng bằng
+        img2pdf (encode=False), ảnh giữ nguyên luôn được kiểm tra trong pool: img2pdf
+        chép nguyên dữ liệu nên JPEG bị cắt ngắn sẽ lọt vào PDF mà không báo lỗi.
+        """
+        normalized = iter_normalized(
+            image_files,
+            temp_dir,
+            workers=self.options.workers,
+            max_in_flight=self._max_in_flight or self.options.max_in_flight,
+            cache=self.cache,
+            encode=encode,
+            backend=self.options.compute_backend,
+            layout=self.page_layout(ratio_type) if encode else None,
+            profile=self.profile,
+            pool=self._pool,
+            validate=self.options.validate or not encode,
+        )
+        while True:
+            # Thời gian chờ kết quả từ pool là thời gian của giai đoạn chuẩn hóa
+            start = time.perf_counter()
+            item = next(normalized, None)
+            waited = time.perf_counter() - start
+            self._waits.normalize = getattr(self._waits, "normalize", 0.0) + waited
+            self.add_stage_time("normalize", waited)
+            if item is None:
+                break
+            self._check_cancelled()
+
+            self._report_item(item.index, len(image_files), item.source, ratio_type, progress)
+
+            if item.error is not None:
+                self.record_error(item.source, item.error)
+                self.log(f"Lỗi khi xử lý ảnh {os.path.basename(item.source)}: {item.error}")
+                continue
+
+            self._record_item_metrics(item, encode)
+
+            if item.is_temp:
+                with self._lock:
+                    self.result.temp_files.append(item.data)  # Theo dõi để dọn dẹp sau
+                # Ghi vào chỉ mục ngay khi file được tạo; vượt hạn mức thì file tạm cũ của phiên khác bị xóa
+                self.temp_storage.add(item.data, item.info.file_size)
+
+            self.log(f"Đã xử lý: {os.path.basename(item.source)}")
+            yield item
+
+    def spill_dir(self):
+        """Tạo thư mục tạm riêng (trong temp_folder) cho ảnh đã chuyển đổi của một file PDF.
+
+        Chỉ mục file tạm (TempStorage) chỉ được mở khi có file tạm đầu tiên, nên
+        các cách ghi không cần file tạm không động tới temp_folder.
+        """
+        with self._lock:
+            if self.temp_storage is None:
+                self.temp_storage = TempStorage(self.options.temp_folder, max_bytes=self.options.temp_max_bytes)
+            temp_dir = tempfile.mkdtemp(prefix="pdf_", dir=self.options.temp_folder)
+            self.result.temp_folders.append(temp_dir)
+        return temp_dir
+
+    def _record_item_metrics(self, item, encode):
+        if item.elapsed == 0:
+            # Lấy từ bộ nhớ đệm, không qua worker
+            self.metrics.count("images_cached")
+            return
+        self.metrics.observe("image_encode" if encode else "image_normalize", item.elapsed)
+        if getattr(item.data, 'reencoded', False) or isinstance(item.data, bytes) or item.is_temp:
+            self.metrics.count("images_reencoded")
+        else:
+            self.metrics.count("images_passthrough")
+
+    def page_layout(self, ratio_type):
+        """Bố cục trang cho một nhóm tỷ lệ (hướng trang theo nhóm), hoặc None nếu trang vừa bằng ảnh"""
+        return self.layout.oriented(self.buckets.orientation(ratio_type)) if self.layout is not None else None
+
+    def manifest_variant(self, ratio_type):
+        """Các tùy chọn ảnh hưởng tới điểm ảnh của trang, lưu trong manifest của bản dựng gia tăng.
+
+        Gồm bố cục trang, hồ sơ nén và backend tính toán (ảnh alpha được đặt lên
+        nền trắng khác với Pillow); đổi một trong số đó thì các trang cũ không được dùng lại.
+        """
+        layout = self.page_layout(ratio_type)
+        return ((layout.signature if layout is not None else "")
+                + (self.profile.signature if self.profile is not None else "")
+                + (f"backend={self.options.compute_backend}" if self.options.compute_backend else ""))
+
+    def record_error(self, img_path, message, kind="image"):
+        """Ghi nhận một ảnh (hoặc thư mục, file PDF theo kind) không xử lý được"""
+        with self._lock:
+            self.result.errors.append(ImageError(img_path, message, kind))
+        self.metrics.count("image_errors")
+
+    def record_output(self, output):
+        """Ghi nhận một file PDF đã tạo"""
+        with self._lock:
+            self.result.outputs.append(output)
+        self.metrics.count("pages", output.image_count)
+        try:
+            self.metrics.count("output_bytes", os.path.getsize(output.path))
+        except OSError:
+            pass
+
+    def create_pdf_for_images(self, image_files, output_file, ratio_type, progress=None):
+        """Tạo một file PDF từ danh sách ImageInfo (hoặc đường dẫn), trả về số trang.
+
+        progress là tiến trình dùng chung của create_outputs; mặc định file này
+        chiếm toàn bộ tiến trình tổng thể.
+        """
+        if progress is None:
+            progress = _OutputProgress(0, 100, [(output_file, len(image_files))],
+                                       self.set_progress, self.set_output_progress)
+        # Các bước bên dưới chỉ báo phần đã xong (0..1) của file này
+        progress = partial(progress.update, output_file)
+        try:
+            self.log(f"Đang tạo file PDF cho {len(image_files)} ảnh {ratio_type}...")
+            self.set_status(f"Đang tạo file PDF cho ảnh {ratio_type}...")
+
+            # Nếu không có file nào, không tạo PDF
+            if not image_files:
+                self.log(f"Không có ảnh nào thuộc loại {ratio_type}, bỏ qua.")
+                return 0
+
+            # Thời gian ghi PDF là toàn bộ thời gian tạo file trừ phần chờ chuẩn hóa ảnh
+            start = time.perf_counter()
+            self._waits.normalize = 0.0
+            if self.options.incremental:
+                page_count = self._create_pdf_incremental(image_files, output_file, ratio_type, progress)
+            else:
+                # File được ghi lại từ đầu mà không có manifest: xóa manifest của lần chạy gia tăng trước
+                # để nó không bao giờ được dùng với một file PDF khác
+                remove_manifest(output_file)
+                if (self.options.streaming or self.layout is not None or self._shared or self.options.build_manifest
+                        or self.options.volume_pages or self.options.volume_bytes):
+                    # Khổ trang cố định, ảnh dùng chung, build manifest và các tập chỉ được hỗ trợ bởi bộ ghi theo luồng
+                    page_count = self._create_pdf_streaming(image_files, output_file, ratio_type, progress)
+                elif self.options.preserve_ratio:
+                    page_count = self._create_pdf_preserve_ratio(image_files, output_file, ratio_type, progress)
+                else:
+                    page_count = self._create_pdf_in_memory(image_files, output_file, ratio_type, progress)
+            self.add_stage_time("write", time.perf_counter() - start - self._waits.normalize)
+            if self.options.verify_output:
+                with self.metrics.timer("verify_pages"):
+                    self.verify_output(output_file, page_count)
+            progress(1.0)
+
+            self.log(f"Đã tạo thành công file PDF: {output_file}")
+            return page_count
+
+        except Exception as e:
+            self.log(f"Lỗi khi tạo PDF: {str(e)}")
+            raise
+
+    def _create_pdf_streaming(self, image_files, output_file, ratio_type, progress):
+        # Ghi từng trang xuống đĩa ngay khi ảnh được mã hóa xong; mỗi ảnh được
+        # nhúng theo định dạng gốc nên không cần file tạm
+        to_encode, shared_after, originals = self._plan_shared_pages(image_files)
+        # {đường dẫn ảnh gốc: số thứ tự trang} để các trang trùng phía sau dùng lại
+        pages = {}
+
+        def add_shared(slots):
+            for slot in slots:
+                for img_path, original in shared_after[slot]:
+                    if original in pages:
+                        writer.share_page(pages[original], source=img_path)
+                        self.metrics.count("pages_shared")
+                    else:
+                        self.record_error(img_path, f"Ảnh gốc {os.path.basename(original)} không được ghi vào PDF",
+                                          kind="duplicate")
+
+        with StreamingPDFWriter(output_file) as writer:
+            written = 0
+            for item in self._normalize_images(to_encode, None, ratio_type, progress, encode=True):
+                # Các trang trùng nằm giữa ảnh trước và ảnh này được ghi trước
+                add_shared(range(written, item.index))
+                written = item.index
+                start = time.perf_counter()
+                try:
+                    page_number = writer.add_page(item.data, shareable=item.source in originals, source=item.source)
+                    self.metrics.observe("page_write", time.perf_counter() - start)
+                    if item.source in originals:
+                        pages.setdefault(item.source, page_number)
+                except Exception as e:
+                    self.record_error(item.source, str(e))
+                    self.log(f"Lỗi khi ghi ảnh {os.path.basename(item.source)} vào PDF: {str(e)}")
+            add_shared(range(written, len(to_encode)))
+
+            if writer.page_count == 0:
+                writer.abort()
+                os.remove(output_file)
+                self.log("Không có ảnh nào được xử lý thành công.")
+                raise ConversionError("Không có ảnh nào được xử lý thành công")
+
+        self.metrics.count("bytes_zero_copy", writer.zero_copy_bytes)
+        if self.options.build_manifest:
+            save_build_manifest(output_file, writer.build_manifest())
+        file_size = os.path.getsize(output_file) / 1024  # kB
+        self.log(f"File PDF đã được tạo: {output_file} ({writer.page_count} trang, kích thước: {file_size:.2f} kB)")
+        return writer.page_count
+
+    def _plan_shared_pages(self, image_files):
+        """Tách các ảnh trùng được dùng chung ảnh gốc khỏi danh sách cần mã hóa.
+
+        Trả về (ảnh cần mã hóa, danh sách trang trùng đứng sau từng ảnh cần mã
+        hóa dưới dạng (ảnh trùng, ảnh gốc), tập ảnh gốc). Ảnh trùng có ảnh gốc
+        không nằm trong file này được mã hóa như bình thường.
+        """
+        to_encode = []
+        shared_after = []
+        seen = set()
+        for image in image_files:
+            img_path = _image_path(image)
+            original = self._shared.get(img_path)
+            if original is not None and original in seen and shared_after:
+                shared_after[-1].append((img_path, original))
+                continue
+            to_encode.append(image)
+            shared_after.append([])
+            seen.add(img_path)
+        originals = {original for slots in shared_after for _, original in slots}
+        return to_encode, shared_after, originals
+
+    def _create_pdf_incremental(self, image_files, output_file, ratio_type, progress):
+        # Đối chiếu ảnh hiện có với manifest của lần chạy trước: nếu các trang cũ
+        # vẫn là phần đầu không đổi của danh sách, chỉ ghi nối các trang mới vào
+        # cuối file (incremental update); ngược lại, dựng file mới bằng cách sao
+        # chép nguyên khối các trang không đổi và chỉ mã hóa các ảnh mới hoặc đã sửa
+        keys = [source_key(_image_path(image)) for image in image_files]
+        variant = self.manifest_variant(ratio_type)
+        manifest = load_manifest(output_file, variant) if os.path.exists(output_file) else None
+
+        if manifest is None:
+            self.log("Không có manifest hợp lệ, dựng lại toàn bộ file PDF.")
+            return self._rewrite_pdf(image_files, keys, output_file, None, ratio_type, progress)
+
+        writer_state, old_pages = manifest
+        old_keys = [page.key for page in old_pages]
+        if old_keys != keys[:len(old_keys)]:
+            return self._rewrite_pdf(image_files, keys, output_file, manifest, ratio_type, progress)
+
+        new_images = image_files[len(old_keys):]
+        if not new_images:
+            self.log(f"Không có ảnh mới hoặc thay đổi, giữ nguyên {output_file} ({len(old_pages)} trang).")
+            return len(old_pages)
+
+        self.log(f"Thêm {len(new_images)} ảnh mới vào cuối file PDF ({len(old_pages)} trang đã có).")
+        new_keys = keys[len(old_keys):]
+        pages = list(old_pages)
+        with StreamingPDFWriter(output_file, resume=writer_state) as writer:
+            for item in self._normalize_images(new_images, None, ratio_type, progress, encode=True):
+                try:
+                    writer.add_page(item.data, source=item.source)
+                except Exception as e:
+                    self.record_error(item.source, str(e))
+                    self.log(f"Lỗi khi ghi ảnh {os.path.basename(item.source)} vào PDF: {str(e)}")
+                    continue
+                pages.append(ManifestPage(new_keys[item.index], writer.records[-1]))
+
+        save_manifest(output_file, writer.state(), pages, variant)
+        self.metrics.count("bytes_zero_copy", writer.zero_copy_bytes)
+        if self.options.build_manifest:
+            # Các trang cũ lấy PageRecord từ manifest của lần chạy trước
+            save_build_manifest(output_file, writer.build_manifest([page.record for page in pages]))
+        self.log(f"Đã cập nhật file PDF: {output_file} ({writer.page_count} trang)")
+        return writer.page_count
+
+    def _rewrite_pdf(self, image_files, keys, output_file, manifest, ratio_type, progress):
+        old_records = {}
+        next_id = None
+        if manifest is not None:
+            writer_state, old_pages = manifest
+            old_records = {page.key: page.record for page in old_pages}
+            # Giữ nguyên id object của các trang được sao chép, trang mới dùng id tiếp theo
+            next_id = writer_state["next_id"]
+
+        to_encode = [image for image, key in zip(image_files, keys) if key not in old_records]
+        reused = len(image_files) - len(to_encode)
+        if manifest is not None:
+            self.log(f"Dựng lại file PDF: giữ {reused} trang không đổi, mã hóa {len(to_encode)} ảnh mới hoặc đã sửa.")
+
+        tmp_file = output_file + ".tmp"
+        pages = []
+        encoded = self._normalize_images(to_encode, None, ratio_type, progress, encode=True)
+        pending = next(encoded, None)
+        encode_index = 0
+        old_file = open(output_file, 'rb') if reused else None
+        try:
+            with StreamingPDFWriter(tmp_file, next_id=next_id) as writer:
+                for key in keys:
+                    record = old_records.get(key)
+                    if record is not None:
+                        writer.copy_page(old_file, record)
+                        self.metrics.count("pages_copied")
+                    else:
+                        position = encode_index
+                        encode_index += 1
+                        if pending is None or pending.index != position:
+                            # Ảnh lỗi đã được ghi vào result.errors và không được trả về
+                            continue
+                        item, pending = pending, next(encoded, None)
+                        try:
+                            writer.add_page(item.data, source=item.source)
+                        except Exception as e:
+                            self.record_error(item.source, str(e))
+                            self.log(f"Lỗi khi ghi ảnh {os.path.basename(item.source)} vào PDF: {str(e)}")
+                            continue
+                    pages.append(ManifestPage(key, writer.records[-1]))
+
+                if writer.page_count == 0:
+                    writer.abort()
+                    os.remove(tmp_file)
+                    self.log("Không có ảnh nào được xử lý thành công.")
+                    raise ConversionError("Không có ảnh nào được xử lý thành công")
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        finally:
+            encoded.close()
+            if old_file is not None:
+                old_file.close()
+
+        os.replace(tmp_file, output_file)
+        save_manifest(output_file, writer.state(), pages, self.manifest_variant(ratio_type))
+        self.metrics.count("bytes_zero_copy", writer.zero_copy_bytes)
+        if self.options.build_manifest:
+            save_build_manifest(output_file, writer.build_manifest())
+        file_size = os.path.getsize(output_file) / 1024  # kB
+        self.log(f"File PDF đã được tạo: {output_file} ({writer.page_count} trang, kích thước: {file_size:.2f} kB)")
+        return writer.page_count
+
+    def _create_pdf_preserve_ratio(self, image_files, output_file, ratio_type, progress):
+        # Sử dụng cách đơn giản hơn để giữ tỷ lệ khung hình
+        # Danh sách chỉ chứa các ảnh hợp lệ dưới dạng (ảnh gốc, đường dẫn ảnh gốc hoặc
+        # file JPEG tạm đã chuyển đổi), nên bộ nhớ không tăng theo số ảnh phải chuyển đổi
+        actual_images = []
+        seen_paths = set()
+
+        for item in self._normalize_images(image_files, self.spill_dir(), ratio_type, progress):
+            # Kiểm tra để đảm bảo không có đường dẫn trùng lặp
+            if isinstance(item.data, str):
+                if item.data in seen_paths:
+                    continue
+                seen_paths.add(item.data)
+            actual_images.append((item.source, item.data))
+
+        self.log(f"Số ảnh sau khi lọc và loại bỏ trùng lặp: {len(actual_images)}")
+
+        if not actual_images:
+            self.log("Không có ảnh nào được xử lý thành công.")
+            raise ConversionError("Không có ảnh nào được xử lý thành công")
+
+        self.log(f"Chuyển đổi {len(actual_images)} file ảnh sang PDF...")
+        page_count = self._write_img2pdf(actual_images, output_file)
+
+        # Kiểm tra kết quả
+        file_size = os.path.getsize(output_file) / 1024  # kB
+        self.log(f"File PDF đã được tạo: {output_file} (kích thước: {file_size:.2f} kB)")
+        return page_count
+
+    def _write_img2pdf(self, images, output_file):
+        """Ghi danh sách (ảnh gốc, dữ liệu) thành PDF bằng img2pdf, trả về số trang.
+
+        Ảnh hỏng đã bị loại khi kiểm tra trong pool (xem _normalize_images) và được
+        chuyển vào thư mục cách ly ngay trước khi ghi. Nếu img2pdf vẫn báo lỗi (ảnh
+        Pillow đọc được nhưng img2pdf không nhận), từng ảnh được kiểm tra riêng (xem
+        _isolate_img2pdf_errors): chỉ những ảnh lỗi bị mã hóa lại hoặc loại bỏ.
+        """
+        if self.options.quarantine_dir:
+            self.quarantine_errors()
+        data = [image for _, image in images]
+        try:
+            with self.metrics.timer("img2pdf_convert"):
+                self._img2pdf_to_file(data, output_file)
+        except Exception as e:
+            self.log(f"Lỗi khi tạo PDF với img2pdf: {str(e)}")
+            self.log("Kiểm tra riêng từng ảnh để tách các ảnh lỗi...")
+            with self.metrics.timer("img2pdf_isolate"):
+                data = self._isolate_img2pdf_errors(images)
+            if not data:
+                raise ConversionError("Không có ảnh nào được xử lý thành công")
+            with self.metrics.timer("img2pdf_convert"):
+                self._img2pdf_to_file(data, output_file)
+        return len(data)
+
+    @staticmethod
+    def _img2pdf_to_file(data, output_file):
+        # img2pdf ghi thẳng ra file tạm thay vì trả về cả tài liệu dưới dạng bytes;
+        # file đích chỉ bị thay khi ghi xong
+        tmp_file = output_file + ".tmp"
+        try:
+            with open(tmp_file, "wb") as f:
+                img2pdf.convert(data, outputstream=f)
+        except BaseException:
+            if os.path.exists(tmp_file):
+                os.remove(tmp_file)
+            raise
+        os.replace(tmp_file, output_file)
+
+    def _isolate_img2pdf_errors(self, images):
+        """Các ảnh img2pdf nhận được; ảnh không nhận được thử mã hóa lại bằng Pillow, vẫn lỗi thì ghi vào result.errors"""
+        accepted = []
+        for source, data in images:
+            try:
+                img2pdf.convert(data)
+                accepted.append(data)
+                continue
+            except Exception as e:
+                reason = str(e)
+            try:
+                # Chỉ ảnh này được giải mã lại, không giữ các ảnh khác trong bộ nhớ
+                with Image.open(io.BytesIO(data) if isinstance(data, bytes) else data) as img:
+                    buffer = io.BytesIO()
+                    img.convert('RGB').save(buffer, format='JPEG')
+                data = buffer.getvalue()
+                img2pdf.convert(data)
+            except Exception as e:
+                self.record_error(source, f"img2pdf: {reason}; Pillow: {str(e)}")
+                self.log(f"Bỏ qua ảnh lỗi: {os.path.basename(source)}: {reason}")
+                continue
+            self.log(f"Ảnh {os.path.basename(source)} được mã hóa lại bằng Pillow ({reason}).")
+            self.metrics.count("images_fallback")
+            accepted.append(data)
+        return accepted
+
+    def verify_output(self, output_file, expected):
+        """Kiểm tra số trang của file PDF vừa ghi chỉ qua bảng xref và trailer (không đọc lại toàn bộ file)"""
+        try:
+            summary = verify_pdf(output_file)
+        except PDFUnsupported as e:
+            self.log(f"Bỏ qua kiểm tra số trang PDF: {str(e)}")
+            return
+        except PDFVerifyError as e:
+            raise ConversionError(f"File PDF vừa ghi không hợp lệ: {str(e)}")
+        self.log(f"Số trang trong file PDF: {summary.page_count} (mong đợi: {expected})")
+
+        # Cảnh báo nếu số trang khác với số ảnh
+        if summary.page_count != expected:
+            self.log("Cảnh báo: Số trang PDF không khớp với số ảnh đầu vào!")
+
+    def _create_pdf_in_memory(self, image_files, output_file, ratio_type, progress):
+        # Phương pháp cũ (không giữ nguyên tỷ lệ)
+        # Loại bỏ trùng lặp trong danh sách các ảnh đệm
+        # Với files, chúng ta có thể kiểm tra đường dẫn
+        # Với dữ liệu đệm, không thể kiểm tra trùng lặp dễ dàng nên cứ giữ nguyên
+        unique_images = []
+        seen_paths = set()
+
+        for item in self._normalize_images(image_files, self.spill_dir(), ratio_type, progress):
+            if isinstance(item.data, str):  # Nếu là đường dẫn file
+                if item.data in seen_paths:
+                    continue
+                seen_paths.add(item.data)
+            unique_images.append((item.source, item.data))
+
+        # Tạo PDF
+        if unique_images:
+            page_count = self._write_img2pdf(unique_images, output_file)
+
+            # Ghi log số lượng ảnh đã chuyển đổi
+            self.log(f"Đã chuyển đổi {page_count} ảnh sang PDF (không giữ tỷ lệ)")
+            return page_count
+        else:
+            self.log("Không có ảnh nào được xử lý thành công.")
+            raise ConversionError("Không có ảnh nào được xử lý thành công")
+
+
+def convert(options, **callbacks):
+    """Chuyển đổi theo options và trả về ConversionResult.
+
+    callbacks là các tham số on_log, on_progress, on_status, on_file của ConversionEngine.
+    """
+    return ConversionEngine(options, **callbacks).run()
+
+
+def remove_temp_files(result, temp_folder=DEFAULT_TEMP_FOLDER):
+    """Xóa các file và thư mục tạm do một lần chuyển đổi tạo ra, trả về số mục đã xóa"""
+    removed = 0
+    if result.temp_files:
+        with TempStorage(temp_folder) as storage:
+            removed += storage.discard(result.temp_files)[0]
+    for temp_dir in result.temp_folders:
+        if os.path.isdir(temp_dir):
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            removed += 1
+    result.temp_files = []
+    result.temp_folders = []
+    return removed
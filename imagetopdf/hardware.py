@@ -0,0 +1,192 @@
+"""Phát hiện GPU, chạy ngoài đường khởi động và lưu kết quả trên đĩa.
+
+Việc dò phần cứng (nvidia-smi, WMI hoặc dxdiag trên Windows) có thể mất vài
+giây nên được chạy trong luồng nền, mỗi lệnh đều có thời gian chờ tối đa. Kết
+quả được lưu vào một file JSON nhỏ và dùng lại trong DETECTION_TTL giây, nên
+các lần mở ứng dụng sau không phải dò lại.
+
+PyTorch không được import ở đây; dùng load_torch() khi thực sự cần tới GPU.
+"""
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+
+from .cache import default_cache_dir
+
+# Thời gian dùng lại kết quả đã lưu (giây)
+DETECTION_TTL = 24 * 60 * 60
+
+# Thời gian chờ tối đa cho mỗi lệnh dò phần cứng (giây)
+PROBE_TIMEOUT = 5
+
+_STATUS_VERSION = 1
+
+
+@dataclass
+class GPUStatus:
+    """Kết quả dò GPU"""
+    has_gpu: bool = False
+    gpu_name: str = "Không có"
+    cuda_version: str = ""
+    details: list = field(default_factory=list)
+    checked_at: float = 0.0
+
+    @property
+    def info_text(self):
+        return "\n".join(self.details) if self.details else "Không có thông tin GPU"
+
+
+def default_status_file():
+    """File lưu kết quả dò GPU, nằm cạnh thư mục bộ nhớ đệm trang"""
+    return os.path.join(os.path.dirname(default_cache_dir()), "gpu.json")
+
+
+def torch_installed():
+    """PyTorch có được cài đặt hay không (không import)"""
+    return importlib.util.find_spec("torch") is not None
+
+
+def load_torch():
+    """Import PyTorch khi cần; trả về module torch hoặc None nếu không có"""
+    try:
+        import torch
+        return torch
+    except ImportError:
+        return None
+
+
+def _probe_nvidia_smi(status, timeout):
+    try:
+        result = subprocess.run(
+            ['nvidia-smi', '--query-gpu=gpu_name,driver_version,cuda_version', '--format=csv,noheader'],
+            capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        status.details.append("NVIDIA-SMI: Quá thời gian chờ")
+        return
+    except (subprocess.SubprocessError, OSError):
+        status.details.append("NVIDIA-SMI: Không có hoặc không chạy được")
+        return
+
+    if result.returncode != 0 or not result.stdout.strip():
+        status.details.append("NVIDIA-SMI: Không có hoặc không chạy được")
+        return
+    for line in result.stdout.strip().split('\n'):
+        parts = line.strip().split(', ')
+        if len(parts) >= 3:
+            gpu_name, driver_ver, cuda_ver = parts[:3]
+            status.cuda_version = cuda_ver
+            status.details.append(f"NVIDIA-SMI: {gpu_name}, Driver: {driver_ver}, CUDA: {cuda_ver}")
+            if not status.has_gpu:
+                status.has_gpu = True
+                status.gpu_name = gpu_name
+        else:
+            status.details.append(f"NVIDIA-SMI: {line.strip()}")
+
+
+def _probe_windows(status, timeout):
+    try:
+        import pythoncom
+        import wmi
+        # WMI dùng COM, cần khởi tạo trên luồng đang chạy
+        pythoncom.CoInitialize()
+        try:
+            for gpu in wmi.WMI().Win32_VideoController():
+                status.details.append(f"DirectX: {gpu.Name} ({(gpu.AdapterRAM or 0)/(1024**2):.0f} MB)")
+                if 'nvidia' in gpu.Name.lower() and not status.has_gpu:
+                    status.has_gpu = True
+                    status.gpu_name = gpu.Name
+        finally:
+            pythoncom.CoUninitialize()
+        return
+    except Exception:
+        pass
+
+    output_file = os.path.join(tempfile.gettempdir(), f"dxdiag_{os.getpid()}.txt")
+    try:
+        subprocess.run(['dxdiag', '/t', output_file], capture_output=True, timeout=timeout)
+        with open(output_file, 'r', errors='replace') as f:
+            if 'NVIDIA' in f.read():
+                status.details.append("DirectX: Phát hiện GPU NVIDIA")
+                if not status.has_gpu:
+                    status.has_gpu = True
+                    status.gpu_name = "NVIDIA GPU (phát hiện qua DirectX)"
+    except subprocess.TimeoutExpired:
+        status.details.append("DirectX: Quá thời gian chờ")
+    except Exception:
+        status.details.append("DirectX: Không thể kiểm tra")
+    finally:
+        try:
+            os.remove(output_file)
+        except OSError:
+            pass
+
+
+def probe_gpu(timeout=PROBE_TIMEOUT):
+    """Dò GPU bằng các công cụ của hệ thống (không dùng PyTorch)"""
+    status = GPUStatus()
+    _probe_nvidia_smi(status, timeout)
+    if platform.system() == 'Windows':
+        _probe_windows(status, timeout)
+    status.details.append("PyTorch: Đã cài đặt" if torch_installed() else "PyTorch: Chưa cài đặt")
+    status.checked_at = time.time()
+    return status
+
+
+def load_status(status_file=None, ttl=DETECTION_TTL):
+    """Đọc kết quả dò GPU đã lưu; trả về None nếu chưa có hoặc đã quá hạn"""
+    try:
+        with open(status_file or default_status_file(), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.pop("version", None) != _STATUS_VERSION:
+            return None
+        status = GPUStatus(**data)
+    except (OSError, ValueError, TypeError):
+        return None
+    if not 0 <= time.time() - status.checked_at <= ttl:
+        return None
+    return status
+
+
+def save_status(status, status_file=None):
+    status_file = status_file or default_status_file()
+    os.makedirs(os.path.dirname(status_file), exist_ok=True)
+    data = asdict(status)
+    data["version"] = _STATUS_VERSION
+    tmp_path = f"{status_file}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, status_file)
+
+
+def detect_gpu(status_file=None, ttl=DETECTION_TTL, refresh=False, timeout=PROBE_TIMEOUT):
+    """Trả về GPUStatus: dùng kết quả đã lưu nếu còn hạn, nếu không thì dò lại và lưu"""
+    if not refresh:
+        status = load_status(status_file, ttl)
+        if status is not None:
+            return status
+    status = probe_gpu(timeout)
+    try:
+        save_status(status, status_file)
+    except OSError:
+        pass
+    return status
+
+
+def detect_gpu_async(callback, **kwargs):
+    """Chạy detect_gpu trong luồng nền rồi gọi callback(status) trên luồng đó"""
+    def worker():
+        try:
+            status = detect_gpu(**kwargs)
+        except Exception as e:
+            status = GPUStatus(details=[f"Lỗi khi kiểm tra GPU: {str(e)}"], checked_at=time.time())
+        callback(status)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
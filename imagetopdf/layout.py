@@ -0,0 +1,87 @@
+"""Bố cục trang theo khổ giấy cố định (A4, Letter hoặc tùy chỉnh) với DPI tối đa.
+
+Mỗi ảnh được đặt vừa khít và căn giữa trên một trang có khổ đã chọn; hướng
+trang (ngang/dọc) lấy theo nhóm tỷ lệ khung hình (xem buckets), hoặc theo
+chính ảnh với các nhóm không có hướng chung như "other". Ảnh có độ phân giải vượt quá max_dpi trên
+trang được thu nhỏ trước khi nhúng, nên ảnh chụp 48 MP chỉ còn vài trăm kB
+mỗi trang thay vì hàng chục MB.
+"""
+import math
+import re
+
+from reportlab.lib.pagesizes import A3, A4, A5, LEGAL, LETTER, landscape, portrait
+
+# DPI tối đa mặc định của ảnh trên trang
+DEFAULT_MAX_DPI = 150
+
+# Khổ giấy theo tên (đơn vị point, chiều dọc)
+PAGE_SIZES = {
+    "A3": A3,
+    "A4": A4,
+    "A5": A5,
+    "Letter": LETTER,
+    "Legal": LEGAL,
+}
+
+_UNITS = {"pt": 1.0, "mm": 72 / 25.4, "cm": 72 / 2.54, "in": 72.0}
+
+_CUSTOM_SIZE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*[x×]\s*(\d+(?:\.\d+)?)\s*(pt|mm|cm|in)?\s*$", re.IGNORECASE)
+
+
+def parse_page_size(text):
+    """Đọc khổ giấy: tên (A4, Letter...) hoặc "RộngxCao" kèm đơn vị pt/mm/cm/in (mặc định mm)"""
+    name = text.strip().lower()
+    for size_name, size in PAGE_SIZES.items():
+        if size_name.lower() == name:
+            return size
+    match = _CUSTOM_SIZE.match(text)
+    if match is None:
+        raise ValueError(f"Khổ giấy không hợp lệ: {text} (dùng {', '.join(PAGE_SIZES)} hoặc dạng 210x297mm)")
+    scale = _UNITS[(match.group(3) or "mm").lower()]
+    width, height = float(match.group(1)) * scale, float(match.group(2)) * scale
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Khổ giấy không hợp lệ: {text}")
+    return width, height
+
+
+class PageLayout:
+    """Khổ giấy, DPI tối đa và hướng trang cho một nhóm ảnh.
+
+    orientation là "landscape", "portrait" hoặc None (theo hướng của từng ảnh).
+    Đối tượng chỉ chứa số và chuỗi nên gửi được sang process pool.
+    """
+
+    def __init__(self, page_size, max_dpi=DEFAULT_MAX_DPI, orientation=None):
+        self.page_size = page_size
+        self.max_dpi = max_dpi
+        self.orientation = orientation
+
+    def oriented(self, orientation):
+        """Cùng khổ giấy và DPI với hướng trang cố định ("landscape", "portrait") hoặc theo từng ảnh (None)"""
+        return PageLayout(self.page_size, self.max_dpi, orientation)
+
+    @property
+    def signature(self):
+        """Chuỗi mô tả bố cục, dùng làm một phần khóa bộ nhớ đệm và manifest"""
+        width, height = self.page_size
+        return f"page={width:.2f}x{height:.2f}@{self.max_dpi}:{self.orientation or 'auto'}"
+
+    def page_for(self, width, height):
+        """Khổ trang (point) cho ảnh có kích thước hiển thị width x height"""
+        orientation = self.orientation or ("landscape" if width > height else "portrait")
+        return landscape(self.page_size) if orientation == "landscape" else portrait(self.page_size)
+
+    def place(self, width, height):
+        """Đặt ảnh width x height (pixel, đã xoay theo EXIF) lên trang.
+
+        Trả về (rộng trang, cao trang, rộng ảnh, cao ảnh) tính bằng point; ảnh giữ
+        nguyên tỷ lệ và vừa khít trong trang.
+        """
+        page_w, page_h = self.page_for(width, height)
+        scale = min(page_w / width, page_h / height)
+        return page_w, page_h, width * scale, height * scale
+
+    def pixel_limit(self, width_pt, height_pt):
+        """Kích thước tối đa (pixel) của ảnh chiếm width_pt x height_pt trên trang"""
+        return (max(1, math.ceil(width_pt / 72.0 * self.max_dpi)),
+                max(1, math.ceil(height_pt / 72.0 * self.max_dpi)))
@@ -0,0 +1,117 @@
+"""File manifest đi kèm PDF để dựng lại tài liệu theo kiểu gia tăng.
+
+Manifest (<output>.manifest.json) ghi lại, cho từng trang, ảnh nguồn đã tạo ra
+trang đó (đường dẫn, kích thước, thời gian sửa) và vị trí các object của trang
+trong file PDF. Nhờ đó lần chạy sau biết được ảnh nào mới, ảnh nào đã đổi hoặc
+bị xóa mà không cần đọc lại PDF.
+
+Manifest chỉ hợp lệ khi kích thước file PDF trùng với giá trị đã lưu; nếu PDF
+bị sửa bởi chương trình khác, tài liệu sẽ được dựng lại từ đầu.
+
+Build manifest (<output>.build.json) là bản mô tả file PDF dành cho người dùng
+và công cụ khác: số trang, và cho từng trang ảnh nguồn, kích thước, vị trí khối
+byte và CRC32, do StreamingPDFWriter tính trong lúc ghi (xem build_manifest).
+"""
+import json
+import os
+
+from .cache import ENCODER_VERSION
+from .pdfwriter import PageRecord
+
+MANIFEST_VERSION = 1
+
+MANIFEST_SUFFIX = ".manifest.json"
+
+BUILD_MANIFEST_VERSION = 1
+
+BUILD_MANIFEST_SUFFIX = ".build.json"
+
+
+def manifest_path(output_file):
+    return output_file + MANIFEST_SUFFIX
+
+
+def source_key(img_path):
+    """Định danh một ảnh nguồn: (đường dẫn tuyệt đối, kích thước, thời gian sửa)"""
+    stat = os.stat(img_path)
+    return os.path.abspath(img_path), stat.st_size, stat.st_mtime_ns
+
+
+class ManifestPage:
+    """Một trang trong manifest: định danh ảnh nguồn và PageRecord của trang"""
+
+    def __init__(self, key, record):
+        self.key = key
+        self.record = record
+
+    def to_dict(self):
+        path, size, mtime_ns = self.key
+        return {"source": path, "size": size, "mtime_ns": mtime_ns, "record": self.record.to_dict()}
+
+    @classmethod
+    def from_dict(cls, data):
+        key = (data["source"], data["size"], data["mtime_ns"])
+        return cls(key, PageRecord.from_dict(data["record"]))
+
+
+def load_manifest(output_file, variant=""):
+    """Đọc manifest của output_file; trả về (trạng thái writer, danh sách ManifestPage) hoặc None.
+
+    variant mô tả các tùy chọn ảnh hưởng tới nội dung trang (ví dụ bố cục trang);
+    manifest được ghi với variant khác bị coi là không hợp lệ.
+    """
+    try:
+        with open(manifest_path(output_file), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION or data.get("encoder_version") != ENCODER_VERSION:
+            return None
+        if data.get("variant", "") != variant:
+            return None
+        if os.path.getsize(output_file) != data["pdf_size"]:
+            return None
+        pages = [ManifestPage.from_dict(page) for page in data["pages"]]
+        return data["writer"], pages
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def save_manifest(output_file, writer_state, pages, variant=""):
+    """Ghi manifest cho output_file (ghi ra file tạm rồi đổi tên)"""
+    data = {
+        "version": MANIFEST_VERSION,
+        "encoder_version": ENCODER_VERSION,
+        "variant": variant,
+        "pdf_size": os.path.getsize(output_file),
+        "writer": writer_state,
+        "pages": [page.to_dict() for page in pages],
+    }
+    path = manifest_path(output_file)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def build_manifest_path(output_file):
+    return output_file + BUILD_MANIFEST_SUFFIX
+
+
+def save_build_manifest(output_file, build):
+    """Ghi build manifest (kết quả của StreamingPDFWriter.build_manifest) cạnh output_file, trả về đường dẫn"""
+    data = {"version": BUILD_MANIFEST_VERSION, "pdf": os.path.abspath(output_file),
+            "pdf_size": os.path.getsize(output_file)}
+    data.update(build)
+    path = build_manifest_path(output_file)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def remove_manifest(output_file):
+    """Xóa manifest của output_file (nếu có), khi file PDF được ghi lại mà không qua bản dựng gia tăng"""
+    try:
+        os.unlink(manifest_path(output_file))
+    except OSError:
+        pass
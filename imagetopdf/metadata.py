@@ -0,0 +1,102 @@
+"""Đọc thông tin header của ảnh một lần duy nhất cho toàn bộ pipeline.
+
+Image.open chỉ đọc phần header, không giải mã điểm ảnh. Kết quả là một ImageInfo
+gọn nhẹ được dùng chung cho bước phân loại tỷ lệ, bố cục trang và bộ ghi PDF,
+nhờ đó mỗi ảnh chỉ bị mở một lần kể cả trên thư mục mạng.
+"""
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+# Giá trị EXIF Orientation làm ảnh hiển thị bị xoay 90 độ (chiều rộng và cao đổi chỗ)
+_TRANSPOSED_ORIENTATIONS = (5, 6, 7, 8)
+
+_EXIF_ORIENTATION_TAG = 0x0112
+
+
+class ImageInfo(namedtuple("ImageInfo", ["path", "width", "height", "mode", "format",
+                                         "orientation", "dpi", "file_size"])):
+    """Thông tin header của một ảnh.
+
+    width/height là kích thước lưu trong file; size là kích thước khi hiển thị
+    sau khi áp dụng EXIF Orientation, dùng để phân loại tỷ lệ khung hình.
+    """
+    __slots__ = ()
+
+    @property
+    def size(self):
+        if self.orientation in _TRANSPOSED_ORIENTATIONS:
+            return self.height, self.width
+        return self.width, self.height
+
+
+def _read_orientation(img):
+    # Chỉ đọc EXIF đã có sẵn trong header; với PNG, getexif() có thể buộc giải mã cả ảnh
+    exif_data = img.info.get('exif')
+    if not exif_data:
+        return 1
+    try:
+        exif = Image.Exif()
+        exif.load(exif_data)
+        return int(exif.get(_EXIF_ORIENTATION_TAG, 1))
+    except Exception:
+        return 1
+
+
+def _read_dpi(img):
+    dpi = img.info.get('dpi')
+    try:
+        x_dpi, y_dpi = float(dpi[0]), float(dpi[1])
+        if x_dpi > 1 and y_dpi > 1:
+            return x_dpi, y_dpi
+    except (TypeError, ValueError, IndexError):
+        pass
+    return None
+
+
+def image_info(img, img_path=None, file_size=0):
+    """Tạo ImageInfo từ một ảnh Pillow đã mở (chưa cần giải mã)"""
+    width, height = img.size
+    return ImageInfo(
+        path=img_path,
+        width=width,
+        height=height,
+        mode=img.mode,
+        format=img.format,
+        orientation=_read_orientation(img),
+        dpi=_read_dpi(img),
+        file_size=file_size,
+    )
+
+
+def read_image_info(img_path):
+    """Đọc header của một ảnh và trả về ImageInfo"""
+    file_size = os.path.getsize(img_path)
+    with Image.open(img_path) as img:
+        return image_info(img, img_path, file_size)
+
+
+def _safe_read(img_path):
+    try:
+        return read_image_info(img_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def scan_image_infos(image_files, workers=1):
+    """Đọc header của tất cả các ảnh, trả về lần lượt (đường dẫn, ImageInfo hoặc None, lỗi).
+
+    Việc đọc header chủ yếu chờ I/O nên dùng workers thread thay vì process;
+    thứ tự kết quả luôn giống thứ tự đầu vào.
+    """
+    if workers <= 1:
+        for img_path in image_files:
+            info, error = _safe_read(img_path)
+            yield img_path, info, error
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for img_path, (info, error) in zip(image_files, pool.map(_safe_read, image_files)):
+            yield img_path, info, error
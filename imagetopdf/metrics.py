@@ -0,0 +1,233 @@
+"""Đo thời gian, đếm sự kiện và phân bố độ trễ của các giai đoạn trong pipeline.
+
+Một Metrics được tạo cho mỗi lần chuyển đổi (hoặc truyền vào từ bên ngoài để
+gộp cả số đo của giao diện). Kết quả có thể ghi thành một dòng JSON (nhật ký có
+cấu trúc, nối vào cuối file) hoặc file văn bản theo định dạng Prometheus để
+node_exporter (textfile collector) đọc.
+
+Profiler bật cProfile và/hoặc tracemalloc cho một lần chạy khi cần tìm điểm
+nóng; khi tắt, chi phí chỉ là vài lần gọi perf_counter cho mỗi ảnh.
+"""
+import cProfile
+import datetime
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# Ngưỡng (giây) của các bucket histogram độ trễ
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+PROFILE_MODES = ("cpu", "memory", "all")
+
+
+class Histogram:
+    """Histogram độ trễ với các bucket cố định"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+        self.count += 1
+        self.sum += value
+
+    def cumulative(self):
+        """Các cặp (ngưỡng, số lần đo không vượt ngưỡng) theo quy ước của Prometheus"""
+        total = 0
+        pairs = []
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            pairs.append((bound, total))
+        return pairs
+
+    def to_dict(self):
+        return {"count": self.count, "sum": self.sum,
+                "buckets": {_format_bound(bound): count for bound, count in self.cumulative()}}
+
+
+def _format_bound(bound):
+    return "+Inf" if bound == float("inf") else repr(bound)
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Metrics:
+    """Bộ đếm, bộ đo thời gian và histogram cho một lần chuyển đổi (an toàn khi dùng từ nhiều luồng)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # tên -> [số lần, tổng thời gian]
+        self.timers = {}
+        self.counters = {}
+        self.histograms = {}
+
+    @contextmanager
+    def timer(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, seconds):
+        with self._lock:
+            timer = self.timers.setdefault(name, [0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+
+    def count(self, name, value=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, seconds):
+        """Ghi một giá trị độ trễ vào histogram name"""
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(seconds)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "timers": {name: {"count": count, "seconds": total} for name, (count, total) in self.timers.items()},
+                "counters": dict(self.counters),
+                "histograms": {name: histogram.to_dict() for name, histogram in self.histograms.items()},
+            }
+
+    def to_prometheus(self, prefix="imagetopdf", labels=None):
+        """Xuất theo định dạng văn bản của Prometheus"""
+        base = "".join(f',{key}="{_escape_label(value)}"' for key, value in (labels or {}).items())
+        lines = []
+        with self._lock:
+            lines.append(f"# HELP {prefix}_stage_seconds_total Tổng thời gian của từng giai đoạn")
+            lines.append(f"# TYPE {prefix}_stage_seconds_total counter")
+            for name, (_, total) in sorted(self.timers.items()):
+                lines.append(f'{prefix}_stage_seconds_total{{stage="{name}"{base}}} {total:.6f}')
+            lines.append(f"# TYPE {prefix}_stage_calls_total counter")
+            for name, (count, _) in sorted(self.timers.items()):
+                lines.append(f'{prefix}_stage_calls_total{{stage="{name}"{base}}} {count}')
+            lines.append(f"# TYPE {prefix}_events_total counter")
+            for name, value in sorted(self.counters.items()):
+                lines.append(f'{prefix}_events_total{{name="{name}"{base}}} {value}')
+            lines.append(f"# HELP {prefix}_latency_seconds Độ trễ của từng ảnh/trang")
+            lines.append(f"# TYPE {prefix}_latency_seconds histogram")
+            for name, histogram in sorted(self.histograms.items()):
+                for bound, count in histogram.cumulative():
+                    lines.append(f'{prefix}_latency_seconds_bucket{{name="{name}",le="{_format_bound(bound)}"{base}}} {count}')
+                lines.append(f'{prefix}_latency_seconds_sum{{name="{name}"{base}}} {histogram.sum:.6f}')
+                lines.append(f'{prefix}_latency_seconds_count{{name="{name}"{base}}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self, limit=5):
+        """Chuỗi ngắn liệt kê các giai đoạn tốn thời gian nhất"""
+        with self._lock:
+            top = sorted(self.timers.items(), key=lambda item: item[1][1], reverse=True)[:limit]
+        return ", ".join(f"{name} {total:.2f}s" for name, (_, total) in top)
+
+
+def write_metrics(metrics, path, job=None):
+    """Ghi số đo ra file: .prom/.txt theo định dạng Prometheus (ghi đè), các đuôi khác là một dòng JSON (nối thêm)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    if path.endswith((".prom", ".txt")):
+        # Ghi ra file tạm rồi đổi tên để collector không đọc phải file dở dang
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(metrics.to_prometheus(labels={"job": job} if job else None))
+        os.replace(tmp_path, path)
+        return
+
+    record = {"time": datetime.datetime.now().isoformat(timespec="seconds"), "job": job}
+    record.update(metrics.to_dict())
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+class Profiler:
+    """Bật cProfile ("cpu"), tracemalloc ("memory") hoặc cả hai ("all") trong một khối lệnh.
+
+    Khi kết thúc, thống kê cProfile được ghi vào <base>.prof (đọc bằng pstats
+    hoặc snakeviz) và các dòng lệnh cấp phát nhiều bộ nhớ nhất vào <base>.memory.txt.
+
+    cProfile chỉ đo luồng đã bật nó, nên công việc chạy trên luồng khác (ví dụ
+    các file PDF được tạo cùng lúc) phải được bọc trong thread(); thống kê của
+    các luồng được gộp vào <base>.prof. tracemalloc đo toàn tiến trình.
+    """
+
+    def __init__(self, mode, base_path, top=30):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"mode phải là một trong {PROFILE_MODES}")
+        self.mode = mode
+        self.base_path = base_path
+        self.top = top
+        self.files = []
+        self._profile = None
+        # cProfile của các luồng phụ, gộp vào kết quả khi kết thúc
+        self._thread_profiles = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.base_path)), exist_ok=True)
+        if self.mode in ("memory", "all"):
+            tracemalloc.start()
+        if self.mode in ("cpu", "all"):
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        return self
+
+    @contextmanager
+    def thread(self):
+        """Đo cả luồng hiện tại (khác luồng đã vào Profiler) trong khối lệnh"""
+        if self._profile is None:
+            yield
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ (sys.monitoring): cProfile của luồng chính đã đo mọi luồng
+            yield
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            with self._lock:
+                self._thread_profiles.append(profile)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._profile is not None:
+            self._profile.disable()
+            path = self.base_path + ".prof"
+            stats = pstats.Stats(self._profile)
+            with self._lock:
+                if self._thread_profiles:
+                    stats.add(*self._thread_profiles)
+            stats.dump_stats(path)
+            self.files.append(path)
+        if tracemalloc.is_tracing():
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            path = self.base_path + ".memory.txt"
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(f"Bộ nhớ tối đa (tracemalloc): {peak / (1024 * 1024):.2f} MB\n\n")
+                for stat in snapshot.statistics("lineno")[:self.top]:
+                    f.write(f"{stat}\n")
+            self.files.append(path)
+        return False
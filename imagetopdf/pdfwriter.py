@@ -0,0 +1,343 @@
+"""Ghi file PDF theo luồng: mỗi trang được ghi xuống đĩa ngay khi thêm vào.
+
+Chỉ vị trí (offset) của các object và danh sách id trang được giữ trong bộ nhớ,
+nên bộ nhớ tối đa chỉ xấp xỉ kích thước của một ảnh, bất kể tài liệu có bao nhiêu trang.
+Cây Pages, Catalog, bảng xref và trailer được ghi khi đóng file.
+
+Dữ liệu ảnh dạng FileSlice (JPEG nhúng nguyên vẹn) và các khối trang sao
+chép bằng copy_page được chép thẳng từ file sang file (xem sourcefile), không
+đi qua bộ nhớ Python.
+
+Trong lúc ghi, writer tính CRC32 của khối byte từng trang; cùng với ảnh nguồn,
+kích thước và vị trí, chúng tạo thành build manifest (build_manifest) mô tả
+chính xác file đã ghi mà không cần đọc lại.
+"""
+import zlib
+
+from .encoders import encode_image
+from .sourcefile import FileSlice, MappedSlice, copy_to
+
+_CATALOG_ID = 1
+_PAGES_ID = 2
+
+
+def _format_number(value):
+    """Định dạng số thực gọn cho nội dung PDF"""
+    text = f"{value:.4f}".rstrip('0').rstrip('.')
+    return text if text not in ('', '-0') else '0'
+
+
+class PageRecord:
+    """Vị trí các object của một trang trong file PDF.
+
+    Các object của một trang (ảnh, SMask, nội dung, trang) luôn được ghi liền
+    nhau trong khoảng [start, end), nên có thể sao chép nguyên khối sang file
+    mới mà không cần phân tích lại PDF.
+    """
+
+    def __init__(self, page_id, objects, start, end, checksum=None, source=None, width=None, height=None):
+        self.page_id = page_id
+        # {id object: offset}
+        self.objects = objects
+        self.start = start
+        self.end = end
+        # CRC32 của khối byte [start, end)
+        self.checksum = checksum
+        # Ảnh nguồn và kích thước ảnh (pixel) trên trang
+        self.source = source
+        self.width = width
+        self.height = height
+
+    def to_dict(self):
+        return {
+            "page_id": self.page_id,
+            "objects": {str(obj_id): offset for obj_id, offset in self.objects.items()},
+            "start": self.start,
+            "end": self.end,
+            "checksum": self.checksum,
+            "source": self.source,
+            "width": self.width,
+            "height": self.height,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        objects = {int(obj_id): offset for obj_id, offset in data["objects"].items()}
+        return cls(data["page_id"], objects, data["start"], data["end"], data.get("checksum"),
+                   data.get("source"), data.get("width"), data.get("height"))
+
+
+class StreamingPDFWriter:
+    """Ghi PDF từng trang một.
+
+    Dùng như context manager:
+
+        with StreamingPDFWriter(output_file) as writer:
+            for path in image_files:
+                writer.add_image(path)
+
+    Với resume (trạng thái trả về bởi state() của lần ghi trước), writer mở file
+    đã có và thêm trang mới dưới dạng cập nhật gia tăng (incremental update):
+    chỉ các object mới, cây Pages mới, một bảng xref bổ sung và trailer có /Prev
+    được ghi nối vào cuối file.
+    """
+
+    def __init__(self, output_file, resume=None, next_id=None):
+        self.output_file = output_file
+        self._offsets = {}
+        self._closed = False
+        # CRC32 của các byte đã ghi kể từ đầu khối trang hiện tại
+        self._crc = 0
+        self.records = []
+        # Số byte được chép trong nhân hệ điều hành (copy_file_range/sendfile)
+        self.zero_copy_bytes = 0
+        # {số thứ tự trang: thân object Page} của các trang có thể dùng lại bằng share_page
+        self._shareable = {}
+        if resume is None:
+            self._file = open(output_file, 'wb')
+            self._next_id = max(next_id or 0, _PAGES_ID + 1)
+            self._page_ids = []
+            self._prev_xref = None
+            self._write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        else:
+            self._file = open(output_file, 'r+b')
+            self._file.seek(0, 2)
+            self._resume_size = self._file.tell()
+            self._next_id = resume["next_id"]
+            self._page_ids = list(resume["page_ids"])
+            self._prev_xref = resume["xref_offset"]
+        self.xref_offset = None
+
+    @property
+    def page_count(self):
+        return len(self._page_ids)
+
+    @property
+    def appending(self):
+        return self._prev_xref is not None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def _write(self, data):
+        self._file.write(data)
+        self._crc = zlib.crc32(data, self._crc)
+
+    def _write_mapped(self, mapped):
+        self._crc = mapped.crc32(self._crc)
+        self.zero_copy_bytes += copy_to(mapped, self._file)
+
+    def _begin_block(self):
+        self._crc = 0
+        return self._file.tell()
+
+    def _allocate(self):
+        obj_id = self._next_id
+        self._next_id += 1
+        return obj_id
+
+    def _begin_object(self, obj_id):
+        self._offsets[obj_id] = self._file.tell()
+        self._write(f"{obj_id} 0 obj\n".encode('ascii'))
+
+    def _write_dict_object(self, obj_id, body):
+        self._begin_object(obj_id)
+        self._write(body.encode('ascii'))
+        self._write(b"\nendobj\n")
+
+    def _write_stream_object(self, obj_id, entries, data):
+        self._begin_object(obj_id)
+        self._write(f"<< {entries} /Length {len(data)} >>\nstream\n".encode('ascii'))
+        if isinstance(data, MappedSlice):
+            self._write_mapped(data)
+        else:
+            self._write(data)
+        self._write(b"\nendstream\nendobj\n")
+
+    def add_image(self, source, info=None):
+        """Mã hóa và ghi một ảnh thành một trang mới; trả về số thứ tự trang (bắt đầu từ 1)"""
+        # Mã hóa xong trước khi ghi để ảnh lỗi không để lại object dở dang trong file
+        return self.add_page(encode_image(source, info), source=source if isinstance(source, str) else None)
+
+    def add_page(self, page, shareable=False, source=None):
+        """Ghi một PageImage thành một trang mới.
+
+        shareable=True giữ lại tham chiếu tới ảnh và nội dung của trang để
+        share_page dùng lại cho các trang trùng lặp. source là đường dẫn ảnh
+        nguồn, ghi vào build manifest.
+        """
+        if isinstance(page.data, FileSlice):
+            # Map file nguồn trước khi ghi để file lỗi không để lại object dở dang
+            with MappedSlice(page.data) as data:
+                return self._add_page(page, data, shareable, source)
+        return self._add_page(page, page.data, shareable, source)
+
+    def _add_page(self, page, data, shareable, source):
+        block_start = self._begin_block()
+        first_id = self._next_id
+        image_id = self._allocate()
+        content_id = self._allocate()
+        page_id = self._allocate()
+
+        entries = (f"/Type /XObject /Subtype /Image /Width {page.width} /Height {page.height} "
+                   f"/ColorSpace {page.color_space} /BitsPerComponent {page.bits} /Filter {page.filter_name}")
+        if page.decode:
+            entries += " /Decode [" + " ".join(str(v) for v in page.decode) + "]"
+        if page.decode_parms:
+            entries += f" /DecodeParms {page.decode_parms}"
+        if page.smask is not None:
+            # Kênh alpha được ghi thành một XObject riêng và tham chiếu qua /SMask
+            smask_id = self._allocate()
+            self._write_stream_object(
+                smask_id,
+                f"/Type /XObject /Subtype /Image /Width {page.width} /Height {page.height} "
+                f"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode",
+                page.smask,
+            )
+            entries += f" /SMask {smask_id} 0 R"
+        self._write_stream_object(image_id, entries, data)
+
+        width_pt = _format_number(page.width_pt)
+        height_pt = _format_number(page.height_pt)
+        offset = f"{_format_number(page.offset_x)} {_format_number(page.offset_y)}"
+        content = f"q\n{width_pt} 0 0 {height_pt} {offset} cm\n/Im0 Do\nQ".encode('ascii')
+        self._write_stream_object(content_id, "", content)
+
+        # Trang có khổ cố định (xem layout) hoặc vừa bằng ảnh
+        media_w = _format_number(page.page_width_pt if page.page_width_pt is not None else page.width_pt)
+        media_h = _format_number(page.page_height_pt if page.page_height_pt is not None else page.height_pt)
+        page_body = (f"<< /Type /Page /Parent {_PAGES_ID} 0 R /MediaBox [0 0 {media_w} {media_h}] "
+                     f"/Resources << /XObject << /Im0 {image_id} 0 R >> >> /Contents {content_id} 0 R")
+        if page.rotate:
+            page_body += f" /Rotate {page.rotate}"
+        page_body += " >>"
+        self._write_dict_object(page_id, page_body)
+
+        objects = {obj_id: self._offsets[obj_id] for obj_id in range(first_id, self._next_id)}
+        self.records.append(PageRecord(page_id, objects, block_start, self._file.tell(), self._crc,
+                                       source, page.width, page.height))
+        self._page_ids.append(page_id)
+        if shareable:
+            self._shareable[len(self._page_ids)] = (page_body, page.width, page.height)
+        return len(self._page_ids)
+
+    def share_page(self, page_number, source=None):
+        """Thêm một trang mới hiển thị lại trang page_number (đã ghi với shareable=True).
+
+        Trang mới chỉ là một object Page tham chiếu tới cùng XObject ảnh và luồng
+        nội dung, nên ảnh được nhúng một lần dù xuất hiện ở nhiều trang. Không
+        dùng với các trang sẽ được sao chép bằng copy_page, vì khối của trang
+        mới không chứa ảnh.
+        """
+        page_body, width, height = self._shareable[page_number]
+        block_start = self._begin_block()
+        page_id = self._allocate()
+        self._write_dict_object(page_id, page_body)
+        self.records.append(PageRecord(page_id, {page_id: self._offsets[page_id]}, block_start, self._file.tell(),
+                                       self._crc, source, width, height))
+        self._page_ids.append(page_id)
+        return len(self._page_ids)
+
+    def copy_page(self, source_file, record):
+        """Sao chép nguyên khối một trang đã ghi trong file PDF khác (giữ nguyên id object).
+
+        source_file là file PDF nguồn đã mở ở chế độ nhị phân; record là PageRecord
+        của trang đó. Writer phải được tạo với next_id lớn hơn mọi id đã dùng trong
+        file nguồn để id của trang mới không trùng.
+        """
+        with MappedSlice(source_file, record.start, record.end - record.start) as block:
+            block_start = self._begin_block()
+            self._write_mapped(block)
+
+        objects = {}
+        for obj_id, offset in record.objects.items():
+            objects[obj_id] = block_start + (offset - record.start)
+            self._offsets[obj_id] = objects[obj_id]
+        self.records.append(PageRecord(record.page_id, objects, block_start, self._file.tell(), self._crc,
+                                       record.source, record.width, record.height))
+        self._page_ids.append(record.page_id)
+        return len(self._page_ids)
+
+    def _xref_sections(self):
+        """Các đoạn liên tiếp (id bắt đầu, danh sách offset hoặc None nếu id không dùng)"""
+        if not self.appending:
+            # Bảng đầy đủ từ 0; id không dùng (sau khi bỏ trang) được đánh dấu free
+            return [(0, [None] + [self._offsets.get(obj_id) for obj_id in range(1, self._next_id)])]
+
+        sections = []
+        for obj_id in sorted(self._offsets):
+            if sections and sections[-1][0] + len(sections[-1][1]) == obj_id:
+                sections[-1][1].append(self._offsets[obj_id])
+            else:
+                sections.append((obj_id, [self._offsets[obj_id]]))
+        return sections
+
+    def close(self):
+        """Ghi cây Pages, Catalog, bảng xref và trailer rồi đóng file"""
+        if self._closed:
+            return
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        # /Count đứng trước /Kids để bộ kiểm tra (xem verify) không phải đọc hết danh sách trang
+        self._write_dict_object(_PAGES_ID, f"<< /Type /Pages /Count {len(self._page_ids)} /Kids [{kids}] >>")
+        if not self.appending:
+            self._write_dict_object(_CATALOG_ID, f"<< /Type /Catalog /Pages {_PAGES_ID} 0 R >>")
+
+        self.xref_offset = self._file.tell()
+        lines = ["xref\n"]
+        for first_id, offsets in self._xref_sections():
+            lines.append(f"{first_id} {len(offsets)}\n")
+            for offset in offsets:
+                if offset is None:
+                    lines.append("0000000000 65535 f \n")
+                else:
+                    lines.append(f"{offset:010d} 00000 n \n")
+        self._write("".join(lines).encode('ascii'))
+
+        trailer = f"/Size {self._next_id} /Root {_CATALOG_ID} 0 R"
+        if self.appending:
+            trailer += f" /Prev {self._prev_xref}"
+        self._write(f"trailer\n<< {trailer} >>\nstartxref\n{self.xref_offset}\n%%EOF\n".encode('ascii'))
+
+        self._file.close()
+        self._closed = True
+
+    def state(self):
+        """Trạng thái cần lưu để lần sau có thể thêm trang bằng cập nhật gia tăng"""
+        return {
+            "xref_offset": self.xref_offset,
+            "next_id": self._next_id,
+            "page_ids": list(self._page_ids),
+        }
+
+    def build_manifest(self, records=None):
+        """Mô tả file đã ghi (sau close): số trang, và cho từng trang ảnh nguồn, kích thước, vị trí, CRC32.
+
+        records mặc định là các trang do writer này ghi; khi ghi nối vào file có
+        sẵn, truyền vào PageRecord của mọi trang để manifest mô tả cả tài liệu.
+        """
+        records = self.records if records is None else records
+        return {
+            "page_count": self.page_count,
+            "xref_offset": self.xref_offset,
+            "pages": [
+                {"page": number, "source": record.source, "width": record.width, "height": record.height,
+                 "start": record.start, "end": record.end, "checksum": record.checksum}
+                for number, record in enumerate(records, 1)
+            ],
+        }
+
+    def abort(self):
+        """Đóng file mà không hoàn thiện (dùng khi có lỗi)"""
+        if not self._closed:
+            if self.appending:
+                # Bỏ phần đã ghi nối để file trở lại đúng như trước khi mở
+                self._file.truncate(self._resume_size)
+            self._file.close()
+            self._closed = True
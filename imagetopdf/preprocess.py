@@ -0,0 +1,278 @@
+"""Giai đoạn tiền xử lý ảnh (giải mã và chuẩn hóa) chạy song song bằng process pool.
+
+Có hai chế độ: chuẩn hóa cho img2pdf (ảnh WebP hoặc có kênh alpha được chuyển
+sang RGB và mã hóa lại thành JPEG, các ảnh khác được giữ nguyên) hoặc mã hóa
+trực tiếp thành PageImage cho bộ ghi PDF theo luồng. Kết quả luôn được trả về theo đúng thứ tự đầu vào
+và số tác vụ đang chạy cùng lúc bị giới hạn để bộ nhớ không tăng theo số ảnh.
+"""
+import io
+import multiprocessing
+import os
+import time
+from collections import deque, namedtuple
+from contextlib import nullcontext
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+
+from PIL import Image
+
+from .compute import convert_image, get_backend
+from .encoders import encode_image, is_passthrough_jpeg
+from .metadata import read_image_info
+from .profiles import encode_jpeg
+
+# Kết quả chuẩn hóa một ảnh:
+# - source: đường dẫn ảnh gốc
+# - data: đường dẫn file để nhúng vào PDF, hoặc bytes JPEG nếu xử lý trong bộ nhớ
+# - is_temp: data là file tạm do giai đoạn này tạo ra
+# - error: thông báo lỗi nếu không xử lý được ảnh (khi đó data là None)
+# - info: ImageInfo mô tả data (định dạng/chế độ màu sau khi chuyển đổi)
+# - elapsed: thời gian xử lý ảnh trong worker (giây), 0 nếu lấy từ bộ nhớ đệm
+NormalizedImage = namedtuple("NormalizedImage", ["index", "source", "data", "is_temp", "error", "info", "elapsed"],
+                             defaults=(0.0,))
+
+
+def resolve_workers(workers):
+    """Số tiến trình thực tế: 0 hoặc None nghĩa là dùng tất cả các lõi CPU"""
+    if not workers:
+        return os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def create_pool(workers, backend=None):
+    """Process pool cho iter_normalized; dùng "spawn" với backend PyTorch vì CUDA không dùng được sau fork"""
+    mp_context = multiprocessing.get_context("spawn") if backend in ("torch", "auto") else None
+    return ProcessPoolExecutor(max_workers=resolve_workers(workers), mp_context=mp_context)
+
+
+def needs_conversion(info, profile=None):
+    """Ảnh webp hoặc RGBA cần được chuyển sang JPEG trước khi nhúng.
+
+    Với hồ sơ nén (xem profiles), JPEG và PNG cũng được mã hóa lại khi hồ sơ
+    không giữ nguyên chúng hoặc file vượt ngân sách dung lượng một trang.
+    """
+    if info.format == 'WEBP' or info.path.lower().endswith('.webp') or info.mode == 'RGBA':
+        return True
+    if profile is None:
+        return False
+    if info.format == 'JPEG':
+        return not profile.keeps_jpeg(info.file_size)
+    return not profile.keeps_lossless(info.file_size)
+
+
+def validate_image(img_path):
+    """Kiểm tra ảnh được nhúng nguyên vẹn có giải mã được trọn vẹn không; ném lỗi kèm lý do nếu hỏng.
+
+    JPEG được giải mã ở tỷ lệ 1/8 (vẫn đọc hết dữ liệu nén nên phát hiện được
+    file bị cắt ngắn), PNG chỉ được kiểm tra CRC các chunk mà không giải mã.
+    """
+    with Image.open(img_path) as img:
+        if img.format == 'PNG':
+            img.verify()
+            return
+        if img.format == 'JPEG':
+            img.draft(img.mode, (max(1, img.width // 8), max(1, img.height // 8)))
+        img.load()
+
+
+def normalize_image(index, info, temp_dir=None, backend=None, profile=None, validate=False):
+    """Chuẩn hóa một ảnh; hàm ở cấp module để có thể gửi sang process khác.
+
+    info là ImageInfo đã đọc ở bước quét (hoặc đường dẫn, khi đó header được đọc tại đây).
+    Ảnh không cần chuyển đổi được trả về ngay mà không mở lại file. backend là tên
+    backend tính toán (xem compute); khi có, ảnh có kênh alpha được đặt lên nền trắng.
+    profile là CompressionProfile (xem profiles) quyết định chất lượng JPEG.
+    validate=True kiểm tra ảnh được giữ nguyên bằng validate_image.
+    """
+    img_path = info if isinstance(info, str) else info.path
+    try:
+        if isinstance(info, str):
+            info = read_image_info(info)
+
+        if not needs_conversion(info, profile):
+            if validate:
+                validate_image(img_path)
+            return NormalizedImage(index, img_path, img_path, False, None, info)
+
+        with Image.open(img_path) as img:
+            # Với hồ sơ nén, ảnh xám được giữ một kênh thay vì chuyển sang RGB
+            mode = 'L' if profile is not None and img.mode == 'L' else 'RGB'
+            img = img.convert(mode) if backend is None else convert_image(img, mode, get_backend(backend))
+            converted_info = info._replace(mode=mode, format='JPEG')
+            if profile is not None:
+                data = encode_jpeg(img, profile)
+                if info.format == 'JPEG' and len(data) >= info.file_size:
+                    # Mã hóa lại không làm file nhỏ đi: giữ nguyên ảnh gốc
+                    return NormalizedImage(index, img_path, img_path, False, None, info)
+            elif temp_dir is None:
+                img_buffer = io.BytesIO()
+                img.save(img_buffer, format='JPEG')
+                data = img_buffer.getvalue()
+            else:
+                data = None
+
+            if temp_dir is None:
+                return NormalizedImage(index, img_path, data, False, None, converted_info._replace(file_size=len(data)))
+
+            # Tạo file tạm thời trong thư mục tạm của phiên làm việc
+            tmp_file = os.path.join(temp_dir, f"temp_{index}_{os.path.basename(img_path)}.jpg")
+            if data is None:
+                img.save(tmp_file, 'JPEG')
+            else:
+                with open(tmp_file, 'wb') as f:
+                    f.write(data)
+            converted_info = converted_info._replace(path=tmp_file, file_size=os.path.getsize(tmp_file))
+            return NormalizedImage(index, img_path, tmp_file, True, None, converted_info)
+    except Exception as e:
+        return NormalizedImage(index, img_path, None, False, str(e), None)
+
+
+def encode_page(index, info, temp_dir=None, backend=None, layout=None, profile=None, validate=False):
+    """Mã hóa một ảnh thành PageImage sẵn sàng ghi vào PDF (data của NormalizedImage).
+
+    layout là PageLayout (xem layout) khi ảnh được đặt lên trang có khổ cố định;
+    profile là CompressionProfile (xem profiles). validate=True kiểm tra ảnh
+    được nhúng nguyên vẹn (không mã hóa lại) bằng validate_image.
+    """
+    img_path = info if isinstance(info, str) else info.path
+    try:
+        if isinstance(info, str):
+            info = read_image_info(info)
+        page = encode_image(img_path, info, backend=get_backend(backend) if backend else None, layout=layout,
+                            profile=profile)
+        if validate and not page.reencoded:
+            validate_image(img_path)
+        return NormalizedImage(index, img_path, page, False, None, info)
+    except Exception as e:
+        return NormalizedImage(index, img_path, None, False, str(e), None)
+
+
+def _timed_worker(worker_func, index, image, temp_dir, backend):
+    """Gọi worker_func và ghi lại thời gian xử lý vào NormalizedImage.elapsed"""
+    start = time.perf_counter()
+    result = worker_func(index, image, temp_dir, backend)
+    return result._replace(elapsed=time.perf_counter() - start)
+
+
+def _is_trivial(image, encode, layout=None, profile=None, validate=False):
+    """Ảnh có thể xử lý ngay trong tiến trình chính mà không cần giải mã"""
+    if isinstance(image, str) or validate:
+        return False
+    if encode:
+        # Với khổ trang cố định, JPEG lớn cũng có thể phải thu nhỏ
+        return (layout is None and is_passthrough_jpeg(image)
+                and (profile is None or profile.keeps_jpeg(image.file_size)))
+    return not needs_conversion(image, profile)
+
+
+def iter_normalized(image_files, temp_dir=None, workers=1, max_in_flight=None, encode=False, cache=None,
+                    backend=None, layout=None, profile=None, pool=None, validate=False):
+    """Chuẩn hóa các ảnh và trả về lần lượt NormalizedImage theo đúng thứ tự đầu vào.
+
+    image_files là danh sách ImageInfo hoặc đường dẫn. Với encode=True, mỗi ảnh
+    được mã hóa trực tiếp thành PageImage theo định dạng gốc (xem encoders)
+    thay vì chuyển sang JPEG.
+
+    workers=1 xử lý tuần tự ngay trong tiến trình hiện tại. Với nhiều worker,
+    tối đa max_in_flight ảnh (mặc định gấp đôi số worker) được gửi vào pool
+    cùng lúc; ảnh tiếp theo chỉ được gửi khi ảnh đầu hàng đợi đã được lấy ra.
+
+    cache là một PageCache (tùy chọn): ảnh đã có trong đệm không được giải mã
+    lại, ảnh vừa được mã hóa lại sẽ được lưu vào đệm. Việc đọc/ghi đệm chỉ diễn
+    ra trong tiến trình chính.
+
+    backend là tên backend tính toán cho các bước xử lý điểm ảnh (xem compute).
+    Với backend dùng PyTorch, pool được tạo bằng "spawn" vì CUDA không dùng
+    được trong tiến trình con tạo bằng fork.
+
+    layout là PageLayout (xem layout) khi encode=True và ảnh được đặt lên trang
+    có khổ cố định; bố cục là một phần của khóa bộ nhớ đệm. profile là
+    CompressionProfile (xem profiles) cho cả hai chế độ.
+
+    pool là process pool dùng chung (xem create_pool), ví dụ cho nhiều file PDF
+    được tạo cùng lúc; khi có pool, ảnh luôn được gửi vào pool đó và pool không
+    bị đóng khi kết thúc.
+
+    validate=True kiểm tra cả các ảnh được nhúng nguyên vẹn (xem validate_image)
+    trong pool, song song và trước khi bộ ghi PDF dùng tới chúng; ảnh hỏng được
+    trả về với error thay vì làm hỏng cả file PDF.
+    """
+    workers = resolve_workers(workers)
+    if encode:
+        worker_func = partial(encode_page, layout=layout, profile=profile, validate=validate)
+    else:
+        worker_func = partial(normalize_image, profile=profile, validate=validate)
+    kind = "page" if encode else "jpeg"
+    variant = layout.signature if encode and layout is not None else ""
+
+    def from_cache(index, image):
+        if cache is None or isinstance(image, str) or _is_trivial(image, encode, layout, profile):
+            return None
+        data = cache.get(image, kind, variant)
+        if data is None:
+            return None
+        info = image if encode else image._replace(mode='RGB', format='JPEG', file_size=len(data))
+        return NormalizedImage(index, image.path, data, False, None, info)
+
+    def to_cache(image, result):
+        if cache is None or isinstance(image, str) or result.error is not None:
+            return
+        if encode and getattr(result.data, 'reencoded', False):
+            cache.put(image, kind, result.data, variant)
+        elif not encode and isinstance(result.data, bytes):
+            cache.put(image, kind, result.data)
+        elif not encode and result.is_temp:
+            with open(result.data, 'rb') as f:
+                cache.put(image, kind, f.read())
+
+    if pool is None and (workers == 1 or len(image_files) <= 1):
+        for index, image in enumerate(image_files):
+            result = from_cache(index, image)
+            if result is None:
+                result = _timed_worker(worker_func, index, image, temp_dir, backend)
+                to_cache(image, result)
+            yield result
+        return
+
+    max_in_flight = max(1, max_in_flight or workers * 2)
+    pending = deque()
+    tasks = iter(enumerate(image_files))
+
+    with nullcontext(pool) if pool is not None else create_pool(workers, backend) as pool:
+        def submit(index, image):
+            # Ảnh có trong đệm hoặc không cần chuyển đổi được trả kết quả ngay,
+            # không tốn chi phí gửi sang pool
+            result = from_cache(index, image)
+            if result is None and _is_trivial(image, encode, layout, profile, validate):
+                result = _timed_worker(worker_func, index, image, temp_dir, backend)
+            if result is not None:
+                future = Future()
+                future.set_result(result)
+                return future, False
+            return pool.submit(_timed_worker, worker_func, index, image, temp_dir, backend), True
+
+        try:
+            for index, image in tasks:
+                pending.append((index, image) + submit(index, image))
+                if len(pending) >= max_in_flight:
+                    break
+
+            while pending:
+                index, image, future, computed = pending.popleft()
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # Worker bị dừng bất thường (ví dụ hết bộ nhớ): ghi nhận lỗi cho ảnh này
+                    source = image if isinstance(image, str) else image.path
+                    result = NormalizedImage(index, source, None, False, f"Worker lỗi: {str(e)}", None)
+                if computed:
+                    to_cache(image, result)
+
+                # Gửi thêm một ảnh để giữ cửa sổ xử lý luôn đầy
+                for next_index, next_image in tasks:
+                    pending.append((next_index, next_image) + submit(next_index, next_image))
+                    break
+                yield result
+        finally:
+            for _, _, future, _ in pending:
+                future.cancel()
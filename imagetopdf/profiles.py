@@ -0,0 +1,104 @@
+"""Hồ sơ nén: đánh đổi giữa dung lượng PDF, chất lượng ảnh và thời gian CPU.
+
+Mỗi hồ sơ quy định cách mã hóa từng loại ảnh nguồn:
+
+- archive: giữ nguyên JPEG, ảnh không mất dữ liệu nén Flate mức cao nhất,
+  WebP nén mất dữ liệu mã hóa lại JPEG chất lượng 95, không giảm mẫu màu
+- balanced: giống cách mã hóa mặc định (JPEG chất lượng 90, 4:2:0, Flate mức 6)
+- web: mã hóa lại mọi ảnh thành JPEG chất lượng 80 (giữ bản gốc nếu nhỏ hơn)
+- minimal: như web với chất lượng 60 và Flate mức cao nhất cho kênh alpha
+
+page_budget giới hạn dung lượng dữ liệu ảnh của một trang: ảnh vượt ngân sách
+được mã hóa JPEG với chất lượng cao nhất vừa ngân sách, tìm bằng chia đôi.
+"""
+import io
+from dataclasses import dataclass, replace
+
+# Chất lượng JPEG thấp nhất khi tìm mức nén vừa ngân sách dung lượng một trang
+MIN_BUDGET_QUALITY = 20
+
+
+@dataclass(frozen=True)
+class CompressionProfile:
+    """Cách mã hóa ảnh của một hồ sơ nén"""
+    name: str
+    # Chất lượng JPEG khi mã hóa lại (1-95)
+    jpeg_quality: int = 90
+    # Lấy mẫu màu của JPEG: 0 (4:4:4), 1 (4:2:2) hoặc 2 (4:2:0)
+    subsampling: int = 2
+    # Mức nén Flate cho ảnh không mất dữ liệu và kênh alpha
+    flate_level: int = 6
+    # Mã hóa lại JPEG nguồn (chỉ dùng kết quả nếu nhỏ hơn bản gốc)
+    recompress_jpeg: bool = False
+    # Nén JPEG cả ảnh không mất dữ liệu (PNG, WebP lossless) thay vì Flate
+    lossless_to_jpeg: bool = False
+    # Dung lượng tối đa của dữ liệu ảnh một trang (byte); None: không giới hạn
+    page_budget: int = None
+
+    @property
+    def signature(self):
+        """Chuỗi mô tả hồ sơ, dùng làm một phần khóa bộ nhớ đệm và manifest"""
+        return (f"profile={self.name}:{self.jpeg_quality}:{self.subsampling}:{self.flate_level}:"
+                f"{int(self.recompress_jpeg)}{int(self.lossless_to_jpeg)}:{self.page_budget or 0}")
+
+    def keeps_jpeg(self, size):
+        """JPEG nguồn có dung lượng size byte được nhúng nguyên vẹn hay không"""
+        return not self.recompress_jpeg and (self.page_budget is None or size <= self.page_budget)
+
+    def keeps_lossless(self, size):
+        """Ảnh không mất dữ liệu có dung lượng size byte được giữ không mất dữ liệu hay không"""
+        return not self.lossless_to_jpeg and (self.page_budget is None or size <= self.page_budget)
+
+
+PROFILES = {
+    "archive": CompressionProfile("archive", jpeg_quality=95, subsampling=0, flate_level=9),
+    "balanced": CompressionProfile("balanced"),
+    "web": CompressionProfile("web", jpeg_quality=80, recompress_jpeg=True, lossless_to_jpeg=True),
+    "minimal": CompressionProfile("minimal", jpeg_quality=60, flate_level=9, recompress_jpeg=True,
+                                  lossless_to_jpeg=True),
+}
+
+
+def get_profile(name=None, page_budget=None):
+    """Hồ sơ nén theo tên, kèm ngân sách dung lượng một trang; None nếu không chỉ định gì"""
+    if name is None and page_budget is None:
+        return None
+    if name is not None and name not in PROFILES:
+        raise ValueError(f"Hồ sơ nén phải là một trong {tuple(PROFILES)}")
+    if page_budget is not None and page_budget <= 0:
+        raise ValueError("Ngân sách dung lượng mỗi trang phải lớn hơn 0")
+    profile = PROFILES[name or "balanced"]
+    return replace(profile, page_budget=page_budget) if page_budget is not None else profile
+
+
+def encode_jpeg(img, profile):
+    """Mã hóa ảnh Pillow (RGB hoặc L) thành JPEG theo hồ sơ.
+
+    Với page_budget, nếu chất lượng của hồ sơ cho dữ liệu quá lớn thì tìm chia đôi
+    chất lượng cao nhất vừa ngân sách (khoảng 6 lần mã hóa); nếu không mức nào vừa,
+    trả về kết quả ở MIN_BUDGET_QUALITY.
+    """
+    def encode(quality):
+        buffer = io.BytesIO()
+        img.save(buffer, format='JPEG', quality=quality, subsampling=profile.subsampling)
+        return buffer.getvalue()
+
+    data = encode(profile.jpeg_quality)
+    budget = profile.page_budget
+    if budget is None or len(data) <= budget:
+        return data
+
+    best = None
+    smallest = data
+    low, high = MIN_BUDGET_QUALITY, profile.jpeg_quality - 1
+    while low <= high:
+        quality = (low + high) // 2
+        candidate = encode(quality)
+        if len(candidate) <= budget:
+            best = candidate
+            low = quality + 1
+        else:
+            if len(candidate) < len(smallest):
+                smallest = candidate
+            high = quality - 1
+    return best if best is not None else smallest
@@ -0,0 +1,43 @@
+"""Cách ly ảnh lỗi và ghi báo cáo lỗi của một lần chuyển đổi.
+
+Ảnh không xử lý được (hỏng, bị cắt ngắn, sai định dạng) được chuyển sang thư
+mục cách ly để lần chạy sau (hoặc chế độ theo dõi thư mục) không thử lại, và
+mọi lỗi được ghi vào báo cáo JSON hoặc CSV kèm lý do.
+"""
+import csv
+import datetime
+import json
+import os
+import shutil
+
+REPORT_FIELDS = ("path", "kind", "message", "quarantined")
+
+
+def quarantine_file(path, quarantine_dir):
+    """Chuyển path vào quarantine_dir (thêm hậu tố số nếu trùng tên), trả về đường dẫn mới"""
+    os.makedirs(quarantine_dir, exist_ok=True)
+    name, ext = os.path.splitext(os.path.basename(path))
+    target = os.path.join(quarantine_dir, name + ext)
+    counter = 1
+    while os.path.exists(target):
+        target = os.path.join(quarantine_dir, f"{name}_{counter}{ext}")
+        counter += 1
+    shutil.move(path, target)
+    return target
+
+
+def write_error_report(errors, path, job=None):
+    """Ghi danh sách ImageError ra path: .csv là bảng CSV, các đuôi khác là một tài liệu JSON (ghi đè)"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    rows = [{name: getattr(error, name) for name in REPORT_FIELDS} for error in errors]
+    # Ghi ra file tạm rồi đổi tên để không để lại báo cáo dở dang
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+        else:
+            report = {"time": datetime.datetime.now().isoformat(timespec="seconds"), "job": job, "errors": rows}
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
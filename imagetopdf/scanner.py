@@ -0,0 +1,146 @@
+"""Quét thư mục ảnh bằng os.scandir, mỗi thư mục chỉ được liệt kê một lần.
+
+Phần mở rộng được so khớp không phân biệt hoa thường (.JPG, .Jpg...), và mỗi
+file chỉ xuất hiện một lần trong kết quả của scandir nên không có ảnh trùng
+lặp trên hệ thống file không phân biệt hoa thường. Tùy chọn:
+
+- sniff: nhận diện ảnh theo vài byte đầu file (magic bytes) thay vì phần mở
+  rộng, bắt được cả ảnh đặt sai đuôi hoặc không có đuôi
+- recursive: quét cả thư mục con (không đi theo symlink thư mục để tránh vòng lặp)
+- include/exclude: mẫu glob so với đường dẫn tương đối (dùng "/") nếu mẫu có
+  "/", ngược lại so với tên file; exclude loại cả thư mục con khớp mẫu
+- sort: "name" (theo tên), "natural" ("anh2" trước "anh10") hoặc None (thứ tự của hệ thống file)
+
+Kết quả được sinh dần theo từng thư mục, nên tại một thời điểm chỉ danh sách
+của một thư mục nằm trong bộ nhớ.
+"""
+import fnmatch
+import os
+import re
+
+# Phần mở rộng của các file ảnh được chuyển đổi (không phân biệt hoa thường)
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+SORT_MODES = ("name", "natural")
+
+_DIGITS = re.compile(r"(\d+)")
+
+
+def is_image_name(name):
+    return name.lower().endswith(IMAGE_EXTENSIONS)
+
+
+def sniff_image(path):
+    """Định dạng ảnh theo magic bytes: "jpeg", "png", "webp" hoặc None"""
+    try:
+        with open(path, "rb") as f:
+            head = f.read(12)
+    except OSError:
+        return None
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def natural_key(name):
+    """Khóa sắp xếp tự nhiên: dãy chữ số được so như số, chữ không phân biệt hoa thường"""
+    parts = _DIGITS.split(name)
+    # split với nhóm bắt giữ luôn xen kẽ chữ (vị trí chẵn) và số (vị trí lẻ)
+    return [int(part) if i % 2 else part.casefold() for i, part in enumerate(parts)], name
+
+
+def _matches(rel_path, name, patterns):
+    for pattern in patterns:
+        target = rel_path if "/" in pattern else name
+        if fnmatch.fnmatchcase(target.lower(), pattern.lower()):
+            return True
+    return False
+
+
+class DirectoryScanner:
+    """Tìm file ảnh trong root (và các thư mục con nếu recursive).
+
+    Thư mục con không đọc được được bỏ qua và ghi vào errors dưới dạng
+    (đường dẫn, thông báo); lỗi ở chính root được ném ra.
+    """
+
+    def __init__(self, root, recursive=False, include=(), exclude=(), sniff=False, sort="name"):
+        if sort is not None and sort not in SORT_MODES:
+            raise ValueError(f"sort phải là một trong {SORT_MODES} hoặc None")
+        self.root = root
+        self.recursive = recursive
+        self.include = tuple(include or ())
+        self.exclude = tuple(exclude or ())
+        self.sniff = sniff
+        self.sort = sort
+        self.errors = []
+
+    def descends(self, rel_path, name):
+        """Thư mục con (đường dẫn tương đối dùng "/", tên) có được quét không"""
+        return self.recursive and not _matches(rel_path, name, self.exclude)
+
+    def selects(self, rel_path, name):
+        """File khớp include (nếu có) và không khớp exclude"""
+        if self.include and not _matches(rel_path, name, self.include):
+            return False
+        return not (self.exclude and _matches(rel_path, name, self.exclude))
+
+    def is_image(self, path, name):
+        """Nhận diện ảnh theo phần mở rộng, hoặc theo magic bytes khi sniff"""
+        return bool(sniff_image(path)) if self.sniff else is_image_name(name)
+
+    def iter_folders(self):
+        """Sinh (thư mục tương đối dùng "/", [đường dẫn ảnh]) cho từng thư mục có ảnh; "" là root"""
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            files, subdirs = self._list(rel_dir)
+            if files:
+                yield rel_dir, files
+            # Đảo ngược để thư mục con được duyệt theo đúng thứ tự đã sắp xếp
+            stack.extend(reversed(subdirs))
+
+    def iter_images(self):
+        """Sinh đường dẫn của từng ảnh, thư mục này nối tiếp thư mục kia"""
+        for _, files in self.iter_folders():
+            yield from files
+
+    def _list(self, rel_dir):
+        folder = os.path.join(self.root, *rel_dir.split("/")) if rel_dir else self.root
+        files = []
+        subdirs = []
+        try:
+            entries = os.scandir(folder)
+        except OSError as e:
+            if not rel_dir:
+                raise
+            self.errors.append((folder, str(e)))
+            return files, subdirs
+
+        with entries:
+            for entry in entries:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.descends(rel_path, entry.name):
+                            subdirs.append(entry)
+                        continue
+                    if not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                if self.selects(rel_path, entry.name) and self.is_image(entry.path, entry.name):
+                    files.append(entry)
+
+        if self.sort == "natural":
+            files.sort(key=lambda entry: natural_key(entry.name))
+            subdirs.sort(key=lambda entry: natural_key(entry.name))
+        elif self.sort == "name":
+            files.sort(key=lambda entry: entry.name)
+            subdirs.sort(key=lambda entry: entry.name)
+        return ([entry.path for entry in files],
+                [f"{rel_dir}/{entry.name}" if rel_dir else entry.name for entry in subdirs])
@@ -0,0 +1,660 @@
+"""Dịch vụ chuyển đổi qua HTTP cục bộ, để các công cụ khác dùng engine mà không cần Tk.
+
+    python -m imagetopdf.service --port 8765 --max-jobs 2
+
+Các API (JSON, chỉ dùng thư viện chuẩn: asyncio và sqlite3):
+
+- POST /jobs: gửi job {"input_folder": ...} hoặc {"files": [...]}, kèm
+  "output_name" (tùy chọn) và "options" (các trường của ConversionOptions);
+  trả về 202 cùng mã job, 429 khi hàng đợi đã đầy
+- GET /jobs, GET /jobs/<id>: trạng thái, tiến trình và kết quả
+- GET /jobs/<id>/events: luồng sự kiện (Server-Sent Events) về tiến trình,
+  nhật ký và trạng thái cho tới khi job kết thúc
+- GET /jobs/<id>/outputs/<n>: tải file PDF thứ n của job
+- POST /jobs/<id>/cancel: hủy job đang chờ hoặc đang chạy
+- DELETE /jobs/<id>: xóa job đã kết thúc cùng các file kết quả
+
+Tối đa max_jobs job chạy cùng lúc (mỗi job trên một luồng, engine tự dùng
+process pool theo options.workers) và tối đa max_queued job được chờ. Trạng
+thái job được lưu trong SQLite ở data_dir: khi dịch vụ khởi động lại, các job
+đang chờ hoặc đang chạy dở được đưa lại vào hàng đợi. Mặc định dịch vụ chỉ
+nghe trên 127.0.0.1; allowed_roots giới hạn các thư mục ảnh mà job được đọc.
+"""
+import argparse
+import asyncio
+import dataclasses
+import json
+import os
+import re
+import shutil
+import signal
+import sqlite3
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+
+from .cache import default_cache_dir
+from .engine import ConversionCancelled, ConversionEngine, ConversionError, ConversionOptions, remove_temp_files
+
+DEFAULT_PORT = 8765
+DEFAULT_MAX_JOBS = 1
+DEFAULT_MAX_QUEUED = 100
+
+# Dung lượng tối đa của nội dung một yêu cầu (danh sách file có thể dài)
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# Số sự kiện tối đa đang chờ gửi cho một client theo dõi; client quá chậm bị bỏ bớt sự kiện tiến trình
+MAX_PENDING_EVENTS = 1000
+
+DOWNLOAD_CHUNK = 1024 * 1024
+
+FINISHED_STATES = ("done", "failed", "cancelled")
+
+# Các tùy chọn do dịch vụ tự đặt hoặc trỏ tới đường dẫn tùy ý trên máy chủ
+_RESERVED_OPTIONS = {"input_folder", "output_file", "input_files", "temp_folder", "cache_dir",
+                     "metrics_file", "profile", "quarantine_dir", "error_report"}
+
+_ROUTES = [
+    ("GET", re.compile(r"^/health$"), "_health"),
+    ("GET", re.compile(r"^/jobs$"), "_list_jobs"),
+    ("POST", re.compile(r"^/jobs$"), "_submit_job"),
+    ("GET", re.compile(r"^/jobs/(\w+)$"), "_get_job"),
+    ("DELETE", re.compile(r"^/jobs/(\w+)$"), "_delete_job"),
+    ("POST", re.compile(r"^/jobs/(\w+)/cancel$"), "_cancel_job"),
+    ("GET", re.compile(r"^/jobs/(\w+)/events$"), "_job_events"),
+    ("GET", re.compile(r"^/jobs/(\w+)/outputs/(\d+)$"), "_download_output"),
+]
+
+
+def default_data_dir():
+    """Thư mục dữ liệu mặc định của dịch vụ, cạnh thư mục bộ nhớ đệm"""
+    return os.path.join(os.path.dirname(default_cache_dir()), "service")
+
+
+class RequestError(Exception):
+    """Yêu cầu không hợp lệ, trả về cho client với mã HTTP status"""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass
+class Job:
+    """Một job chuyển đổi; request là nội dung JSON client đã gửi"""
+    id: str
+    request: dict
+    created: float
+    status: str = "queued"
+    started: float = None
+    finished: float = None
+    progress: float = 0.0
+    message: str = ""
+    result: dict = None
+    error: str = None
+    # Số thứ tự gửi, giữ đúng thứ tự hàng đợi khi khởi động lại
+    seq: int = 0
+    # Các file PDF đã tạo (đường dẫn tuyệt đối), không trả về cho client
+    outputs: list = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "progress": round(self.progress, 2),
+            "message": self.message,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "request": self.request,
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobStore:
+    """Lưu các job trong SQLite để không mất khi dịch vụ khởi động lại (chỉ dùng từ luồng của event loop)"""
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id TEXT PRIMARY KEY, seq INTEGER NOT NULL, status TEXT NOT NULL, request TEXT NOT NULL,"
+            " created REAL NOT NULL, started REAL, finished REAL, result TEXT, error TEXT, outputs TEXT)"
+        )
+        self._db.commit()
+
+    def close(self):
+        self._db.close()
+
+    def save(self, job):
+        self._db.execute(
+            "INSERT OR REPLACE INTO jobs (id, seq, status, request, created, started, finished, result, error, outputs)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.id, job.seq, job.status, json.dumps(job.request, ensure_ascii=False), job.created, job.started,
+             job.finished, json.dumps(job.result, ensure_ascii=False) if job.result is not None else None,
+             job.error, json.dumps(job.outputs, ensure_ascii=False)),
+        )
+        self._db.commit()
+
+    def delete(self, job_id):
+        self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+        self._db.commit()
+
+    def load(self):
+        """Các job đã lưu theo thứ tự gửi"""
+        rows = self._db.execute(
+            "SELECT id, seq, status, request, created, started, finished, result, error, outputs"
+            " FROM jobs ORDER BY seq").fetchall()
+        jobs = []
+        for job_id, seq, status, request, created, started, finished, result, error, outputs in rows:
+            jobs.append(Job(job_id, json.loads(request), created, status=status, started=started,
+                            finished=finished, progress=100.0 if status == "done" else 0.0,
+                            result=json.loads(result) if result else None, error=error, seq=seq,
+                            outputs=json.loads(outputs) if outputs else []))
+        return jobs
+
+
+def _within(path, roots):
+    real = os.path.realpath(path)
+    return any(os.path.commonpath([real, root]) == root for root in roots)
+
+
+def _check_option(name, value, option_field):
+    """Kiểm tra kiểu của một tùy chọn gửi qua JSON, trả về giá trị đã chuẩn hóa"""
+    if name == "bucket_rules":
+        if value is not None and not isinstance(value, dict):
+            raise RequestError(400, "bucket_rules phải là object JSON (không nhận đường dẫn file)")
+        return value
+    expected = option_field.type
+    if value is None:
+        if option_field.default is None:
+            return None
+        raise RequestError(400, f"Tùy chọn {name} không được là null")
+    if expected is tuple:
+        if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+            raise RequestError(400, f"Tùy chọn {name} phải là danh sách chuỗi")
+        return tuple(value)
+    if expected is int and isinstance(value, bool) or not isinstance(value, expected):
+        raise RequestError(400, f"Tùy chọn {name} phải có kiểu {expected.__name__}")
+    return value
+
+
+class JobService:
+    """Hàng đợi job chuyển đổi với API HTTP trên asyncio.
+
+    port=0 chọn cổng trống (đọc lại ở thuộc tính port sau start()). cache_dir
+    (tùy chọn) là bộ nhớ đệm dùng chung cho các job gửi "cache": true.
+    """
+
+    def __init__(self, data_dir=None, host="127.0.0.1", port=DEFAULT_PORT, max_jobs=DEFAULT_MAX_JOBS,
+                 max_queued=DEFAULT_MAX_QUEUED, allowed_roots=None, cache_dir=None, on_log=None):
+        self.data_dir = data_dir or default_data_dir()
+        self.host = host
+        self.port = port
+        self.max_jobs = max(1, max_jobs)
+        self.max_queued = max_queued
+        self.allowed_roots = [os.path.realpath(root) for root in allowed_roots or ()]
+        self.cache_dir = cache_dir
+        self.log = on_log or (lambda message: None)
+        self.results_dir = os.path.join(self.data_dir, "results")
+        self.temp_folder = os.path.join(self.data_dir, "tmp")
+        self.jobs = {}
+        self.store = None
+        self._queue = None
+        self._server = None
+        self._workers = []
+        self._executor = None
+        self._engines = {}
+        # Các job đang chạy mà client đã yêu cầu hủy
+        self._cancel_requested = set()
+        self._subscribers = {}
+        self._stopping = False
+        self._next_seq = 0
+
+    # Vòng đời
+
+    async def start(self):
+        self.store = JobStore(os.path.join(self.data_dir, "jobs.sqlite"))
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_jobs, thread_name_prefix="imagetopdf-job")
+        requeued = 0
+        for job in self.store.load():
+            if job.status not in FINISHED_STATES:
+                # Job đang chờ hoặc bị dừng giữa chừng khi dịch vụ tắt: chạy lại từ đầu
+                job.status, job.started, job.progress, job.message = "queued", None, 0.0, ""
+                self.store.save(job)
+                self._queue.put_nowait(job.id)
+                requeued += 1
+            self.jobs[job.id] = job
+            self._next_seq = max(self._next_seq, job.seq + 1)
+        if requeued:
+            self.log(f"Đưa lại {requeued} job chưa hoàn thành vào hàng đợi.")
+
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.max_jobs)]
+        self.log(f"Dịch vụ đang nghe tại http://{self.host}:{self.port} (tối đa {self.max_jobs} job cùng lúc).")
+
+    async def stop(self):
+        """Dừng nhận yêu cầu; job đang chạy bị dừng và sẽ được chạy lại ở lần khởi động sau"""
+        self._stopping = True
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        for engine in list(self._engines.values()):
+            engine.cancel()
+        for _ in self._workers:
+            self._queue.put_nowait(None)
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for queues in self._subscribers.values():
+            for queue in queues:
+                self._push(queue, ("end", {}))
+        self._executor.shutdown(wait=True)
+        self.store.close()
+        self.log("Đã dừng dịch vụ.")
+
+    async def serve_forever(self):
+        await self.start()
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        try:
+            await stop.wait()
+        finally:
+            await self.stop()
+
+    # Hàng đợi và thực thi
+
+    def queued_count(self):
+        return sum(1 for job in self.jobs.values() if job.status == "queued")
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            if job_id is None or self._stopping:
+                return
+            job = self.jobs.get(job_id)
+            if job is not None and job.status == "queued":
+                try:
+                    await self._run_job(job)
+                except Exception as e:
+                    # Không để một job lỗi làm dừng hẳn worker (số job chạy cùng lúc sẽ giảm đi một)
+                    self.log(f"Lỗi không mong muốn khi chạy job {job.id}: {str(e)}")
+
+    def _options_for(self, job):
+        request = job.request
+        output_dir = os.path.join(self.results_dir, job.id)
+        os.makedirs(output_dir, exist_ok=True)
+        values = dict(request.get("options") or {})
+        use_cache = values.pop("cache", False)
+        return ConversionOptions(
+            input_folder=request.get("input_folder") or "",
+            output_file=os.path.join(output_dir, request.get("output_name") or "output.pdf"),
+            input_files=tuple(request.get("files") or ()),
+            temp_folder=self.temp_folder,
+            cache_dir=self.cache_dir if use_cache else None,
+            **{name: value for name, value in self._checked_options(values).items()},
+        )
+
+    async def _run_job(self, job):
+        loop = asyncio.get_running_loop()
+
+        def emit(event, data):
+            loop.call_soon_threadsafe(self._on_engine_event, job, event, data)
+
+        job.status, job.started, job.progress, job.message = "running", time.time(), 0.0, ""
+        job.result, job.error, job.outputs = None, None, []
+        self.store.save(job)
+        self._publish(job, "state", job.to_dict())
+        self.log(f"Bắt đầu job {job.id}.")
+
+        engine = None
+        try:
+            # Thư mục kết quả và tùy chọn được tạo trong try: lỗi ở đây (ví dụ yêu cầu hỏng được đọc
+            # lại từ SQLite) đánh dấu job thất bại thay vì để job mãi ở trạng thái running
+            options = self._options_for(job)
+            engine = ConversionEngine(
+                options,
+                on_log=lambda message: emit("log", {"message": message}),
+                on_progress=lambda percent: emit("progress", {"percent": round(percent, 2)}),
+                on_status=lambda text: emit("message", {"message": text}),
+                on_output_progress=lambda path, percent: emit(
+                    "output_progress", {"file": os.path.basename(path), "percent": round(percent, 2)}),
+            )
+            self._engines[job.id] = engine
+            result = await loop.run_in_executor(self._executor, engine.run)
+            job.status = "done"
+            job.progress = 100.0
+            job.outputs = [output.path for output in result.outputs]
+            job.result = {
+                "outputs": [
+                    {"index": i, "name": os.path.relpath(output.path, os.path.dirname(options.output_file)),
+                     "group": output.ratio_type, "pages": output.image_count,
+                     "bytes": os.path.getsize(output.path), "url": f"/jobs/{job.id}/outputs/{i}"}
+                    for i, output in enumerate(result.outputs)
+                ],
+                "image_count": result.image_count,
+                "errors": [{"path": error.path, "message": error.message} for error in result.errors],
+                "stage_times": result.stage_times,
+            }
+        except ConversionCancelled:
+            if self._stopping and job.id not in self._cancel_requested:
+                # Dịch vụ đang tắt: giữ job trong hàng đợi cho lần khởi động sau
+                job.status, job.started, job.progress = "queued", None, 0.0
+            else:
+                job.status = "cancelled"
+            shutil.rmtree(os.path.join(self.results_dir, job.id), ignore_errors=True)
+        except ConversionError as e:
+            job.status, job.error = "failed", str(e)
+        except Exception as e:
+            job.status, job.error = "failed", f"Lỗi không mong muốn: {str(e)}"
+        finally:
+            self._engines.pop(job.id, None)
+            self._cancel_requested.discard(job.id)
+            if engine is not None:
+                remove_temp_files(engine.result, self.temp_folder)
+
+        if job.status != "queued":
+            job.finished = time.time()
+        self.store.save(job)
+        self.log(f"Job {job.id}: {job.status}" + (f" ({job.error})" if job.error else ""))
+        self._publish(job, "state", job.to_dict())
+        if job.status in FINISHED_STATES:
+            self._publish(job, "end", {"status": job.status})
+
+    def _on_engine_event(self, job, event, data):
+        if event == "progress":
+            job.progress = data["percent"]
+        elif event == "message":
+            job.message = data["message"]
+        self._publish(job, event, data)
+
+    @staticmethod
+    def _push(queue, item):
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Client theo dõi quá chậm: bỏ sự kiện cũ nhất để vẫn nhận được sự kiện kết thúc
+            queue.get_nowait()
+            queue.put_nowait(item)
+
+    def _publish(self, job, event, data):
+        for queue in self._subscribers.get(job.id, ()):
+            self._push(queue, (event, data))
+
+    # Kiểm tra yêu cầu
+
+    def _check_path(self, path, what):
+        if not isinstance(path, str) or not path:
+            raise RequestError(400, f"{what} phải là chuỗi đường dẫn")
+        if not os.path.isabs(path):
+            raise RequestError(400, f"{what} phải là đường dẫn tuyệt đối: {path}")
+        if self.allowed_roots and not _within(path, self.allowed_roots):
+            raise RequestError(403, f"{what} nằm ngoài các thư mục được phép: {path}")
+
+    def _checked_options(self, values):
+        option_fields = {option_field.name: option_field for option_field in dataclasses.fields(ConversionOptions)}
+        checked = {}
+        for name, value in values.items():
+            if name in _RESERVED_OPTIONS or name not in option_fields:
+                raise RequestError(400, f"Tùy chọn không được hỗ trợ: {name}")
+            checked[name] = _check_option(name, value, option_fields[name])
+        return checked
+
+    def _validate_request(self, request):
+        if not isinstance(request, dict):
+            raise RequestError(400, "Nội dung yêu cầu phải là object JSON")
+        unknown = set(request) - {"input_folder", "files", "output_name", "options"}
+        if unknown:
+            raise RequestError(400, f"Trường không được hỗ trợ: {', '.join(sorted(unknown))}")
+        folder, files = request.get("input_folder"), request.get("files")
+        if bool(folder) == bool(files):
+            raise RequestError(400, "Cần đúng một trong hai trường input_folder hoặc files")
+        if folder:
+            self._check_path(folder, "input_folder")
+            if not os.path.isdir(folder):
+                raise RequestError(400, f"Không tìm thấy thư mục: {folder}")
+        else:
+            if not isinstance(files, list):
+                raise RequestError(400, "files phải là danh sách đường dẫn")
+            for path in files:
+                self._check_path(path, "files")
+        output_name = request.get("output_name")
+        if output_name is not None:
+            if (not isinstance(output_name, str) or os.path.basename(output_name) != output_name
+                    or not output_name.lower().endswith(".pdf") or output_name.startswith(".")):
+                raise RequestError(400, "output_name phải là tên file .pdf, không chứa thư mục")
+        options = request.get("options") or {}
+        if not isinstance(options, dict):
+            raise RequestError(400, "options phải là object JSON")
+        options = dict(options)
+        if not isinstance(options.pop("cache", False), bool):
+            raise RequestError(400, "Tùy chọn cache phải có kiểu bool")
+        self._checked_options(options)
+
+    # HTTP
+
+    async def _handle(self, reader, writer):
+        try:
+            try:
+                method, path, body = await self._read_request(reader)
+                await self._dispatch(method, path, body, writer)
+            except RequestError as e:
+                await self._send_json(writer, e.status, {"error": str(e)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            self.log(f"Lỗi khi xử lý yêu cầu: {str(e)}")
+            try:
+                await self._send_json(writer, 500, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+        parts = request_line.split(" ")
+        if len(parts) != 3:
+            raise RequestError(400, "Dòng yêu cầu HTTP không hợp lệ")
+        method, target, _ = parts
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise RequestError(400, "Content-Length không hợp lệ")
+        if length > MAX_BODY_BYTES:
+            raise RequestError(413, "Nội dung yêu cầu quá lớn")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], body
+
+    async def _dispatch(self, method, path, body, writer):
+        allowed = False
+        for route_method, pattern, handler in _ROUTES:
+            match = pattern.match(path)
+            if match is None:
+                continue
+            allowed = True
+            if route_method == method:
+                await getattr(self, handler)(writer, body, *match.groups())
+                return
+        raise RequestError(405 if allowed else 404, "Phương thức không được hỗ trợ" if allowed else "Không tìm thấy")
+
+    async def _send(self, writer, status, body=b"", content_type="application/json; charset=utf-8", headers=None):
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", f"Content-Type: {content_type}",
+                 f"Content-Length: {len(body)}", "Connection: close"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _send_json(self, writer, status, data, headers=None):
+        await self._send(writer, status, json.dumps(data, ensure_ascii=False).encode("utf-8"), headers=headers)
+
+    def _job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise RequestError(404, f"Không có job {job_id}")
+        return job
+
+    async def _health(self, writer, body):
+        running = sum(1 for job in self.jobs.values() if job.status == "running")
+        await self._send_json(writer, 200, {"status": "ok", "running": running, "queued": self.queued_count(),
+                                            "max_jobs": self.max_jobs, "max_queued": self.max_queued})
+
+    async def _list_jobs(self, writer, body):
+        await self._send_json(writer, 200, {"jobs": [job.to_dict() for job in self.jobs.values()]})
+
+    async def _submit_job(self, writer, body):
+        if self._stopping:
+            raise RequestError(503, "Dịch vụ đang dừng")
+        try:
+            request = json.loads(body.decode("utf-8") or "null")
+        except ValueError:
+            raise RequestError(400, "Nội dung yêu cầu không phải JSON hợp lệ")
+        self._validate_request(request)
+        if self.queued_count() >= self.max_queued:
+            await self._send_json(writer, 429, {"error": f"Hàng đợi đã đầy ({self.max_queued} job)"},
+                                  headers={"Retry-After": "5"})
+            return
+
+        job = Job(uuid.uuid4().hex, request, time.time(), seq=self._next_seq)
+        self._next_seq += 1
+        self.jobs[job.id] = job
+        self.store.save(job)
+        self._queue.put_nowait(job.id)
+        self.log(f"Nhận job {job.id}.")
+        await self._send_json(writer, 202, job.to_dict(), headers={"Location": f"/jobs/{job.id}"})
+
+    async def _get_job(self, writer, body, job_id):
+        await self._send_json(writer, 200, self._job(job_id).to_dict())
+
+    async def _cancel_job(self, writer, body, job_id):
+        job = self._job(job_id)
+        if job.status in FINISHED_STATES:
+            raise RequestError(409, f"Job đã kết thúc ({job.status})")
+        if job.status == "queued":
+            job.status, job.finished = "cancelled", time.time()
+            self.store.save(job)
+            self._publish(job, "state", job.to_dict())
+            self._publish(job, "end", {"status": job.status})
+        else:
+            # Engine dừng ở ảnh tiếp theo; trạng thái được cập nhật khi luồng chạy job kết thúc
+            self._cancel_requested.add(job.id)
+            self._engines[job.id].cancel()
+        await self._send_json(writer, 202, job.to_dict())
+
+    async def _delete_job(self, writer, body, job_id):
+        job = self._job(job_id)
+        if job.status not in FINISHED_STATES:
+            raise RequestError(409, "Chỉ xóa được job đã kết thúc; hãy hủy job trước")
+        shutil.rmtree(os.path.join(self.results_dir, job.id), ignore_errors=True)
+        self.store.delete(job.id)
+        del self.jobs[job.id]
+        await self._send_json(writer, 200, {"deleted": job.id})
+
+    async def _download_output(self, writer, body, job_id, index):
+        job = self._job(job_id)
+        index = int(index)
+        if job.status != "done" or index >= len(job.outputs):
+            raise RequestError(404, "Không có file kết quả này")
+        path = job.outputs[index]
+        try:
+            size = os.path.getsize(path)
+            f = open(path, "rb")
+        except OSError:
+            raise RequestError(404, "File kết quả không còn trên đĩa")
+        with f:
+            header = (f"HTTP/1.1 200 OK\r\nContent-Type: application/pdf\r\nContent-Length: {size}\r\n"
+                      f"Content-Disposition: attachment; filename=\"{os.path.basename(path)}\"\r\n"
+                      f"Connection: close\r\n\r\n")
+            writer.write(header.encode("utf-8"))
+            while True:
+                chunk = f.read(DOWNLOAD_CHUNK)
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+
+    async def _job_events(self, writer, body, job_id):
+        job = self._job(job_id)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream; charset=utf-8\r\n"
+                     b"Cache-Control: no-cache\r\nConnection: close\r\n\r\n")
+        await self._write_event(writer, "state", job.to_dict())
+        if job.status in FINISHED_STATES:
+            await self._write_event(writer, "end", {"status": job.status})
+            return
+
+        queue = asyncio.Queue(maxsize=MAX_PENDING_EVENTS)
+        self._subscribers.setdefault(job.id, set()).add(queue)
+        try:
+            while True:
+                event, data = await queue.get()
+                await self._write_event(writer, event, data)
+                if event == "end":
+                    return
+        finally:
+            subscribers = self._subscribers.get(job.id)
+            subscribers.discard(queue)
+            if not subscribers:
+                del self._subscribers[job.id]
+
+    async def _write_event(self, writer, event, data):
+        writer.write(f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8"))
+        await writer.drain()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m imagetopdf.service",
+        description="Dịch vụ HTTP cục bộ nhận job chuyển đổi ảnh sang PDF",
+    )
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="Địa chỉ nghe (mặc định: %(default)s, chỉ máy cục bộ)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Cổng (mặc định: %(default)s)")
+    parser.add_argument("--data-dir", default=None,
+                        help="Thư mục lưu trạng thái job và file kết quả (mặc định: cạnh thư mục bộ nhớ đệm)")
+    parser.add_argument("--max-jobs", type=int, default=DEFAULT_MAX_JOBS,
+                        help="Số job chạy cùng lúc (mặc định: %(default)s)")
+    parser.add_argument("--max-queued", type=int, default=DEFAULT_MAX_QUEUED,
+                        help="Số job chờ tối đa, vượt quá trả về 429 (mặc định: %(default)s)")
+    parser.add_argument("--allow-root", action="append", default=[], metavar="THƯ_MỤC",
+                        help="Chỉ cho phép đọc ảnh trong các thư mục này (dùng được nhiều lần)")
+    parser.add_argument("--cache-dir", default=None,
+                        help="Bộ nhớ đệm dùng chung cho các job gửi \"cache\": true")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Không in nhật ký của dịch vụ")
+    args = parser.parse_args(argv)
+
+    def log(message):
+        if not args.quiet:
+            print(f"[{time.strftime('%H:%M:%S')}] {message}", flush=True)
+
+    service = JobService(args.data_dir, host=args.host, port=args.port, max_jobs=args.max_jobs,
+                         max_queued=args.max_queued, allowed_roots=args.allow_root, cache_dir=args.cache_dir,
+                         on_log=log)
+    try:
+        asyncio.run(service.serve_forever())
+    except OSError as e:
+        print(f"Lỗi: {str(e)}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
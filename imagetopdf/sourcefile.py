@@ -0,0 +1,123 @@
+"""Đọc dữ liệu nguồn bằng memory map và sao chép thẳng sang file PDF đang ghi.
+
+Ảnh JPEG được nhúng nguyên vẹn không cần đọc vào bộ nhớ Python: bộ mã hóa chỉ
+trả về một FileSlice (đường dẫn, vị trí, độ dài), nên việc gửi kết quả giữa
+các tiến trình gần như không tốn gì. Khi ghi, đoạn dữ liệu được map vào bộ nhớ
+(MappedSlice, để tính CRC32 mà không tạo bản sao) rồi được chép từ file sang
+file ngay trong nhân hệ điều hành bằng os.copy_file_range hoặc os.sendfile;
+nơi không hỗ trợ (Windows, sendfile trên macOS chỉ ghi ra socket) thì
+memoryview của vùng map được ghi thẳng ra file.
+"""
+import mmap
+import os
+import zlib
+
+# Số byte tối đa của một lần gọi copy_file_range/sendfile
+_COPY_CHUNK = 64 * 1024 * 1024
+
+
+class FileSlice:
+    """Đoạn [offset, offset + length) của một file; length=None nghĩa là tới cuối file"""
+
+    def __init__(self, path, offset=0, length=None):
+        self.path = path
+        self.offset = offset
+        self.length = length
+
+    def read(self):
+        """Đọc đoạn dữ liệu thành bytes (cho các chỗ cần dữ liệu trong bộ nhớ)"""
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            return f.read() if self.length is None else f.read(self.length)
+
+
+class MappedSlice:
+    """Một FileSlice (hoặc đoạn của file đã mở) được map vào bộ nhớ; dùng như context manager.
+
+    Kích thước file được kiểm tra khi mở, nên file nguồn bị cắt ngắn báo lỗi
+    trước khi bất kỳ byte nào được ghi ra.
+    """
+
+    def __init__(self, source, offset=0, length=None):
+        if isinstance(source, FileSlice):
+            source, offset, length = source.path, source.offset, source.length
+        self._owned = not hasattr(source, 'fileno')
+        self._file = open(source, 'rb') if self._owned else source
+        try:
+            size = os.fstat(self._file.fileno()).st_size
+            if length is None:
+                length = size - offset
+            if length <= 0 or offset + length > size:
+                raise ValueError(f"File nguồn ngắn hơn dự kiến ({size} byte, cần {offset + length} byte)")
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except BaseException:
+            if self._owned:
+                self._file.close()
+            raise
+        self.offset = offset
+        self.length = length
+        self.view = memoryview(self._map)[offset:offset + length]
+
+    def __len__(self):
+        return self.length
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def fileno(self):
+        return self._file.fileno()
+
+    def crc32(self, value=0):
+        return zlib.crc32(self.view, value)
+
+    def close(self):
+        self.view.release()
+        self._map.close()
+        if self._owned:
+            self._file.close()
+
+
+def _copy_file_range(src_fd, out_fd, src_offset, out_offset, count):
+    return os.copy_file_range(src_fd, out_fd, count, src_offset, out_offset)
+
+
+def _sendfile(src_fd, out_fd, src_offset, out_offset, count):
+    os.lseek(out_fd, out_offset, os.SEEK_SET)
+    return os.sendfile(out_fd, src_fd, src_offset, count)
+
+
+# Các cách chép trong nhân có trên hệ điều hành này, theo thứ tự ưu tiên
+_KERNEL_COPIES = [copy for name, copy in (("copy_file_range", _copy_file_range), ("sendfile", _sendfile))
+                  if hasattr(os, name)]
+
+
+def copy_to(mapped, out_file):
+    """Ghi toàn bộ MappedSlice vào out_file (file nhị phân có bộ đệm) tại vị trí hiện tại.
+
+    Trả về số byte được chép trong nhân (không đi qua bộ nhớ Python).
+    """
+    out_file.flush()
+    position = out_file.tell()
+    out_fd = out_file.fileno()
+    copied = 0
+    for kernel_copy in _KERNEL_COPIES:
+        try:
+            while copied < mapped.length:
+                count = kernel_copy(mapped.fileno(), out_fd, mapped.offset + copied, position + copied,
+                                    min(mapped.length - copied, _COPY_CHUNK))
+                if count == 0:
+                    break
+                copied += count
+            break
+        except OSError:
+            # Cặp file này không hỗ trợ cách chép này (ví dụ khác hệ thống file trên nhân cũ): thử cách tiếp theo
+            continue
+    # Đồng bộ lại vị trí của file có bộ đệm sau khi ghi trực tiếp qua file descriptor
+    out_file.seek(position + copied)
+    if copied < mapped.length:
+        out_file.write(mapped.view[copied:])
+    return copied
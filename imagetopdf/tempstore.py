@@ -0,0 +1,133 @@
+"""Quản lý dung lượng file tạm do ứng dụng tạo ra.
+
+Mỗi file tạm được ghi vào một chỉ mục SQLite nằm trong thư mục tạm của ứng
+dụng ngay khi được tạo, cùng với tổng số file và tổng dung lượng. Nhờ đó việc
+hỏi dung lượng đang dùng chỉ là một truy vấn một dòng, còn việc dọn dẹp chỉ
+duyệt đúng các file đã tạo thay vì quét toàn bộ thư mục tạm của hệ thống.
+
+Nhiều phiên (cửa sổ giao diện, lần chạy dòng lệnh) có thể dùng chung một chỉ
+mục; mỗi phiên có một mã riêng để hạn mức (max_bytes) không xóa nhầm file mà
+phiên hiện tại còn đang dùng. Một TempStorage có thể được dùng từ nhiều luồng
+(ví dụ các file PDF được tạo cùng lúc).
+"""
+import os
+import sqlite3
+import threading
+import time
+
+INDEX_NAME = "tempfiles.sqlite"
+
+
+class TempStorage:
+    """Chỉ mục các file tạm trong thư mục root, với hạn mức dung lượng tùy chọn"""
+
+    def __init__(self, root, max_bytes=None, session=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.session = session or f"{os.getpid()}-{time.time_ns()}"
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(self.root, INDEX_NAME), timeout=30, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL, created REAL NOT NULL, session TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS files_created ON files (created)")
+        # Tổng được cập nhật cùng giao dịch với bảng files nên luôn khớp giữa các phiên
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            " id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL, files INTEGER NOT NULL)"
+        )
+        self._db.execute("INSERT OR IGNORE INTO usage (id, bytes, files) VALUES (0, 0, 0)")
+        self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def usage(self):
+        """Trả về (tổng dung lượng tính bằng byte, số file) của các file tạm đang được theo dõi"""
+        with self._lock:
+            return self._db.execute("SELECT bytes, files FROM usage WHERE id = 0").fetchone()
+
+    def add(self, path, size=None):
+        """Ghi nhận một file tạm vừa được tạo; xóa bớt file cũ nếu vượt hạn mức"""
+        if size is None:
+            size = os.path.getsize(path)
+        path = os.path.abspath(path)
+        with self._lock, self._db:
+            row = self._db.execute("SELECT size FROM files WHERE path = ?", (path,)).fetchone()
+            if row is not None:
+                self._db.execute("UPDATE usage SET bytes = bytes - ?, files = files - 1 WHERE id = 0", row)
+            self._db.execute(
+                "INSERT OR REPLACE INTO files (path, size, created, session) VALUES (?, ?, ?, ?)",
+                (path, size, time.time(), self.session),
+            )
+            self._db.execute("UPDATE usage SET bytes = bytes + ?, files = files + 1 WHERE id = 0", (size,))
+            over_quota = self.max_bytes is not None and self.usage()[0] > self.max_bytes
+        if over_quota:
+            self.evict()
+
+    def _delete(self, rows):
+        """Xóa các file (path, size) khỏi đĩa và khỏi chỉ mục; trả về (số file đã xóa, số byte giải phóng)"""
+        removed = 0
+        freed = 0
+        with self._lock, self._db:
+            for path, size in rows:
+                try:
+                    os.unlink(path)
+                    removed += 1
+                    freed += size
+                except FileNotFoundError:
+                    pass
+                except OSError:
+                    # File đang bị khóa (ví dụ trên Windows): giữ lại trong chỉ mục để lần sau thử lại
+                    continue
+                cursor = self._db.execute("DELETE FROM files WHERE path = ?", (path,))
+                if cursor.rowcount:
+                    self._db.execute("UPDATE usage SET bytes = bytes - ?, files = files - 1 WHERE id = 0", (size,))
+        return removed, freed
+
+    def discard(self, paths):
+        """Xóa các file tạm đã biết đường dẫn"""
+        rows = []
+        with self._lock:
+            for path in paths:
+                row = self._db.execute("SELECT path, size FROM files WHERE path = ?",
+                                       (os.path.abspath(path),)).fetchone()
+                if row is not None:
+                    rows.append(row)
+        return self._delete(rows)
+
+    def clean(self, older_than=None):
+        """Xóa tất cả file tạm đã ghi nhận (của mọi phiên), hoặc chỉ các file cũ hơn older_than giây"""
+        query = "SELECT path, size FROM files"
+        params = ()
+        if older_than is not None:
+            query += " WHERE created < ?"
+            params = (time.time() - older_than,)
+        with self._lock:
+            rows = self._db.execute(query, params).fetchall()
+        return self._delete(rows)
+
+    def evict(self, max_bytes=None):
+        """Xóa các file tạm cũ nhất của các phiên khác cho đến khi không vượt max_bytes"""
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        rows = []
+        with self._lock:
+            total = self.usage()[0]
+            cursor = self._db.execute(
+                "SELECT path, size FROM files WHERE session != ? ORDER BY created", (self.session,))
+            for path, size in cursor:
+                if total <= limit:
+                    break
+                rows.append((path, size))
+                total -= size
+        return self._delete(rows)
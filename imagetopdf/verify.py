@@ -0,0 +1,251 @@
+"""Kiểm tra nhanh file PDF đã ghi chỉ qua bảng xref và trailer, không phân tích lại tài liệu.
+
+verify_pdf đọc phần cuối file để tìm startxref, đi theo chuỗi bảng xref (kể
+cả các bản cập nhật gia tăng qua /Prev), rồi chỉ mở hai object: Catalog và
+cây Pages để lấy /Count. Mỗi mục xref dài đúng 20 byte nên vị trí của một
+object được đọc thẳng mà không cần duyệt cả bảng; chi phí gần như không đổi
+dù file lớn bao nhiêu. full=True kiểm tra thêm mọi mục xref và phần đầu của
+từng object.
+
+Chỉ hỗ trợ bảng xref dạng văn bản (do StreamingPDFWriter và img2pdf tạo ra);
+file dùng xref stream (PDF 1.5) báo PDFUnsupported.
+"""
+import os
+import re
+import zlib
+from dataclasses import dataclass
+
+# Số byte cuối file được đọc để tìm startxref
+_TAIL_BYTES = 2048
+
+# Kích thước tối đa của object Catalog/Pages được đọc khi tìm /Count
+_MAX_OBJECT_BYTES = 64 * 1024 * 1024
+
+_XREF_ENTRY = 20
+
+_STARTXREF = re.compile(rb"startxref\s+(\d+)\s+%%EOF", re.S)
+_SUBSECTION = re.compile(rb"(\d+) (\d+)[ \t]*\r?\n")
+_REF = {name: re.compile(rb"/" + name.encode() + rb"\s+(\d+)\s+(\d+)\s+R") for name in ("Root", "Pages")}
+_INT = {name: re.compile(rb"/" + name.encode() + rb"\s+(\d+)") for name in ("Size", "Prev", "Count")}
+_OBJECT_HEADER = re.compile(rb"\s*(\d+)\s+(\d+)\s+obj\b")
+
+
+class PDFVerifyError(ValueError):
+    """File PDF không hợp lệ (bảng xref, trailer hoặc số trang không đúng)"""
+
+
+class PDFUnsupported(PDFVerifyError):
+    """File PDF dùng cấu trúc mà bộ kiểm tra không đọc được (ví dụ xref stream)"""
+
+
+@dataclass
+class PDFSummary:
+    """Kết quả kiểm tra một file PDF"""
+    page_count: int
+    # Số object trong bảng xref (theo /Size của trailer mới nhất)
+    object_count: int
+    file_size: int
+    # Số bảng xref (1 + số lần cập nhật gia tăng)
+    xref_sections: int
+
+
+class _XrefSection:
+    """Một bảng xref cùng trailer của nó; vị trí các mục được tính trực tiếp từ tiêu đề đoạn"""
+
+    def __init__(self, f, offset, file_size):
+        f.seek(offset)
+        head = f.read(4)
+        if head != b"xref":
+            if re.match(rb"\d+\s+\d+\s+obj", head + f.read(32)):
+                raise PDFUnsupported("File PDF dùng xref stream, không hỗ trợ kiểm tra nhanh")
+            raise PDFVerifyError(f"Không có bảng xref tại vị trí {offset}")
+        position = offset + 4
+        # (id đầu, số mục, vị trí mục đầu tiên)
+        self.subsections = []
+        while True:
+            f.seek(position)
+            chunk = f.read(64)
+            line = chunk.lstrip(b" \r\n")
+            position += len(chunk) - len(line)
+            if line.startswith(b"trailer"):
+                break
+            match = _SUBSECTION.match(line)
+            if match is None:
+                raise PDFVerifyError(f"Tiêu đề đoạn xref không hợp lệ tại vị trí {position}")
+            first, count = int(match.group(1)), int(match.group(2))
+            entries = position + match.end()
+            self.subsections.append((first, count, entries))
+            position = entries + count * _XREF_ENTRY
+            if position > file_size:
+                raise PDFVerifyError("Bảng xref vượt quá cuối file")
+
+        f.seek(position)
+        chunk = f.read(4096)
+        end = chunk.find(b"startxref")
+        trailer = chunk[:end] if end >= 0 else chunk
+        if b"trailer" not in trailer:
+            raise PDFVerifyError(f"Không tìm thấy trailer sau bảng xref tại vị trí {offset}")
+        self.size = _int(trailer, "Size")
+        self.prev = _int(trailer, "Prev")
+        self.root = _ref(trailer, "Root")
+        self._f = f
+
+    def entry(self, obj_id):
+        """(offset, generation, đang dùng) của obj_id trong bảng này, hoặc None nếu không có"""
+        for first, count, entries in self.subsections:
+            if first <= obj_id < first + count:
+                self._f.seek(entries + (obj_id - first) * _XREF_ENTRY)
+                return _parse_entry(self._f.read(_XREF_ENTRY), obj_id)
+        return None
+
+    def entries(self):
+        """Duyệt mọi mục: (id, offset, generation, đang dùng)"""
+        for first, count, entries in self.subsections:
+            self._f.seek(entries)
+            data = self._f.read(count * _XREF_ENTRY)
+            for i in range(count):
+                yield (first + i,) + _parse_entry(data[i * _XREF_ENTRY:(i + 1) * _XREF_ENTRY], first + i)
+
+
+def _int(data, name):
+    match = _INT[name].search(data)
+    return int(match.group(1)) if match else None
+
+
+def _ref(data, name):
+    match = _REF[name].search(data)
+    return int(match.group(1)) if match else None
+
+
+def _parse_entry(raw, obj_id):
+    try:
+        offset, generation, kind = int(raw[0:10]), int(raw[11:16]), raw[17:18]
+    except ValueError:
+        raise PDFVerifyError(f"Mục xref của object {obj_id} không hợp lệ")
+    if kind not in (b"n", b"f"):
+        raise PDFVerifyError(f"Mục xref của object {obj_id} không hợp lệ")
+    return offset, generation, kind == b"n"
+
+
+def _find_startxref(f, file_size):
+    f.seek(max(0, file_size - _TAIL_BYTES))
+    tail = f.read()
+    matches = list(_STARTXREF.finditer(tail))
+    if not matches:
+        raise PDFVerifyError("Không tìm thấy startxref ở cuối file (file bị cắt ngắn?)")
+    return int(matches[-1].group(1))
+
+
+def _read_object(f, sections, obj_id, file_size, until=None):
+    """Đọc object obj_id (tới endobj, hoặc tới khi until khớp) theo bảng xref mới nhất có nó"""
+    for section in sections:
+        entry = section.entry(obj_id)
+        if entry is not None:
+            break
+    else:
+        raise PDFVerifyError(f"Object {obj_id} không có trong bảng xref")
+    offset, _, in_use = entry
+    if not in_use or offset >= file_size:
+        raise PDFVerifyError(f"Mục xref của object {obj_id} trỏ ra ngoài file")
+    f.seek(offset)
+    data = f.read(4096)
+    header = _OBJECT_HEADER.match(data)
+    if header is None or int(header.group(1)) != obj_id:
+        raise PDFVerifyError(f"Vị trí {offset} trong bảng xref không phải là object {obj_id}")
+    while b"endobj" not in data and (until is None or until.search(data) is None):
+        if len(data) >= _MAX_OBJECT_BYTES:
+            raise PDFVerifyError(f"Object {obj_id} quá lớn hoặc không có endobj")
+        chunk = f.read(1024 * 1024)
+        if not chunk:
+            raise PDFVerifyError(f"Object {obj_id} bị cắt ngắn")
+        data += chunk
+    end = data.find(b"endobj")
+    # Bỏ phần thuộc các object phía sau
+    return data[:end] if end >= 0 else data
+
+
+def verify_pdf(path, expected_pages=None, full=False):
+    """Kiểm tra file PDF qua bảng xref và trailer, trả về PDFSummary.
+
+    expected_pages (tùy chọn) là số trang mong đợi. Ném PDFVerifyError nếu
+    file không hợp lệ hoặc số trang không khớp.
+    """
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        if f.read(5) != b"%PDF-":
+            raise PDFVerifyError("File không bắt đầu bằng %PDF-")
+
+        # Các bảng xref từ mới nhất tới cũ nhất
+        sections = []
+        offset = _find_startxref(f, file_size)
+        seen = set()
+        while offset is not None:
+            if offset in seen or offset >= file_size:
+                raise PDFVerifyError(f"Chuỗi /Prev của bảng xref không hợp lệ ({offset})")
+            seen.add(offset)
+            section = _XrefSection(f, offset, file_size)
+            sections.append(section)
+            offset = section.prev
+
+        newest = sections[0]
+        root = next((section.root for section in sections if section.root is not None), None)
+        if root is None or newest.size is None:
+            raise PDFVerifyError("Trailer thiếu /Root hoặc /Size")
+
+        catalog = _read_object(f, sections, root, file_size)
+        pages_id = _ref(catalog, "Pages")
+        if b"/Catalog" not in catalog or pages_id is None:
+            raise PDFVerifyError("Object /Root không phải là Catalog có /Pages")
+        pages = _read_object(f, sections, pages_id, file_size, until=_INT["Count"])
+        page_count = _int(pages, "Count")
+        if b"/Pages" not in pages or page_count is None:
+            raise PDFVerifyError("Cây Pages không có /Count")
+
+        if full:
+            _check_all_objects(f, sections, newest.size, file_size)
+
+    if expected_pages is not None and page_count != expected_pages:
+        raise PDFVerifyError(f"File PDF có {page_count} trang, mong đợi {expected_pages}")
+    return PDFSummary(page_count, newest.size, file_size, len(sections))
+
+
+def _check_all_objects(f, sections, size, file_size):
+    # Mục ở bảng mới hơn thay thế mục cùng id ở bảng cũ hơn
+    latest = {}
+    for section in sections:
+        for obj_id, offset, generation, in_use in section.entries():
+            latest.setdefault(obj_id, (offset, in_use))
+    for obj_id, (offset, in_use) in latest.items():
+        if not in_use or obj_id == 0:
+            continue
+        if obj_id >= size or offset >= file_size:
+            raise PDFVerifyError(f"Mục xref của object {obj_id} không hợp lệ")
+        f.seek(offset)
+        header = _OBJECT_HEADER.match(f.read(32))
+        if header is None or int(header.group(1)) != obj_id:
+            raise PDFVerifyError(f"Vị trí {offset} trong bảng xref không phải là object {obj_id}")
+
+
+def verify_page_checksums(path, records):
+    """Đọc lại khối byte của từng trang và so với checksum đã ghi (PageRecord); trả về các trang sai.
+
+    Khác với verify_pdf, hàm này đọc lại toàn bộ dữ liệu trang nên chỉ dùng khi
+    cần kiểm tra kỹ (ví dụ sau khi sao chép file qua mạng).
+    """
+    mismatched = []
+    with open(path, "rb") as f:
+        for number, record in enumerate(records, 1):
+            if record.checksum is None:
+                continue
+            f.seek(record.start)
+            remaining = record.end - record.start
+            checksum = 0
+            while remaining > 0:
+                chunk = f.read(min(remaining, 1024 * 1024))
+                if not chunk:
+                    break
+                checksum = zlib.crc32(chunk, checksum)
+                remaining -= len(chunk)
+            if remaining or checksum != record.checksum:
+                mismatched.append(number)
+    return mismatched
@@ -0,0 +1,124 @@
+"""Chia một file PDF lớn thành nhiều tập (volume) theo số trang hoặc dung lượng.
+
+Các tập được chia trước khi ghi, dựa trên danh sách ImageInfo: mỗi tập là một
+file PDF độc lập (<tên>_part001.pdf, <tên>_part002.pdf...; file vừa trong một
+tập giữ nguyên tên <tên>.pdf), nên các tập có thể được tạo cùng lúc và bộ nhớ
+chỉ phụ thuộc vào một tập. Dung lượng của một tập
+được ước tính theo kích thước file ảnh nguồn cộng phần object của mỗi trang;
+với hồ sơ nén hoặc khổ trang cố định (ảnh được mã hóa lại) file thực tế
+thường nhỏ hơn. Ảnh lớn hơn giới hạn dung lượng nằm riêng một tập.
+
+Mục lục các tập có thể được ghi ra JSON hoặc PDF (<tên>_index.json/.pdf).
+"""
+import datetime
+import json
+import os
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+INDEX_FORMATS = ("json", "pdf")
+
+# Ước tính số byte của các object một trang (XObject, nội dung, Page, mục xref) ngoài dữ liệu ảnh
+PAGE_OVERHEAD = 600
+
+# Font có đủ dấu tiếng Việt cho mục lục PDF; không có thì dùng Helvetica
+_FONT_CANDIDATES = (
+    os.path.join(os.environ.get("WINDIR", r"C:\Windows"), "Fonts", "arial.ttf"),
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans.ttf",
+    "/System/Library/Fonts/Supplemental/Arial.ttf",
+    "/Library/Fonts/Arial Unicode.ttf",
+)
+
+
+def plan_volumes(images, max_pages=None, max_bytes=None):
+    """Chia danh sách ImageInfo (giữ thứ tự) thành các tập không vượt quá max_pages trang và max_bytes byte"""
+    volumes = []
+    current = []
+    size = 0
+    for image in images:
+        page_bytes = image.file_size + PAGE_OVERHEAD
+        if current and ((max_pages and len(current) >= max_pages)
+                        or (max_bytes and size + page_bytes > max_bytes)):
+            volumes.append(current)
+            current = []
+            size = 0
+        current.append(image)
+        size += page_bytes
+    if current:
+        volumes.append(current)
+    return volumes
+
+
+def volume_path(output_file, number):
+    """Đường dẫn tập thứ number (bắt đầu từ 1): ket_qua.pdf -> ket_qua_part001.pdf"""
+    return f"{os.path.splitext(output_file)[0]}_part{number:03d}.pdf"
+
+
+def index_path(output_file, index_format):
+    return f"{os.path.splitext(output_file)[0]}_index.{index_format}"
+
+
+def write_volume_index(output_file, entries, index_format):
+    """Ghi mục lục các tập cạnh output_file, trả về đường dẫn.
+
+    entries là danh sách dict của từng tập: file, ratio_type, volume, pages,
+    size, first_image, last_image.
+    """
+    if index_format not in INDEX_FORMATS:
+        raise ValueError(f"Định dạng mục lục phải là một trong {INDEX_FORMATS}")
+    path = index_path(output_file, index_format)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    if index_format == "json":
+        data = {
+            "output": os.path.abspath(output_file),
+            "time": datetime.datetime.now().isoformat(timespec="seconds"),
+            "volumes": entries,
+        }
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+    else:
+        _write_pdf_index(tmp_path, output_file, entries)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _index_font():
+    for font_path in _FONT_CANDIDATES:
+        if os.path.isfile(font_path):
+            try:
+                if "ImageToPDFIndex" not in pdfmetrics.getRegisteredFontNames():
+                    pdfmetrics.registerFont(TTFont("ImageToPDFIndex", font_path))
+                return "ImageToPDFIndex"
+            except Exception:
+                continue
+    return "Helvetica"
+
+
+def _write_pdf_index(path, output_file, entries):
+    # Mỗi dòng là tên file của tập (liên kết tương đối tới file nằm cùng thư mục) và phạm vi ảnh
+    font = _index_font()
+    _, height = A4
+    margin = 50
+    pdf = canvas.Canvas(path, pagesize=A4)
+    pdf.setTitle(f"Mục lục {os.path.basename(output_file)}")
+    y = height - margin
+    pdf.setFont(font, 16)
+    pdf.drawString(margin, y, f"Mục lục: {os.path.basename(output_file)} ({len(entries)} tập)")
+    y -= 30
+    for entry in entries:
+        if y < margin + 30:
+            pdf.showPage()
+            y = height - margin
+        name = os.path.basename(entry["file"])
+        pdf.setFont(font, 11)
+        pdf.drawString(margin, y, f"{name} — {entry['pages']} trang, {entry['size'] / (1024 * 1024):.1f} MB")
+        pdf.linkURL(name, (margin, y - 3, margin + pdfmetrics.stringWidth(name, font, 11), y + 11),
+                    relative=1, kind="GoToR")
+        pdf.setFont(font, 9)
+        pdf.drawString(margin + 15, y - 13, f"{entry['first_image']} … {entry['last_image']}")
+        y -= 32
+    pdf.save()
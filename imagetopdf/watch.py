@@ -0,0 +1,514 @@
+"""Chế độ theo dõi thư mục: tự chuyển đổi lại khi có ảnh mới, ảnh bị sửa hoặc bị xóa.
+
+    python -m imagetopdf.watch ./may_quet_1 ./may_quet_2 --output-dir ./pdf
+
+Mỗi thư mục được chuyển đổi bằng ConversionEngine ở chế độ gia tăng, nên chỉ
+các trang có ảnh mới hoặc thay đổi được mã hóa lại.
+
+Trên Linux, thay đổi được nhận qua inotify (gọi thẳng libc bằng ctypes, không
+cần thư viện ngoài): tiến trình ngủ trong poll() cho tới khi có sự kiện nên
+gần như không tốn CPU. Khi không có inotify (hệ điều hành khác, hết số lượng
+watch cho phép), thư mục được kiểm tra định kỳ: mỗi lượt chỉ stat thư mục
+(thời gian sửa của thư mục đổi khi file được thêm, xóa hoặc đổi tên), cứ
+full_scan_every lượt mới quét toàn bộ để phát hiện ảnh bị ghi đè tại chỗ.
+
+Với --recursive (và --per-folder), mọi thư mục con cũng được theo dõi: mỗi
+thư mục con có một inotify watch riêng (thư mục con mới tạo được thêm ngay khi
+xuất hiện), còn khi kiểm tra định kỳ thì thời gian sửa của từng thư mục con
+được so sánh.
+
+Một loạt thay đổi liên tiếp được gom lại: thư mục chỉ được chuyển đổi khi đã
+debounce giây không có sự kiện mới và các ảnh thay đổi đã không bị sửa trong
+settle giây (coi như đã ghi xong).
+"""
+import argparse
+import ctypes
+import ctypes.util
+import dataclasses
+import datetime
+import os
+import select
+import signal
+import struct
+import sys
+import threading
+import time
+
+from .cli import add_conversion_arguments, options_from_args
+from .engine import ConversionEngine, ConversionError, ConversionOptions, remove_temp_files
+from .scanner import DirectoryScanner, is_image_name
+
+# Thời gian không có sự kiện mới trước khi chuyển đổi (giây)
+DEFAULT_DEBOUNCE = 2.0
+
+# Ảnh bị sửa gần hơn khoảng này (giây) được coi là còn đang ghi
+DEFAULT_SETTLE = 3.0
+
+# Chu kỳ kiểm tra khi không dùng inotify (giây) và số lượt giữa hai lần quét toàn bộ
+DEFAULT_POLL_INTERVAL = 2.0
+DEFAULT_FULL_SCAN_EVERY = 15
+
+# Các cờ của inotify (linux/inotify.h)
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+_WATCH_MASK = (_IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+               | _IN_DELETE_SELF | _IN_ONLYDIR)
+
+# struct inotify_event: wd, mask, cookie, len, rồi tên file (len byte)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _relative(root, path):
+    """Đường dẫn tương đối của path trong root, dùng "/" như DirectoryScanner ("" là chính root)"""
+    rel_path = os.path.relpath(path, root)
+    return "" if rel_path == "." else rel_path.replace(os.sep, "/")
+
+
+def snapshot(folder, recursive=False, scanner=None):
+    """{đường dẫn tương đối (dùng "/"): (kích thước, thời gian sửa)} của các ảnh trong folder.
+
+    Với recursive=True, ảnh trong các thư mục con (không đi theo symlink thư mục)
+    cũng được tính; thư mục con không đọc được bị bỏ qua, lỗi ở chính folder được ném ra.
+    scanner là DirectoryScanner của job (thay cho recursive): ảnh được chọn đúng như
+    khi engine quét thư mục (include/exclude, nhận diện theo nội dung).
+    """
+    if scanner is None:
+        scanner = DirectoryScanner(folder, recursive=recursive, sort=None)
+    result = {}
+    stack = [""]
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            entries = os.scandir(os.path.join(folder, *rel_dir.split("/")) if rel_dir else folder)
+        except OSError:
+            if not rel_dir:
+                raise
+            continue
+        with entries:
+            for entry in entries:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        if scanner.descends(rel_path, entry.name):
+                            stack.append(rel_path)
+                        continue
+                    if (scanner.selects(rel_path, entry.name) and entry.is_file()
+                            and scanner.is_image(entry.path, entry.name)):
+                        stat = entry.stat()
+                        result[rel_path] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    continue
+    return result
+
+
+def subfolders(folder, scanner=None, rel_dir=""):
+    """Sinh (đường dẫn, thời gian sửa) của mọi thư mục con của folder, không đi theo symlink thư mục.
+
+    Với scanner, chỉ các thư mục con được scanner quét (không khớp exclude);
+    rel_dir là đường dẫn tương đối của folder trong thư mục gốc của scanner.
+    """
+    stack = [(folder, rel_dir)]
+    while stack:
+        path, rel_dir = stack.pop()
+        try:
+            entries = os.scandir(path)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                try:
+                    if not entry.is_dir(follow_symlinks=False):
+                        continue
+                    if scanner is not None and not scanner.descends(rel_path, entry.name):
+                        continue
+                    mtime = entry.stat(follow_symlinks=False).st_mtime_ns
+                except OSError:
+                    continue
+                stack.append((entry.path, rel_path))
+                yield entry.path, mtime
+
+
+class Inotify:
+    """inotify của Linux qua ctypes, ở chế độ không chặn"""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify chỉ có trên Linux")
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        # wd -> thư mục
+        self._folders = {}
+
+    def add(self, folder):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(folder), _WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno), folder)
+        self._folders[wd] = folder
+
+    def read(self):
+        """Đọc hết các sự kiện đang chờ: danh sách (thư mục, tên file, mask); thư mục là None khi hàng đợi bị tràn"""
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return events
+            pos = 0
+            while pos + _EVENT_HEADER.size <= len(data):
+                wd, mask, _, length = _EVENT_HEADER.unpack_from(data, pos)
+                start = pos + _EVENT_HEADER.size
+                name = os.fsdecode(data[start:start + length].rstrip(b"\0"))
+                pos = start + length
+                folder = None if mask & _IN_Q_OVERFLOW else self._folders.get(wd)
+                if mask & _IN_IGNORED:
+                    self._folders.pop(wd, None)
+                events.append((folder, name, mask))
+
+    def close(self):
+        os.close(self.fd)
+
+
+def folder_jobs(folders, output_dir=None, template=None):
+    """Tạo ConversionOptions cho từng thư mục theo mẫu template.
+
+    File PDF là <output_dir>/<tên thư mục>.pdf, hoặc <thư mục>.pdf nằm cạnh thư
+    mục nếu không có output_dir.
+    """
+    template = template or ConversionOptions("", "")
+    jobs = []
+    outputs = set()
+    for folder in folders:
+        folder = os.path.abspath(folder)
+        output_file = os.path.join(output_dir or os.path.dirname(folder), os.path.basename(folder) + ".pdf")
+        if output_file in outputs:
+            raise ValueError(f"Nhiều thư mục cùng ghi ra {output_file}, hãy đổi tên thư mục hoặc dùng --output-dir khác")
+        outputs.add(output_file)
+        jobs.append(dataclasses.replace(template, input_folder=folder, output_file=output_file, incremental=True))
+    return jobs
+
+
+class FolderWatcher:
+    """Theo dõi nhiều thư mục ảnh và chuyển đổi lại theo kiểu gia tăng khi có thay đổi.
+
+    jobs là danh sách ConversionOptions (xem folder_jobs), mỗi thư mục một mục.
+    use_inotify=None dùng inotify nếu có, False luôn kiểm tra định kỳ (cần cho
+    thư mục mạng, nơi inotify không thấy thay đổi từ máy khác).
+
+    Các job có options.recursive được theo dõi cả thư mục con. Ảnh được chọn
+    theo cùng các tùy chọn quét với engine (include/exclude, sniff_content), nên
+    thay đổi ở file bị loại không kích hoạt chuyển đổi.
+
+    Callback tùy chọn: on_log(message) cho nhật ký của chế độ theo dõi,
+    on_result(options, result, error) sau mỗi lần chuyển đổi. Với verbose=True,
+    nhật ký chi tiết của engine cũng được gửi tới on_log.
+    """
+
+    def __init__(self, jobs, debounce=DEFAULT_DEBOUNCE, settle=DEFAULT_SETTLE, poll_interval=DEFAULT_POLL_INTERVAL,
+                 full_scan_every=DEFAULT_FULL_SCAN_EVERY, use_inotify=None, keep_temp=False, verbose=False,
+                 on_log=None, on_result=None):
+        self.jobs = {os.path.abspath(options.input_folder): dataclasses.replace(options, incremental=True)
+                     for options in jobs}
+        self.debounce = debounce
+        self.settle = settle
+        self.poll_interval = poll_interval
+        self.full_scan_every = max(1, full_scan_every)
+        self.use_inotify = use_inotify
+        self.keep_temp = keep_temp
+        self.verbose = verbose
+        self.log = on_log or (lambda message: None)
+        self.on_result = on_result or (lambda options, result, error: None)
+        self.conversions = 0
+        # thư mục -> DirectoryScanner của job (cùng cách chọn ảnh với engine)
+        self._scanners = {folder: ConversionEngine(dataclasses.replace(options, input_folder=folder)).scanner()
+                          for folder, options in self.jobs.items()}
+        # thư mục có inotify watch -> thư mục của job chứa nó
+        self._roots = {}
+        # thư mục -> thời điểm (monotonic) được xét chuyển đổi
+        self._due = {}
+        # thư mục -> snapshot tại lần chuyển đổi gần nhất
+        self._converted = {}
+        # thư mục -> thời gian sửa của chính thư mục và các thư mục con (khi kiểm tra định kỳ)
+        self._dir_mtimes = {}
+        self._inotify = None
+        self._polled = set()
+        self._stop = threading.Event()
+        self._wake_read, self._wake_write = os.pipe()
+
+    def stop(self):
+        """Dừng vòng lặp run() (gọi được từ luồng khác hoặc trình xử lý tín hiệu)"""
+        self._stop.set()
+        try:
+            os.write(self._wake_write, b"\0")
+        except OSError:
+            pass
+
+    def _schedule(self, folder, delay):
+        self._due[folder] = time.monotonic() + delay
+
+    def _start_inotify(self):
+        if self.use_inotify is False:
+            self._polled = set(self.jobs)
+            return
+        try:
+            self._inotify = Inotify()
+        except (OSError, AttributeError) as e:
+            if self.use_inotify:
+                raise
+            self.log(f"Không dùng được inotify ({str(e)}), chuyển sang kiểm tra định kỳ.")
+            self._polled = set(self.jobs)
+            return
+        for folder in self.jobs:
+            self._watch(folder, folder)
+
+    def _watch(self, root, folder):
+        """Thêm inotify watch cho folder (thuộc job root) và, với job recursive, mọi thư mục con của nó"""
+        try:
+            self._inotify.add(folder)
+            self._roots[folder] = root
+            scanner = self._scanners[root]
+            if scanner.recursive:
+                for path, _ in subfolders(folder, scanner, _relative(root, folder)):
+                    try:
+                        self._inotify.add(path)
+                    except FileNotFoundError:
+                        # Thư mục con vừa bị xóa sau khi được liệt kê
+                        continue
+                    self._roots[path] = root
+        except OSError as e:
+            # Ví dụ vượt fs.inotify.max_user_watches: cả job được kiểm tra định kỳ
+            if root not in self._polled:
+                self.log(f"Không theo dõi được {folder} bằng inotify ({e.strerror}), chuyển sang kiểm tra định kỳ.")
+                self._polled.add(root)
+
+    def run(self):
+        """Theo dõi cho tới khi stop() được gọi"""
+        self._start_inotify()
+        watched = len(self.jobs) - len(self._polled)
+        self.log(f"Đang theo dõi {len(self.jobs)} thư mục ({watched} qua inotify, "
+                 f"{len(self._polled)} kiểm tra mỗi {self.poll_interval:g} giây).")
+
+        # Lần đầu: xét mọi thư mục để bắt kịp các thay đổi trong lúc chưa chạy
+        now = time.monotonic()
+        for folder in self.jobs:
+            self._due[folder] = now
+        next_poll = now + self.poll_interval
+        polls = 0
+        try:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                for folder in [folder for folder, due in self._due.items() if due <= now]:
+                    if self._stop.is_set():
+                        break
+                    del self._due[folder]
+                    self._check(folder)
+
+                deadlines = list(self._due.values())
+                if self._polled:
+                    deadlines.append(next_poll)
+                timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+                self._wait(timeout)
+
+                if self._polled and time.monotonic() >= next_poll:
+                    polls += 1
+                    self._poll(full=polls % self.full_scan_every == 0)
+                    next_poll = time.monotonic() + self.poll_interval
+        finally:
+            if self._inotify is not None:
+                self._inotify.close()
+                self._inotify = None
+            os.close(self._wake_read)
+            os.close(self._wake_write)
+        self.log("Đã dừng theo dõi.")
+
+    def _wait(self, timeout):
+        """Ngủ tới khi hết timeout giây (None: không giới hạn), có sự kiện inotify hoặc stop()"""
+        if self._inotify is None:
+            self._stop.wait(timeout)
+            return
+        poller = select.poll()
+        poller.register(self._inotify.fd, select.POLLIN)
+        poller.register(self._wake_read, select.POLLIN)
+        poller.poll(None if timeout is None else timeout * 1000)
+        for folder, name, mask in self._inotify.read():
+            if folder is None:
+                # Hàng đợi sự kiện bị tràn: không biết thư mục nào đổi, xét lại tất cả
+                for watched in self.jobs:
+                    self._schedule(watched, self.debounce)
+                continue
+            root = self._roots.get(folder)
+            if root is None:
+                continue
+            if mask & (_IN_DELETE_SELF | _IN_IGNORED):
+                if mask & _IN_DELETE_SELF and folder == root:
+                    self.log(f"Thư mục {folder} đã bị xóa, ngừng theo dõi.")
+                if mask & _IN_IGNORED:
+                    self._roots.pop(folder, None)
+            elif mask & _IN_ISDIR:
+                # Thư mục con được tạo, xóa hoặc đổi tên: các ảnh bên trong cũng xuất hiện hoặc mất đi
+                path = os.path.join(folder, name)
+                if self._scanners[root].descends(_relative(root, path), name):
+                    if mask & (_IN_CREATE | _IN_MOVED_TO):
+                        self._watch(root, path)
+                    self._schedule(root, self.debounce)
+            elif self._selects(root, folder, name):
+                # Mỗi sự kiện mới lùi thời điểm chuyển đổi (debounce)
+                self._schedule(root, self.debounce)
+
+    def _selects(self, root, folder, name):
+        """File name trong folder có thể là ảnh của job root.
+
+        Khi nhận diện theo nội dung, file không có đuôi ảnh (hoặc đã bị xóa, không
+        đọc được magic bytes) cũng được xét lại; snapshot quyết định có chuyển đổi không.
+        """
+        scanner = self._scanners[root]
+        return (scanner.selects(_relative(root, os.path.join(folder, name)), name)
+                and (scanner.sniff or is_image_name(name)))
+
+    def _poll(self, full):
+        """Kiểm tra định kỳ các thư mục không dùng inotify"""
+        for folder in self._polled:
+            try:
+                mtimes = {folder: os.stat(folder).st_mtime_ns}
+            except OSError:
+                continue
+            scanner = self._scanners[folder]
+            if scanner.recursive:
+                mtimes.update(subfolders(folder, scanner))
+            changed = self._dir_mtimes.get(folder) != mtimes
+            self._dir_mtimes[folder] = mtimes
+            if changed or (full and folder not in self._due and self._snapshot(folder) != self._converted.get(folder)):
+                self._schedule(folder, self.debounce)
+
+    def _snapshot(self, folder):
+        try:
+            return snapshot(folder, scanner=self._scanners[folder])
+        except OSError as e:
+            self.log(f"Không đọc được thư mục {folder}: {str(e)}")
+            return None
+
+    def _check(self, folder):
+        """Chuyển đổi thư mục nếu có thay đổi và các ảnh thay đổi đã ghi xong"""
+        current = self._snapshot(folder)
+        previous = self._converted.get(folder, {})
+        if current is None or current == previous:
+            return
+
+        changed = [mtime for name, (size, mtime) in current.items() if previous.get(name) != (size, mtime)]
+        # Ảnh vừa được sửa có thể vẫn đang được ghi: chờ tới khi đủ settle giây
+        wait = max(changed, default=0) / 1e9 + self.settle - time.time()
+        if wait > 0:
+            self._schedule(folder, wait)
+            return
+        self._convert(folder, current)
+
+    def _convert(self, folder, current):
+        options = self.jobs[folder]
+        self.log(f"Phát hiện thay đổi trong {folder}, đang chuyển đổi...")
+        engine = ConversionEngine(options, on_log=self.log if self.verbose else None)
+        result = None
+        error = None
+        try:
+            result = engine.run()
+            outputs = ", ".join(f"{os.path.basename(output.path)} ({output.image_count} trang)"
+                                for output in result.outputs)
+            self.log(f"Đã cập nhật {outputs}" + (f", bỏ qua {len(result.errors)} ảnh lỗi" if result.errors else ""))
+        except ConversionError as e:
+            error = str(e)
+            self.log(f"{folder}: {error}")
+        except Exception as e:
+            error = str(e)
+            self.log(f"Lỗi khi chuyển đổi {folder}: {error}")
+        finally:
+            if not self.keep_temp:
+                remove_temp_files(engine.result, options.temp_folder)
+        # Ghi nhận cả khi lỗi để không thử lại liên tục; thay đổi tiếp theo sẽ kích hoạt lại
+        self._converted[folder] = current
+        self.conversions += 1
+        self.on_result(options, result, error)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m imagetopdf.watch",
+        description="Theo dõi các thư mục ảnh và tự động cập nhật file PDF khi có ảnh mới hoặc thay đổi",
+    )
+    parser.add_argument("folders", nargs="*", help="Các thư mục ảnh cần theo dõi")
+    parser.add_argument("--folders-from", default=None,
+                        help="File liệt kê các thư mục cần theo dõi, mỗi dòng một thư mục")
+    parser.add_argument("--output-dir", default=None,
+                        help="Thư mục chứa các file PDF (mặc định: <thư mục>.pdf nằm cạnh thư mục ảnh)")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE,
+                        help="Số giây không có thay đổi mới trước khi chuyển đổi (mặc định: %(default)s)")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE,
+                        help="Ảnh bị sửa trong số giây này được coi là còn đang ghi (mặc định: %(default)s)")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Chu kỳ kiểm tra khi không dùng inotify, tính bằng giây (mặc định: %(default)s)")
+    parser.add_argument("--polling", action="store_true",
+                        help="Luôn kiểm tra định kỳ thay vì dùng inotify (cần cho thư mục mạng SMB/NFS)")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="In cả nhật ký chi tiết của từng lần chuyển đổi")
+    add_conversion_arguments(parser)
+    args = parser.parse_args(argv)
+
+    folders = list(args.folders)
+    if args.folders_from:
+        with open(args.folders_from, "r", encoding="utf-8") as f:
+            folders.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if not folders:
+        parser.error("cần chỉ định ít nhất một thư mục ảnh")
+    missing = [folder for folder in folders if not os.path.isdir(folder)]
+    if missing:
+        parser.error(f"không tìm thấy thư mục: {', '.join(missing)}")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    try:
+        jobs = folder_jobs(folders, args.output_dir, options_from_args(args, "", ""))
+    except ValueError as e:
+        parser.error(str(e))
+
+    def log(message):
+        if not args.quiet:
+            timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+            print(f"[{timestamp}] {message}", flush=True)
+
+    def report(options, result, error):
+        if result is not None:
+            for image_error in result.errors:
+                print(f"Bỏ qua {image_error.path}: {image_error.message}", file=sys.stderr)
+
+    watcher = FolderWatcher(
+        jobs,
+        debounce=args.debounce,
+        settle=args.settle,
+        poll_interval=args.poll_interval,
+        use_inotify=False if args.polling else None,
+        keep_temp=args.keep_temp,
+        verbose=args.verbose,
+        on_log=log,
+        on_result=report,
+    )
+    signal.signal(signal.SIGTERM, lambda signum, frame: watcher.stop())
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,28 @@
+"""Cấu hình chung cho các test: đường dẫn gói và các hàm tạo ảnh mẫu"""
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_image(path, size=(64, 48), color=(200, 30, 30), mode="RGB", **save_args):
+    """Tạo một ảnh màu đơn sắc (định dạng theo phần mở rộng của path), trả về path"""
+    if mode == "RGBA":
+        color = color + (128,)
+    Image.new(mode, size, color).save(path, **save_args)
+    return path
+
+
+@pytest.fixture
+def image_folder(tmp_path):
+    """Thư mục có vài ảnh JPEG, một ảnh PNG có kênh alpha và một ảnh WebP (cần chuyển đổi)"""
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for i in range(3):
+        make_image(str(folder / f"a{i}.jpg"), color=(40 * i, 80, 120))
+    make_image(str(folder / "b.png"), mode="RGBA")
+    make_image(str(folder / "c.webp"), color=(10, 200, 10))
+    return folder
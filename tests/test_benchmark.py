@@ -0,0 +1,38 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from imagetopdf.benchmark import _wait_for_report, generate_corpus, run_scenario
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    folder = str(tmp_path_factory.mktemp("corpus"))
+    generate_corpus(folder, counts=1, sizes=(64,), formats=("jpeg", "png"))
+    return folder
+
+
+def test_run_scenario_reports_pages(corpus):
+    report = run_scenario(corpus, {"separate_by_ratio": False})
+    assert report["error"] is None
+    assert report["pages"] == 6 and report["output_bytes"] > 0
+
+
+def test_bad_options_are_reported_instead_of_hanging(corpus):
+    report = run_scenario(corpus, {"no_such_option": 1})
+    assert "no_such_option" in report["error"]
+    assert report["seconds"] >= 0
+
+
+def test_child_exiting_without_report():
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    # Giống tiến trình bị dừng đột ngột (hết bộ nhớ, lỗi trong thư viện C) trước khi gửi báo cáo
+    process = context.Process(target=os._exit, args=(3,))
+    start = time.perf_counter()
+    process.start()
+    report = _wait_for_report(process, queue, start)
+    assert report["error"] == "exit code 3"
+    assert report["peak_rss_bytes"] is None
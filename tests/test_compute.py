@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from imagetopdf.compute import NumpyBackend, convert_image, downscale_image, self_check
+
+# Kích thước không chia hết cho 2, 3 và 4 để kiểm tra ô cuối ngắn hơn
+HEIGHT, WIDTH = 37, 53
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(1234)
+
+
+@pytest.fixture
+def cpu():
+    return NumpyBackend()
+
+
+def _max_error(a, b):
+    return int(np.abs(a.astype(np.int32) - b.astype(np.int32)).max())
+
+
+def test_flatten_alpha_matches_pillow(rng, cpu):
+    rgba = rng.integers(0, 256, (HEIGHT, WIDTH, 4), dtype=np.uint8)
+    white = Image.new('RGBA', (WIDTH, HEIGHT), (255, 255, 255, 255))
+    expected = np.asarray(Image.alpha_composite(white, Image.fromarray(rgba, 'RGBA')).convert('RGB'))
+    np.testing.assert_array_equal(cpu.flatten_alpha(rgba), expected)
+
+
+def test_flatten_alpha_extremes(cpu):
+    pixels = np.array([[[10, 20, 30, 255], [10, 20, 30, 0]]], dtype=np.uint8)
+    np.testing.assert_array_equal(cpu.flatten_alpha(pixels), [[[10, 20, 30], [255, 255, 255]]])
+    np.testing.assert_array_equal(cpu.flatten_alpha(pixels, background=(0, 0, 0)), [[[10, 20, 30], [0, 0, 0]]])
+
+
+@pytest.mark.parametrize("factor", [2, 3, 4])
+def test_downscale_matches_pillow_reduce(rng, cpu, factor):
+    rgb = rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    output = cpu.downscale(rgb, factor)
+    expected = np.asarray(Image.fromarray(rgb).reduce(factor))
+    assert output.shape == expected.shape == (-(-HEIGHT // factor), -(-WIDTH // factor), 3)
+    # Image.reduce dùng phép nhân xấp xỉ thay cho phép chia nên có thể lệch 1
+    assert _max_error(output, expected) <= 1
+
+
+@pytest.mark.parametrize("factor", [2, 3, 4])
+def test_downscale_partial_blocks_are_exact_means(rng, cpu, factor):
+    rgb = rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    output = cpu.downscale(rgb, factor)
+    # Ô góc dưới phải chỉ gồm các điểm ảnh còn lại, không tính phần đệm
+    corner = rgb[(HEIGHT - 1) // factor * factor:, (WIDTH - 1) // factor * factor:].reshape(-1, 3)
+    expected = (corner.astype(np.int64).sum(axis=0) + len(corner) // 2) // len(corner)
+    np.testing.assert_array_equal(output[-1, -1], expected)
+
+
+def test_downscale_batch_matches_single_images(rng, cpu):
+    batch = rng.integers(0, 256, (3, HEIGHT, WIDTH, 3), dtype=np.uint8)
+    output = cpu.downscale(batch, 3)
+    for i in range(len(batch)):
+        np.testing.assert_array_equal(output[i], cpu.downscale(batch[i], 3))
+
+
+def test_downscale_factor_one_is_identity(rng, cpu):
+    rgb = rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    assert cpu.downscale(rgb, 1) is rgb
+
+
+def test_cmyk_to_rgb_matches_pillow(rng, cpu):
+    cmyk = rng.integers(0, 256, (HEIGHT, WIDTH, 4), dtype=np.uint8)
+    expected = np.asarray(Image.fromarray(cmyk, 'CMYK').convert('RGB'))
+    np.testing.assert_array_equal(cpu.cmyk_to_rgb(cmyk), expected)
+
+
+def test_rgb_to_gray_matches_pillow(rng, cpu):
+    rgb = rng.integers(0, 256, (HEIGHT, WIDTH, 3), dtype=np.uint8)
+    expected = np.asarray(Image.fromarray(rgb).convert('L'))[..., None]
+    np.testing.assert_array_equal(cpu.rgb_to_gray(rgb), expected)
+
+
+@pytest.mark.parametrize("mode", ['RGBA', 'LA', 'CMYK', 'P'])
+def test_convert_image_modes(rng, cpu, mode):
+    img = Image.fromarray(rng.integers(0, 256, (HEIGHT, WIDTH, 4), dtype=np.uint8), 'RGBA')
+    img = img.convert(mode)
+    assert convert_image(img, 'RGB', cpu).mode == 'RGB'
+    assert convert_image(img, 'L', cpu).mode == 'L'
+
+
+def test_downscale_image_gray(rng, cpu):
+    img = Image.fromarray(rng.integers(0, 256, (HEIGHT, WIDTH), dtype=np.uint8), 'L')
+    out = downscale_image(img, 2, cpu)
+    assert out.mode == 'L' and out.size == (-(-WIDTH // 2), -(-HEIGHT // 2))
+
+
+def test_self_check_cpu_passes():
+    results = self_check(names=("cpu",))
+    assert results and all(passed for *_, passed in results)
+
+
+@pytest.mark.parametrize("op", ["flatten_alpha", "cmyk_to_rgb", "rgb_to_gray", "downscale_2", "downscale_3",
+                                "downscale_4"])
+def test_torch_matches_numpy_bit_for_bit(rng, cpu, op):
+    pytest.importorskip("torch")
+    from imagetopdf.compute import TorchBackend
+    torch_backend = TorchBackend(device="cpu")
+    pixels = rng.integers(0, 256, (2, HEIGHT, WIDTH, 4), dtype=np.uint8)
+    if op.startswith("downscale"):
+        factor = int(op.rsplit("_", 1)[1])
+        run = lambda backend: backend.downscale(pixels[..., :3], factor)
+    elif op == "rgb_to_gray":
+        run = lambda backend: backend.rgb_to_gray(pixels[..., :3])
+    else:
+        run = lambda backend: getattr(backend, op)(pixels)
+    np.testing.assert_array_equal(run(torch_backend), run(cpu))
@@ -0,0 +1,38 @@
+import pytest
+from PIL import Image
+
+from imagetopdf import ConversionError, ConversionOptions, convert
+from imagetopdf.dedup import find_duplicates
+from imagetopdf.metadata import read_image_info
+
+from conftest import make_image
+
+
+@pytest.fixture
+def infos(tmp_path):
+    paths = [make_image(str(tmp_path / "a.jpg")), make_image(str(tmp_path / "b.jpg")), str(tmp_path / "c.png")]
+    # Ảnh chuyển màu khác hẳn về hình ảnh so với ảnh một màu
+    Image.linear_gradient('L').rotate(90).resize((64, 48)).save(paths[2])
+    return [read_image_info(path) for path in paths]
+
+
+def test_exact_duplicates(infos):
+    duplicates = find_duplicates(infos, "exact")
+    assert [(d.path, d.original, d.distance) for d in duplicates] == [(infos[1].path, infos[0].path, 0)]
+
+
+@pytest.mark.parametrize("mode", ["dhash", "phash"])
+def test_threshold_zero_is_accepted(infos, mode):
+    assert [d.path for d in find_duplicates(infos, mode, threshold=0)] == [infos[1].path]
+
+
+@pytest.mark.parametrize("mode", ["exact", "dhash", "phash"])
+def test_negative_threshold_is_rejected(infos, mode):
+    with pytest.raises(ValueError):
+        find_duplicates(infos, mode, threshold=-1)
+
+
+def test_engine_rejects_negative_threshold(image_folder, tmp_path):
+    options = ConversionOptions(str(image_folder), str(tmp_path / "out.pdf"), dedup="phash", dedup_threshold=-3)
+    with pytest.raises(ConversionError):
+        convert(options)
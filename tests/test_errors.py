@@ -0,0 +1,59 @@
+import os
+
+import pytest
+
+from imagetopdf import ConversionOptions, convert
+from imagetopdf.verify import verify_pdf
+
+from conftest import make_image
+
+
+def _truncate(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    with open(path, "wb") as f:
+        f.write(data[:len(data) // 2])
+
+
+@pytest.fixture
+def folder_with_truncated_jpeg(tmp_path):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for i in range(4):
+        make_image(str(folder / f"{i}.jpg"), size=(320, 240), color=(50 * i, 100, 150), quality=95)
+    _truncate(str(folder / "2.jpg"))
+    return folder
+
+
+@pytest.mark.parametrize("preserve_ratio", [True, False])
+@pytest.mark.parametrize("workers", [1, 2])
+def test_truncated_jpeg_is_quarantined_before_img2pdf(folder_with_truncated_jpeg, tmp_path, preserve_ratio,
+                                                      workers):
+    quarantine = str(tmp_path / "quarantine")
+    output = str(tmp_path / "out.pdf")
+    options = ConversionOptions(str(folder_with_truncated_jpeg), output, separate_by_ratio=False,
+                                preserve_ratio=preserve_ratio, workers=workers, quarantine_dir=quarantine,
+                                temp_folder=str(tmp_path / "tmp"))
+    result = convert(options)
+
+    assert [os.path.basename(error.path) for error in result.errors] == ["2.jpg"]
+    assert result.errors[0].quarantined == os.path.join(quarantine, "2.jpg")
+    assert os.path.isfile(result.errors[0].quarantined)
+    assert not os.path.exists(folder_with_truncated_jpeg / "2.jpg")
+    assert verify_pdf(output).page_count == 3
+    # Ảnh hỏng bị loại trong pool, không cần lượt kiểm tra lại sau khi img2pdf lỗi
+    assert "img2pdf_isolate" not in result.metrics.timers
+
+
+def test_streaming_without_validate_keeps_passthrough_unchecked(folder_with_truncated_jpeg, tmp_path):
+    output = str(tmp_path / "out.pdf")
+    options = ConversionOptions(str(folder_with_truncated_jpeg), output, separate_by_ratio=False, streaming=True)
+    result = convert(options)
+    assert result.errors == []
+    assert verify_pdf(output).page_count == 4
+
+    options = ConversionOptions(str(folder_with_truncated_jpeg), output, separate_by_ratio=False, streaming=True,
+                                validate=True)
+    result = convert(options)
+    assert [os.path.basename(error.path) for error in result.errors] == ["2.jpg"]
+    assert verify_pdf(output).page_count == 3
@@ -0,0 +1,43 @@
+import os
+
+from imagetopdf import ConversionOptions, convert, manifest_path
+from imagetopdf.verify import verify_pdf
+
+
+def _encoded(result):
+    counters = result.metrics.counters
+    return counters.get("images_passthrough", 0) + counters.get("images_reencoded", 0)
+
+
+def _options(image_folder, output, **kwargs):
+    return ConversionOptions(str(image_folder), output, separate_by_ratio=False, **kwargs)
+
+
+def test_unchanged_folder_reuses_all_pages(image_folder, tmp_path):
+    output = str(tmp_path / "out.pdf")
+    assert _encoded(convert(_options(image_folder, output, incremental=True))) == 5
+    result = convert(_options(image_folder, output, incremental=True))
+    assert _encoded(result) == 0
+    assert verify_pdf(output).page_count == 5
+
+
+def test_changing_compute_backend_invalidates_manifest(image_folder, tmp_path):
+    output = str(tmp_path / "out.pdf")
+    convert(_options(image_folder, output, incremental=True))
+    result = convert(_options(image_folder, output, incremental=True, compute_backend="cpu"))
+    assert _encoded(result) == 5
+    # Lần chạy tiếp theo với cùng backend lại dùng được manifest
+    assert _encoded(convert(_options(image_folder, output, incremental=True, compute_backend="cpu"))) == 0
+
+
+def test_full_rebuild_removes_stale_manifest(image_folder, tmp_path):
+    output = str(tmp_path / "out.pdf")
+    convert(_options(image_folder, output, incremental=True))
+    assert os.path.exists(manifest_path(output))
+
+    convert(_options(image_folder, output, streaming=True))
+    assert not os.path.exists(manifest_path(output))
+
+    convert(_options(image_folder, output, incremental=True))
+    convert(_options(image_folder, output))
+    assert not os.path.exists(manifest_path(output))
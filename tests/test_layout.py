@@ -0,0 +1,28 @@
+from imagetopdf import ConversionOptions, convert
+from imagetopdf.encoders import encode_image
+from imagetopdf.layout import PageLayout, parse_page_size
+from imagetopdf.metadata import read_image_info
+from imagetopdf.sourcefile import FileSlice
+from imagetopdf.verify import verify_pdf
+
+from conftest import make_image
+
+
+def test_layout_keeps_jpeg_passthrough(tmp_path):
+    path = make_image(str(tmp_path / "a.jpg"), size=(640, 480))
+    page = encode_image(path, read_image_info(path), layout=PageLayout(parse_page_size("A4")))
+    assert isinstance(page.data, FileSlice)
+    assert not page.reencoded
+
+    # Ảnh vượt DPI tối đa vẫn được thu nhỏ
+    page = encode_image(path, read_image_info(path), layout=PageLayout(parse_page_size("A4"), max_dpi=10))
+    assert page.reencoded
+    assert page.width < 640
+
+
+def test_page_size_copies_jpeg_without_reading(image_folder, tmp_path):
+    output = str(tmp_path / "out.pdf")
+    result = convert(ConversionOptions(str(image_folder), output, separate_by_ratio=False, streaming=True,
+                                       page_size="A4"))
+    assert result.metrics.counters.get("bytes_zero_copy", 0) > 0
+    assert verify_pdf(output).page_count == 5
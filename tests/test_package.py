@@ -0,0 +1,7 @@
+import imagetopdf
+
+
+def test_all_lists_existing_public_names():
+    assert len(set(imagetopdf.__all__)) == len(imagetopdf.__all__)
+    for name in imagetopdf.__all__:
+        assert not name.startswith("_") and hasattr(imagetopdf, name), name
@@ -0,0 +1,21 @@
+import pstats
+
+from imagetopdf import ConversionOptions, convert
+
+from conftest import make_image
+
+
+def test_cpu_profile_covers_output_threads(tmp_path):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for i in range(2):
+        make_image(str(folder / f"wide{i}.jpg"), size=(160, 90))
+        make_image(str(folder / f"tall{i}.jpg"), size=(90, 160))
+    output = str(tmp_path / "out.pdf")
+    result = convert(ConversionOptions(str(folder), output, workers=2, streaming=True, profile="cpu"))
+    assert len(result.outputs) == 2
+
+    # Các file PDF được tạo trên luồng riêng nhưng vẫn có trong kết quả profile
+    stats = pstats.Stats(str(tmp_path / "out_profile.prof"))
+    functions = {name for _, _, name in stats.stats}
+    assert "create_pdf_for_images" in functions
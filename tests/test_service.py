@@ -0,0 +1,240 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from imagetopdf import service as service_module
+from imagetopdf.engine import ConversionEngine
+from imagetopdf.service import Job, JobService, JobStore
+
+from conftest import make_image
+
+
+class GatedEngine(ConversionEngine):
+    """Engine chỉ bắt đầu chạy khi gate được mở, để giữ job ở trạng thái running trong test"""
+    gate = threading.Event()
+    started = threading.Event()
+
+    def run(self):
+        GatedEngine.started.set()
+        while not GatedEngine.gate.wait(0.01):
+            if self.cancelled:
+                break
+        self._check_cancelled()
+        return super().run()
+
+
+@pytest.fixture
+def gated_engine(monkeypatch):
+    GatedEngine.gate = threading.Event()
+    GatedEngine.started = threading.Event()
+    monkeypatch.setattr(service_module, "ConversionEngine", GatedEngine)
+    yield GatedEngine
+    GatedEngine.gate.set()
+
+
+class RunningService:
+    """JobService chạy trên vòng lặp asyncio của một luồng riêng"""
+
+    def __init__(self, **kwargs):
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.service = JobService(port=0, **kwargs)
+        self.call(self.service.start())
+        self.base = f"http://127.0.0.1:{self.service.port}"
+
+    def call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout=30)
+
+    def stop(self):
+        self.call(self.service.stop())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=10)
+        self.loop.close()
+
+    def request(self, method, path, data=None):
+        body = None if data is None else json.dumps(data).encode("utf-8")
+        req = urllib.request.Request(self.base + path, data=body, method=method,
+                                     headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                return response.status, response.read(), response.headers
+        except urllib.error.HTTPError as e:
+            return e.code, e.read(), e.headers
+
+    def json(self, method, path, data=None):
+        status, body, _ = self.request(method, path, data)
+        return status, json.loads(body.decode("utf-8"))
+
+    def wait_for(self, job_id, statuses, timeout=30):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            _, job = self.json("GET", f"/jobs/{job_id}")
+            if job["status"] in statuses:
+                return job
+            time.sleep(0.02)
+        raise AssertionError(f"Job {job_id} không đạt trạng thái {statuses}: {job['status']}")
+
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for i in range(3):
+        make_image(str(folder / f"{i}.jpg"), color=(60 * i, 90, 30))
+    return str(folder)
+
+
+@pytest.fixture
+def start_service(tmp_path):
+    services = []
+
+    def start(**kwargs):
+        kwargs.setdefault("data_dir", str(tmp_path / "service"))
+        running = RunningService(**kwargs)
+        services.append(running)
+        return running
+
+    yield start
+    for running in services:
+        if not running.loop.is_closed():
+            running.stop()
+
+
+def test_submit_poll_download(start_service, folder):
+    running = start_service()
+    status, job = running.json("POST", "/jobs", {"input_folder": folder, "output_name": "album.pdf",
+                                                 "options": {"separate_by_ratio": False}})
+    assert status == 202 and job["status"] == "queued"
+
+    job = running.wait_for(job["id"], ("done", "failed"))
+    assert job["status"] == "done", job["error"]
+    assert job["result"]["image_count"] == 3
+    output = job["result"]["outputs"][0]
+    assert output["name"] == "album.pdf" and output["pages"] == 3
+
+    status, data, headers = running.request("GET", output["url"])
+    assert status == 200 and headers["Content-Type"] == "application/pdf"
+    assert data.startswith(b"%PDF") and len(data) == output["bytes"]
+
+    status, _, _ = running.request("GET", f"/jobs/{job['id']}/outputs/5")
+    assert status == 404
+
+
+@pytest.mark.parametrize("options", [
+    {"workers": "4"},
+    {"separate_by_ratio": "no"},
+    {"quality": None},
+    {"no_such_option": 1},
+    {"temp_folder": "/tmp"},
+])
+def test_bad_options_return_400(start_service, folder, options):
+    running = start_service()
+    status, data = running.json("POST", "/jobs", {"input_folder": folder, "options": options})
+    assert status == 400 and data["error"]
+    _, jobs = running.json("GET", "/jobs")
+    assert jobs["jobs"] == []
+
+
+def test_bad_requests_return_400(start_service, folder):
+    running = start_service()
+    assert running.json("POST", "/jobs", {"input_folder": folder, "files": [folder]})[0] == 400
+    assert running.json("POST", "/jobs", {"input_folder": "relative/path"})[0] == 400
+    assert running.json("POST", "/jobs", {"input_folder": folder, "output_name": "../x.pdf"})[0] == 400
+    assert running.json("POST", "/jobs", [folder])[0] == 400
+
+
+def test_queue_full_returns_429(start_service, folder, gated_engine):
+    running = start_service(max_jobs=1, max_queued=1)
+    request = {"input_folder": folder}
+    _, first = running.json("POST", "/jobs", request)
+    assert gated_engine.started.wait(10)
+    status, second = running.json("POST", "/jobs", request)
+    assert status == 202 and second["status"] == "queued"
+
+    status, body, headers = running.request("POST", "/jobs", request)
+    assert status == 429 and headers["Retry-After"]
+
+    gated_engine.gate.set()
+    assert running.wait_for(first["id"], ("done",))
+    assert running.wait_for(second["id"], ("done",))
+
+
+def test_cancel_queued_and_running_jobs(start_service, folder, gated_engine):
+    running = start_service(max_jobs=1)
+    _, first = running.json("POST", "/jobs", {"input_folder": folder})
+    assert gated_engine.started.wait(10)
+    running.wait_for(first["id"], ("running",))
+    _, second = running.json("POST", "/jobs", {"input_folder": folder})
+
+    status, job = running.json("POST", f"/jobs/{second['id']}/cancel")
+    assert status == 202 and job["status"] == "cancelled"
+
+    status, _ = running.json("POST", f"/jobs/{first['id']}/cancel")
+    assert status == 202
+    job = running.wait_for(first["id"], ("cancelled", "done", "failed"))
+    assert job["status"] == "cancelled"
+    assert not os.path.exists(os.path.join(running.service.results_dir, first["id"]))
+
+    # Job đã hủy không hủy lại được và không bao giờ chạy
+    assert running.json("POST", f"/jobs/{second['id']}/cancel")[0] == 409
+    assert running.json("GET", f"/jobs/{second['id']}")[1]["started"] is None
+
+
+def test_restart_requeues_unfinished_jobs(start_service, folder, gated_engine, tmp_path):
+    data_dir = str(tmp_path / "service")
+    running = start_service(data_dir=data_dir, max_jobs=1)
+    _, first = running.json("POST", "/jobs", {"input_folder": folder})
+    assert gated_engine.started.wait(10)
+    running.wait_for(first["id"], ("running",))
+    _, second = running.json("POST", "/jobs", {"input_folder": folder})
+    running.stop()
+
+    gated_engine.gate.set()
+    restarted = start_service(data_dir=data_dir, max_jobs=1)
+    for job_id in (first["id"], second["id"]):
+        job = restarted.wait_for(job_id, ("done", "failed", "cancelled"))
+        assert job["status"] == "done", job["error"]
+    _, jobs = restarted.json("GET", "/jobs")
+    assert {job["id"] for job in jobs["jobs"]} == {first["id"], second["id"]}
+
+
+def test_bad_persisted_request_fails_without_killing_worker(start_service, folder, tmp_path):
+    data_dir = str(tmp_path / "service")
+    os.makedirs(data_dir)
+    store = JobStore(os.path.join(data_dir, "jobs.sqlite"))
+    # Yêu cầu hỏng (ví dụ từ phiên bản cũ) được đọc lại từ SQLite khi khởi động
+    store.save(Job("broken", {"input_folder": folder, "options": {"workers": "many"}}, time.time()))
+    store.close()
+
+    running = start_service(data_dir=data_dir, max_jobs=1)
+    job = running.wait_for("broken", ("failed", "done", "cancelled"))
+    assert job["status"] == "failed" and job["error"]
+
+    # Worker duy nhất vẫn nhận job tiếp theo
+    _, job = running.json("POST", "/jobs", {"input_folder": folder})
+    assert running.wait_for(job["id"], ("done", "failed"))["status"] == "done"
+
+
+def test_results_dir_error_marks_job_failed(start_service, folder, monkeypatch):
+    running = start_service(max_jobs=1)
+    options_for = running.service._options_for
+    calls = []
+
+    def failing_options_for(job):
+        calls.append(job.id)
+        if len(calls) == 1:
+            raise OSError(28, "No space left on device")
+        return options_for(job)
+
+    monkeypatch.setattr(running.service, "_options_for", failing_options_for)
+    _, first = running.json("POST", "/jobs", {"input_folder": folder})
+    assert running.wait_for(first["id"], ("failed", "done"))["status"] == "failed"
+    _, second = running.json("POST", "/jobs", {"input_folder": folder})
+    assert running.wait_for(second["id"], ("failed", "done"))["status"] == "done"
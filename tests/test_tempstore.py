@@ -0,0 +1,93 @@
+import os
+import threading
+
+from imagetopdf import ConversionOptions, TempStorage, convert, remove_temp_files
+
+
+def _write(path, size):
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    return str(path)
+
+
+def test_usage_and_discard(tmp_path):
+    with TempStorage(str(tmp_path)) as storage:
+        a = _write(tmp_path / "a.tmp", 100)
+        b = _write(tmp_path / "b.tmp", 50)
+        storage.add(a)
+        storage.add(b)
+        assert storage.usage() == (150, 2)
+        assert storage.discard([a]) == (1, 100)
+        assert not os.path.exists(a)
+        assert storage.usage() == (50, 1)
+
+
+def test_quota_evicts_oldest_files_of_other_sessions(tmp_path):
+    with TempStorage(str(tmp_path), session="old") as old:
+        old_files = [_write(tmp_path / f"old{i}.tmp", 100) for i in range(3)]
+        for path in old_files:
+            old.add(path)
+    with TempStorage(str(tmp_path), max_bytes=250, session="new") as new:
+        mine = _write(tmp_path / "new.tmp", 100)
+        new.add(mine)
+        assert new.usage()[0] <= 250
+        # Các file cũ nhất bị xóa trước, file của phiên hiện tại luôn được giữ
+        assert not os.path.exists(old_files[0])
+        assert not os.path.exists(old_files[1])
+        assert os.path.exists(old_files[2])
+        assert os.path.exists(mine)
+
+
+def test_add_from_several_threads(tmp_path):
+    with TempStorage(str(tmp_path)) as storage:
+        def worker(n):
+            for i in range(10):
+                storage.add(_write(tmp_path / f"t{n}_{i}.tmp", 10))
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert storage.usage() == (400, 40)
+
+
+def test_img2pdf_path_spills_converted_images(image_folder, tmp_path):
+    temp_folder = str(tmp_path / "tmp")
+    options = ConversionOptions(str(image_folder), str(tmp_path / "out.pdf"), separate_by_ratio=False,
+                                temp_folder=temp_folder)
+    result = convert(options)
+
+    # Ảnh PNG có kênh alpha và ảnh WebP được chuyển sang JPEG tạm và ghi vào chỉ mục
+    assert len(result.temp_files) == 2
+    assert all(path.startswith(temp_folder) and os.path.isfile(path) for path in result.temp_files)
+    with TempStorage(temp_folder) as storage:
+        assert storage.usage() == (sum(os.path.getsize(path) for path in result.temp_files), 2)
+
+    remove_temp_files(result, temp_folder)
+    with TempStorage(temp_folder) as storage:
+        assert storage.usage() == (0, 0)
+
+
+def test_engine_quota_evicts_previous_runs(image_folder, tmp_path):
+    temp_folder = str(tmp_path / "tmp")
+    os.makedirs(temp_folder)
+    with TempStorage(temp_folder, session="previous") as previous:
+        stale = _write(os.path.join(temp_folder, "stale.jpg"), 10000)
+        previous.add(stale)
+
+    options = ConversionOptions(str(image_folder), str(tmp_path / "out.pdf"), separate_by_ratio=False,
+                                temp_folder=temp_folder, temp_max_bytes=5000)
+    result = convert(options)
+
+    assert not os.path.exists(stale)
+    assert all(os.path.isfile(path) for path in result.temp_files)
+
+
+def test_streaming_does_not_touch_temp_folder(image_folder, tmp_path):
+    temp_folder = str(tmp_path / "tmp")
+    options = ConversionOptions(str(image_folder), str(tmp_path / "out.pdf"), separate_by_ratio=False,
+                                temp_folder=temp_folder, streaming=True)
+    result = convert(options)
+    assert result.temp_files == []
+    assert not os.path.exists(temp_folder)
@@ -0,0 +1,59 @@
+import json
+import os
+
+import pytest
+
+from imagetopdf import ConversionOptions, convert
+from imagetopdf.metadata import read_image_info
+from imagetopdf.verify import verify_pdf
+from imagetopdf.volumes import PAGE_OVERHEAD, plan_volumes, volume_path
+
+from conftest import make_image
+
+
+@pytest.fixture
+def mixed_folder(tmp_path):
+    """5 ảnh ngang 16:9 và 2 ảnh dọc 9:16"""
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for i in range(5):
+        make_image(str(folder / f"l{i}.jpg"), size=(160, 90), color=(40 * i, 60, 90))
+    for i in range(2):
+        make_image(str(folder / f"p{i}.jpg"), size=(90, 160), color=(90, 40 * i, 60))
+    return folder
+
+
+def test_plan_volumes_by_pages_and_bytes(mixed_folder):
+    infos = [read_image_info(str(path)) for path in sorted(mixed_folder.iterdir())]
+    assert [len(volume) for volume in plan_volumes(infos, max_pages=3)] == [3, 3, 1]
+    largest = max(info.file_size for info in infos) + PAGE_OVERHEAD
+    assert all(len(volume) == 1 for volume in plan_volumes(infos, max_bytes=largest))
+    assert len(plan_volumes(infos, max_pages=100)) == 1
+
+
+def test_volume_path():
+    assert volume_path("/x/ket_qua.pdf", 12) == "/x/ket_qua_part012.pdf"
+
+
+def test_single_volume_groups_keep_their_name(mixed_folder, tmp_path):
+    output = str(tmp_path / "out.pdf")
+    options = ConversionOptions(str(mixed_folder), output, volume_pages=3, volume_index="json")
+    result = convert(options)
+
+    names = sorted(os.path.basename(output.path) for output in result.outputs)
+    # Nhóm 16:9 (5 ảnh) được chia làm hai tập, nhóm 9:16 (2 ảnh) vừa một tập nên giữ nguyên tên
+    assert names == ["out_16x9_part001.pdf", "out_16x9_part002.pdf", "out_9x16.pdf"]
+    for output_file in result.outputs:
+        assert verify_pdf(output_file.path).page_count == output_file.image_count
+
+    with open(str(tmp_path / "out_index.json"), encoding="utf-8") as f:
+        index = json.load(f)
+    assert sorted((entry["file"], entry["pages"]) for entry in index["volumes"]) == [
+        ("out_16x9_part001.pdf", 3), ("out_16x9_part002.pdf", 2), ("out_9x16.pdf", 2)]
+
+
+def test_single_output_under_limit_is_unsplit(mixed_folder, tmp_path):
+    output = str(tmp_path / "out.pdf")
+    result = convert(ConversionOptions(str(mixed_folder), output, separate_by_ratio=False, volume_pages=100))
+    assert [output_file.path for output_file in result.outputs] == [output]
+    assert verify_pdf(output).page_count == 7
@@ -0,0 +1,142 @@
+import os
+import threading
+import time
+
+import pytest
+
+from imagetopdf.engine import ConversionOptions
+from imagetopdf.scanner import DirectoryScanner
+from imagetopdf.verify import verify_pdf
+from imagetopdf.watch import FolderWatcher, folder_jobs, snapshot
+
+from conftest import make_image
+
+
+def test_snapshot_recursive(tmp_path):
+    make_image(str(tmp_path / "a.jpg"))
+    (tmp_path / "sub" / "deeper").mkdir(parents=True)
+    make_image(str(tmp_path / "sub" / "b.jpg"))
+    make_image(str(tmp_path / "sub" / "deeper" / "c.png"))
+    (tmp_path / "notes.txt").write_text("x")
+
+    assert set(snapshot(str(tmp_path))) == {"a.jpg"}
+    assert set(snapshot(str(tmp_path), recursive=True)) == {"a.jpg", "sub/b.jpg", "sub/deeper/c.png"}
+
+
+def test_snapshot_uses_scanner_matching(tmp_path):
+    make_image(str(tmp_path / "a.jpg"))
+    make_image(str(tmp_path / "a_thumb.jpg"))
+    (tmp_path / "raw").mkdir()
+    make_image(str(tmp_path / "raw" / "b.jpg"))
+    make_image(str(tmp_path / "scan0001"), format="JPEG")
+    (tmp_path / "notes.txt").write_text("x")
+
+    scanner = DirectoryScanner(str(tmp_path), recursive=True, exclude=("*_thumb.jpg", "raw"), sniff=True)
+    assert set(snapshot(str(tmp_path), scanner=scanner)) == {"a.jpg", "scan0001"}
+
+
+class WatcherThread:
+    def __init__(self, jobs, use_inotify):
+        self.results = []
+        self.done = threading.Condition()
+        self.watcher = FolderWatcher(jobs, debounce=0.05, settle=0, poll_interval=0.05, full_scan_every=1,
+                                     use_inotify=use_inotify, on_result=self._on_result)
+        self.thread = threading.Thread(target=self.watcher.run, daemon=True)
+        self.thread.start()
+
+    def _on_result(self, options, result, error):
+        with self.done:
+            self.results.append((result, error))
+            self.done.notify_all()
+
+    def wait_for(self, count, timeout=20):
+        with self.done:
+            assert self.done.wait_for(lambda: len(self.results) >= count, timeout), \
+                f"Chỉ có {len(self.results)} lần chuyển đổi"
+            result, error = self.results[count - 1]
+        assert error is None, error
+        return result
+
+    def stop(self):
+        self.watcher.stop()
+        self.thread.join(timeout=10)
+
+
+def _inotify_available():
+    try:
+        from imagetopdf.watch import Inotify
+        Inotify().close()
+        return True
+    except (OSError, AttributeError):
+        return False
+
+
+@pytest.mark.parametrize("use_inotify", [
+    pytest.param(None, marks=pytest.mark.skipif(not _inotify_available(), reason="không có inotify")),
+    False,
+])
+@pytest.mark.parametrize("per_folder", [False, True])
+def test_recursive_watch_sees_new_subfolders(tmp_path, use_inotify, per_folder):
+    folder = tmp_path / "scans"
+    folder.mkdir()
+    make_image(str(folder / "0.jpg"))
+    template = ConversionOptions("", "", separate_by_ratio=False, recursive=True, per_folder=per_folder,
+                                 temp_folder=str(tmp_path / "tmp"))
+    jobs = folder_jobs([str(folder)], str(tmp_path / "out"), template)
+    os.makedirs(str(tmp_path / "out"))
+    output = jobs[0].output_file
+
+    watcher = WatcherThread(jobs, use_inotify)
+    try:
+        watcher.wait_for(1)
+        # Thư mục con nhiều cấp được tạo sau khi đã bắt đầu theo dõi
+        time.sleep(0.1)
+        nested = folder / "day1" / "batch"
+        nested.mkdir(parents=True)
+        time.sleep(0.1)
+        make_image(str(nested / "1.jpg"))
+        result = watcher.wait_for(2)
+        assert result.image_count == 2
+
+        make_image(str(nested / "2.jpg"))
+        result = watcher.wait_for(3)
+        assert result.image_count == 3
+    finally:
+        watcher.stop()
+
+    if per_folder:
+        assert verify_pdf(output).page_count == 1
+        assert verify_pdf(os.path.join(os.path.splitext(output)[0], "day1", "batch.pdf")).page_count == 2
+    else:
+        assert verify_pdf(output).page_count == 3
+
+
+@pytest.mark.parametrize("use_inotify", [
+    pytest.param(None, marks=pytest.mark.skipif(not _inotify_available(), reason="không có inotify")),
+    False,
+])
+def test_watch_honours_exclude_and_sniff(tmp_path, use_inotify):
+    folder = tmp_path / "scans"
+    folder.mkdir()
+    make_image(str(folder / "0.jpg"))
+    template = ConversionOptions("", "", separate_by_ratio=False, exclude=("*_thumb.jpg",), sniff_content=True,
+                                 temp_folder=str(tmp_path / "tmp"))
+    jobs = folder_jobs([str(folder)], str(tmp_path / "out"), template)
+    os.makedirs(str(tmp_path / "out"))
+
+    watcher = WatcherThread(jobs, use_inotify)
+    try:
+        watcher.wait_for(1)
+        time.sleep(0.1)
+        # Ảnh bị loại không kích hoạt chuyển đổi
+        make_image(str(folder / "0_thumb.jpg"))
+        time.sleep(0.5)
+        assert len(watcher.results) == 1
+        # Ảnh không có đuôi được nhận diện theo nội dung
+        make_image(str(folder / "scan0001"), format="JPEG")
+        result = watcher.wait_for(2)
+        assert result.image_count == 2
+    finally:
+        watcher.stop()
+
+    assert verify_pdf(jobs[0].output_file).page_count == 2